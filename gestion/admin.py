@@ -2,7 +2,9 @@ from django.contrib import admin
 from .models import (
     CustomUser, Plat, TableRestaurant, Tablette, 
     PanierItem, Commande, CommandeItem, Paiement, 
-    Caisse, Depense
+    Caisse, CaisseMouvement, Depense, SessionUtilisateur,
+    StatistiqueJour, StatistiqueHeure, VentePlatJour, VersionMenu, ReservationStock,
+    LigneCuisine,
 )
 
 # On enregistre tout de la manière la plus basique possible
@@ -15,7 +17,15 @@ admin.site.register(Commande)
 admin.site.register(CommandeItem)
 admin.site.register(Paiement)
 admin.site.register(Caisse)
+admin.site.register(CaisseMouvement)
+admin.site.register(SessionUtilisateur)
 admin.site.register(Depense)
+admin.site.register(StatistiqueJour)
+admin.site.register(StatistiqueHeure)
+admin.site.register(VentePlatJour)
+admin.site.register(VersionMenu)
+admin.site.register(ReservationStock)
+admin.site.register(LigneCuisine)
 
 # Pour Tablette, on met juste le minimum pour tester
 @admin.register(Tablette)
@@ -0,0 +1,201 @@
+# =========================================================
+# caches.py — Caches applicatifs (tenus à jour par signals.py)
+# =========================================================
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import LigneCuisine, Plat, TableRestaurant, Tablette, VentePlatJour
+
+
+# Les caches invalidés par signal ne sont tenus que si le cache est commun
+# à tous les workers (CACHE_PARTAGE) : avec un cache mémoire par processus,
+# l'invalidation n'atteindrait que le worker qui a fait l'écriture.
+def ttl_partage(ttl):
+    return ttl if getattr(settings, 'CACHE_PARTAGE', False) else 0
+
+
+# =========================================================
+# ÉTAT DES TABLES (écran serveur)
+# =========================================================
+# {table_id: (derniere_commande_id, statut)} — (None, None) = libre.
+# Une clé par table : deux commandes validées en même temps sur deux tables
+# différentes n'écrivent pas la même entrée.
+TTL_ETATS_TABLES = 60
+
+
+def _cle_etat_table(table_id):
+    return f'gestion:etat_table:{table_id}'
+
+
+def _etat(table):
+    return (table.derniere_commande_id, table.derniere_commande_statut)
+
+
+def etats_tables(table_ids):
+    ttl = ttl_partage(TTL_ETATS_TABLES)
+    cles = {_cle_etat_table(table_id): table_id for table_id in table_ids}
+    etats = {cles[cle]: etat for cle, etat in cache.get_many(list(cles)).items()} if ttl else {}
+    manquantes = [table_id for table_id in table_ids if table_id not in etats]
+    if manquantes:
+        tables = TableRestaurant.objects.avec_etat().only('id')
+        if len(manquantes) < len(cles):
+            tables = tables.filter(id__in=manquantes)
+        calcules = {table.id: _etat(table) for table in tables}
+        etats.update(calcules)
+        if ttl:
+            cache.set_many({_cle_etat_table(table_id): etat for table_id, etat in calcules.items()}, ttl)
+    return etats
+
+
+def maj_etat_table(tablette_id):
+    """Recalcule l'état en cache de la table d'une tablette."""
+    ttl = ttl_partage(TTL_ETATS_TABLES)
+    if not ttl:
+        return
+    table = TableRestaurant.objects.avec_etat().filter(tablette__id=tablette_id).only('id').first()
+    if table is None:
+        # Tablette supprimée entre-temps : sa table n'est plus retrouvable
+        invalider_etats_tables()
+        return
+    cache.set(_cle_etat_table(table.id), _etat(table), ttl)
+
+
+def invalider_etats_tables():
+    cache.delete_many([_cle_etat_table(table_id) for table_id in TableRestaurant.objects.values_list('id', flat=True)])
+
+
+# =========================================================
+# PARC DE TABLETTES (vue admin)
+# =========================================================
+# Instantané invalidé à chaque changement de commande ou de panier.
+# FLOTTE_TABLETTES_TTL = 0 (ou un cache non partagé) désactive le cache.
+CLE_FLOTTE_TABLETTES = 'gestion:flotte_tablettes'
+
+
+def flotte_tablettes():
+    ttl = ttl_partage(getattr(settings, 'FLOTTE_TABLETTES_TTL', 30))
+    flotte = cache.get(CLE_FLOTTE_TABLETTES) if ttl else None
+    if flotte is None:
+        tablettes = list(
+            Tablette.objects.avec_activite()
+            .select_related('table')
+            .order_by('table__numero_table')
+        )
+        occupees = sum(1 for t in tablettes if t.en_utilisation)
+        flotte = {
+            'tablettes': tablettes,
+            'taux_occupation': round(occupees / len(tablettes) * 100) if tablettes else 0,
+        }
+        if ttl:
+            cache.set(CLE_FLOTTE_TABLETTES, flotte, ttl)
+    return flotte
+
+
+def invalider_flotte_tablettes():
+    cache.delete(CLE_FLOTTE_TABLETTES)
+
+
+# =========================================================
+# MEILLEURES VENTES
+# =========================================================
+# Classements lus dans VentePlatJour (une ligne par plat et par jour),
+# recalculés au plus une fois par TTL. La clé inclut la date du jour :
+# les fenêtres glissent d'elles-mêmes à minuit.
+TTL_MEILLEURES_VENTES = 60
+CLASSEMENT_TAILLE = 10
+FENETRES_VENTES = {'jour': 0, 'semaine': 6, 'total': None}
+
+
+def meilleures_ventes(fenetre='total', nombre=3):
+    """[{plat_id, nom, quantite, recettes}] des plats les plus vendus sur la fenêtre."""
+    aujourd_hui = timezone.localdate()
+    cle = f'gestion:meilleures_ventes:{fenetre}:{aujourd_hui.isoformat()}'
+    classement = cache.get(cle)
+    if classement is None:
+        jours = FENETRES_VENTES[fenetre]
+        depuis = None if jours is None else aujourd_hui - timedelta(days=jours)
+        classement = VentePlatJour.objects.meilleures(depuis, CLASSEMENT_TAILLE)
+        cache.set(cle, classement, TTL_MEILLEURES_VENTES)
+    return classement[:nombre]
+
+
+# =========================================================
+# MENU RENDU
+# =========================================================
+# Fragment HTML de la carte, par version du menu et par rôle. Une nouvelle
+# version change la clé : les anciens fragments expirent simplement.
+TTL_MENU = 60 * 60 * 24
+
+
+def menu_rendu(version, role, rendre):
+    cle = f'gestion:menu:{version}:{role}'
+    html = cache.get(cle)
+    if html is None:
+        html = rendre()
+        cache.set(cle, html, TTL_MENU)
+    return html
+
+
+# =========================================================
+# FILE DE LA CUISINE
+# =========================================================
+# Regroupement par plat, par dernier événement de commande publié : tant
+# qu'aucune commande n'est créée, servie ou supprimée, tous les écrans
+# cuisine lisent la même entrée.
+TTL_FILE_CUISINE = 60 * 10
+
+
+def file_cuisine(evenement_id):
+    cle = f'gestion:cuisine:{evenement_id}'
+    file = cache.get(cle)
+    if file is None:
+        file = LigneCuisine.objects.par_plat()
+        cache.set(cle, file, TTL_FILE_CUISINE)
+    return file
+
+
+# =========================================================
+# STOCK DES PLATS (panier en cache)
+# =========================================================
+# {plat_id: (nom, prix_unitaire, quantite_disponible)} par version du menu :
+# toute variation de stock incrémente la version, donc change la clé.
+def stock_plats(version):
+    cle = f'gestion:stock:{version}'
+    stock = cache.get(cle)
+    if stock is None:
+        stock = {
+            plat_id: (nom, prix, quantite)
+            for plat_id, nom, prix, quantite in Plat.objects.values_list(
+                'id', 'nom', 'prix_unitaire', 'quantite_disponible'
+            )
+        }
+        cache.set(cle, stock, TTL_MENU)
+    return stock
+
+
+# =========================================================
+# TABLETTE DE L'UTILISATEUR (TabletteMiddleware)
+# =========================================================
+# Tablette (avec sa table) d'un compte tablette, ou False si aucune.
+# Invalidée à chaque enregistrement de la tablette (blocage par l'admin…) ;
+# TABLETTE_CONTEXTE_TTL = 0 (ou un cache non partagé) désactive le cache.
+def _cle_tablette(user_id):
+    return f'gestion:tablette:{user_id}'
+
+
+def tablette_de(user_id):
+    ttl = ttl_partage(getattr(settings, 'TABLETTE_CONTEXTE_TTL', 30))
+    tablette = cache.get(_cle_tablette(user_id)) if ttl else None
+    if tablette is None:
+        tablette = Tablette.objects.select_related('table').filter(user_id=user_id).first() or False
+        if ttl:
+            cache.set(_cle_tablette(user_id), tablette, ttl)
+    return tablette or None
+
+
+def invalider_tablette(user_id):
+    cache.delete(_cle_tablette(user_id))
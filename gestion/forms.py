@@ -1,4 +1,5 @@
 from django import forms
+from .images import generer_variantes, variantes_manquantes
 from .models import TableRestaurant,Plat
 
 class TableRestaurantForm(forms.ModelForm):
@@ -11,3 +12,11 @@ class PlatForm(forms.ModelForm):
     class Meta:
         model = Plat
         fields = ['nom', 'prix_unitaire', 'image','quantite_disponible', 'disponible']
+
+    def save(self, commit=True):
+        plat = super().save(commit)
+        # Variantes redimensionnées pour les cartes du menu (srcset). Une photo
+        # déjà connue garde son nom (stockage par contenu) et ses variantes.
+        if commit and plat.image and 'image' in self.changed_data and variantes_manquantes(plat.image.name):
+            generer_variantes(plat.image)
+        return plat
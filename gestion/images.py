@@ -0,0 +1,94 @@
+# =========================================================
+# images.py — Variantes redimensionnées des photos de plats
+# =========================================================
+# Chaque photo est déclinée en largeurs fixes, en WebP et en JPEG, à côté
+# de l'original : plats/burger.jpg -> plats/variantes/burger-carte-1a2b3c4d.webp …
+# Le suffixe hexadécimal signe la largeur et les réglages d'encodage : les
+# variantes sont servies « immutable », changer VARIANTES ou FORMATS doit
+# donc produire de nouvelles URL plutôt que réécrire les anciennes.
+# Les templates les servent via srcset ; l'original reste le repli.
+
+import hashlib
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Nom de variante -> largeur maximale en pixels (jamais d'agrandissement)
+VARIANTES = {
+    'miniature': 240,
+    'carte': 480,
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+DOSSIER = 'variantes'
+LONGUEUR_SIGNATURE = 8
+
+
+def signature(variante, extension):
+    """Empreinte courte des paramètres qui déterminent les octets d'une variante."""
+    reglages = sorted(FORMATS[extension].items())
+    return hashlib.sha256(repr((VARIANTES[variante], reglages)).encode()).hexdigest()[:LONGUEUR_SIGNATURE]
+
+
+def chemin_variante(nom, variante, extension):
+    dossier, fichier = posixpath.split(nom)
+    base = posixpath.splitext(fichier)[0]
+    return posixpath.join(
+        dossier, DOSSIER, f"{base}-{variante}-{signature(variante, extension)}.{extension}"
+    )
+
+
+def _encoder(image, extension):
+    if extension == 'jpg' and image.mode != 'RGB':
+        # Le JPEG n'a pas de transparence : on aplatit sur fond blanc
+        fond = Image.new('RGB', image.size, 'white')
+        image = image.convert('RGBA')
+        fond.paste(image, mask=image.getchannel('A'))
+        image = fond
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    tampon = BytesIO()
+    image.save(tampon, **FORMATS[extension])
+    return tampon.getvalue()
+
+
+def generer_variantes(fichier, storage=default_storage):
+    """Crée (ou remplace) toutes les variantes d'un fichier image stocké.
+
+    Un nom donné correspond toujours aux mêmes réglages : le remplacer
+    (--force) réencode la même image, il ne change ni taille ni qualité.
+    """
+    with storage.open(fichier.name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    crees = []
+    for variante, largeur in VARIANTES.items():
+        image = original.copy()
+        image.thumbnail((largeur, largeur * 4), Image.LANCZOS)
+        for extension in FORMATS:
+            chemin = chemin_variante(fichier.name, variante, extension)
+            if storage.exists(chemin):
+                storage.delete(chemin)
+            crees.append(storage.save(chemin, ContentFile(_encoder(image, extension))))
+    return crees
+
+
+def variantes_manquantes(nom, storage=default_storage):
+    return any(
+        not storage.exists(chemin_variante(nom, variante, extension))
+        for variante in VARIANTES for extension in FORMATS
+    )
+
+
+def srcset(nom, extension, storage=default_storage):
+    """'url-miniature 240w, url-carte 480w' pour un attribut srcset."""
+    return ", ".join(
+        f"{storage.url(chemin_variante(nom, variante, extension))} {largeur}w"
+        for variante, largeur in VARIANTES.items()
+    )
@@ -0,0 +1,65 @@
+# =========================================================
+# jetons.py — Jetons de connexion des tablettes (QR codes)
+# =========================================================
+# Le QR code porte un jeton signé HMAC (SECRET_KEY) au lieu d'un mot de
+# passe : la vérification coûte quelques microsecondes et une requête,
+# sans passer par le hacheur de mots de passe.
+#
+# Le jeton est déterministe pour une tablette donnée (l'image du QR code
+# reste en cache) et cesse d'être valide quand :
+#   - la tablette est bloquée (is_blocked) ou son compte désactivé ;
+#   - le mot de passe du compte tablette change ;
+#   - il a été émis il y a plus de TABLETTE_JETON_JOURS jours, ou les
+#     jetons ont été renouvelés depuis l'administration.
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import Tablette
+
+SEL = 'gestion.jetons.tablette'
+
+
+class JetonInvalide(Exception):
+    pass
+
+
+def _signataire():
+    return signing.Signer(salt=SEL)
+
+
+def _empreinte_mot_de_passe(user):
+    # Dérivée du hash stocké : aucun calcul PBKDF2
+    return salted_hmac(SEL, user.password).hexdigest()[:16]
+
+
+def jeton_tablette(tablette):
+    emis = int(tablette.jeton_emis_le.timestamp())
+    return _signataire().sign(f"{tablette.pk}.{emis}.{_empreinte_mot_de_passe(tablette.user)}")
+
+
+def tablette_du_jeton(jeton):
+    """Tablette désignée par un jeton valide ; lève JetonInvalide sinon."""
+    try:
+        pk, emis, empreinte = _signataire().unsign(jeton).split('.')
+        pk, emis = int(pk), int(emis)
+    except (signing.BadSignature, ValueError):
+        raise JetonInvalide("QR code invalide. Demandez-en un nouveau au personnel.")
+
+    tablette = Tablette.objects.select_related('user', 'table').filter(pk=pk).first()
+    if (
+        tablette is None
+        or tablette.user.role != 'tablette'
+        or int(tablette.jeton_emis_le.timestamp()) != emis
+        or not constant_time_compare(empreinte, _empreinte_mot_de_passe(tablette.user))
+    ):
+        raise JetonInvalide("Ce QR code a été révoqué. Demandez-en un nouveau au personnel.")
+    if tablette.jeton_emis_le + timedelta(days=settings.TABLETTE_JETON_JOURS) < timezone.now():
+        raise JetonInvalide("Ce QR code a expiré. Demandez-en un nouveau au personnel.")
+    if tablette.is_blocked or not tablette.user.is_active:
+        raise JetonInvalide("Cette tablette est temporairement bloquée par l'administrateur.")
+    return tablette
@@ -0,0 +1,113 @@
+# =========================================================
+# bench_commandes — validation concurrente des paniers
+# =========================================================
+# Simule N tablettes qui valident leur panier en même temps sur le même
+# plat, puis vérifie qu'aucune portion n'a été vendue en trop.
+# À lancer sur une base de test : les données "bench-*" sont supprimées à la fin.
+# Sous SQLite les écritures sont sérialisées (erreurs "database is locked"
+# comptées dans "Erreurs") : les chiffres utiles s'obtiennent sur MySQL/PostgreSQL.
+
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, close_old_connections
+from django.db.models import Sum
+
+from gestion.models import (
+    CustomUser, TableRestaurant, Tablette,
+    Plat, PanierItem, Commande, CommandeItem, StockInsuffisant
+)
+
+PREFIXE = 'bench-'
+NUMERO_TABLE_DEPART = 900000
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit de validation des paniers et vérifie l'absence de survente."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tablettes', type=int, default=30, help="Nombre de tablettes simultanées.")
+        parser.add_argument('--commandes', type=int, default=5, help="Commandes par tablette.")
+        parser.add_argument('--quantite', type=int, default=2, help="Portions par commande.")
+        parser.add_argument('--stock', type=int, default=200, help="Stock initial du plat.")
+
+    def handle(self, *args, **options):
+        nb_tablettes = options['tablettes']
+        nb_commandes = options['commandes']
+        quantite = options['quantite']
+        stock_initial = options['stock']
+
+        self._nettoyer()
+        plat = Plat.objects.create(
+            nom=f"{PREFIXE}plat",
+            prix_unitaire=Decimal('10000'),
+            quantite_disponible=stock_initial,
+        )
+        tablettes = []
+        for i in range(nb_tablettes):
+            user = CustomUser.objects.create_user(f"{PREFIXE}{i}", role='tablette')
+            table = TableRestaurant.objects.create(
+                numero_table=NUMERO_TABLE_DEPART + i, nombre_places=4
+            )
+            tablettes.append(Tablette.objects.create(user=user, table=table))
+
+        resultats = {'ok': 0, 'refus': 0, 'erreurs': 0}
+        verrou = threading.Lock()
+        depart = threading.Barrier(nb_tablettes)
+
+        def tablette_worker(tablette):
+            try:
+                depart.wait()
+                for _ in range(nb_commandes):
+                    try:
+                        PanierItem.objects.update_or_create(
+                            tablette=tablette, plat=plat, defaults={'quantite': quantite}
+                        )
+                        commande = Commande.objects.creer_depuis_panier(tablette)
+                        cle = 'ok' if commande else 'refus'
+                    except StockInsuffisant:
+                        PanierItem.objects.filter(tablette=tablette).delete()
+                        cle = 'refus'
+                    except Exception:
+                        cle = 'erreurs'
+                    with verrou:
+                        resultats[cle] += 1
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=tablette_worker, args=(t,)) for t in tablettes]
+        debut = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duree = time.perf_counter() - debut
+
+        plat.refresh_from_db()
+        vendu = CommandeItem.objects.filter(plat=plat).aggregate(Sum('quantite'))['quantite__sum'] or 0
+        survente = vendu + plat.quantite_disponible - stock_initial
+
+        self.stdout.write(f"Base            : {connection.vendor}")
+        self.stdout.write(f"Tablettes       : {nb_tablettes} × {nb_commandes} commandes")
+        self.stdout.write(f"Durée           : {duree:.2f} s")
+        self.stdout.write(f"Commandes/s     : {resultats['ok'] / duree:.1f}")
+        self.stdout.write(f"Validées        : {resultats['ok']}")
+        self.stdout.write(f"Refusées (stock): {resultats['refus']}")
+        self.stdout.write(f"Erreurs         : {resultats['erreurs']}")
+        self.stdout.write(f"Portions vendues: {vendu} / stock initial {stock_initial} (reste {plat.quantite_disponible})")
+
+        self._nettoyer()
+
+        if survente != 0 or vendu > stock_initial:
+            self.stderr.write(self.style.ERROR(f"SURVENTE détectée : écart de {survente} portion(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Aucune survente."))
+
+    def _nettoyer(self):
+        Commande.objects.filter(tablette__user__identifiant__startswith=PREFIXE).delete()
+        CustomUser.objects.filter(identifiant__startswith=PREFIXE).delete()
+        TableRestaurant.objects.filter(numero_table__gte=NUMERO_TABLE_DEPART).delete()
+        Plat.objects.filter(nom__startswith=PREFIXE).delete()
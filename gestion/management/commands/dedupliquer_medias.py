@@ -0,0 +1,83 @@
+# =========================================================
+# dedupliquer_medias — photos de plats adressées par contenu
+# =========================================================
+# Chaque ré-envoi d'une photo créait une copie (pizza_7GQCuLZ.png…).
+# La commande regroupe les fichiers identiques de media/plats/, garde une
+# seule copie nommée d'après son empreinte, repointe les plats dessus puis
+# supprime les doublons et leurs variantes.
+
+import posixpath
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from gestion.images import FORMATS, VARIANTES, chemin_variante, generer_variantes, variantes_manquantes
+from gestion.models import Plat, VersionMenu
+from gestion.storage import empreinte, nom_adresse, stockage_par_contenu
+
+DOSSIER = 'plats'
+
+
+class Command(BaseCommand):
+    help = "Renomme les photos de plats d'après leur contenu et supprime les copies identiques."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Affiche ce qui serait fait sans rien modifier.",
+        )
+
+    def handle(self, *args, **options):
+        stockage = stockage_par_contenu
+        if not stockage.exists(DOSSIER):
+            self.stdout.write("Aucun dossier media/plats/.")
+            return
+
+        groupes = defaultdict(list)
+        for fichier in sorted(stockage.listdir(DOSSIER)[1]):
+            nom = posixpath.join(DOSSIER, fichier)
+            with stockage.open(nom, 'rb') as contenu:
+                groupes[empreinte(contenu)].append(nom)
+
+        renommes, supprimes, octets = 0, 0, 0
+        for hash_contenu, noms in groupes.items():
+            canonique = nom_adresse(noms[0], hash_contenu)
+            anciens = [nom for nom in noms if nom != canonique]
+            if not anciens:
+                continue
+            self.stdout.write(f"{', '.join(anciens)} -> {canonique}")
+            if options['dry_run']:
+                continue
+
+            # 1. La copie canonique existe avant de toucher à la base
+            if not stockage.exists(canonique):
+                with stockage.open(anciens[0], 'rb') as contenu:
+                    stockage.save(anciens[0], contenu)
+            # 2. Les plats pointent sur la copie canonique
+            with transaction.atomic():
+                renommes += Plat.objects.filter(image__in=anciens).update(image=canonique)
+            # 3. Les doublons et leurs variantes peuvent disparaître
+            for nom in anciens:
+                octets += stockage.size(nom)
+                stockage.delete(nom)
+                supprimes += 1
+                for variante in VARIANTES:
+                    for extension in FORMATS:
+                        chemin = chemin_variante(nom, variante, extension)
+                        if stockage.exists(chemin):
+                            stockage.delete(chemin)
+
+        if options['dry_run']:
+            return
+
+        for plat in Plat.objects.exclude(image='').exclude(image__isnull=True).iterator():
+            if stockage.exists(plat.image.name) and variantes_manquantes(plat.image.name):
+                generer_variantes(plat.image)
+        if renommes or supprimes:
+            VersionMenu.objects.incrementer()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{supprimes} fichier(s) supprimé(s) ({octets // 1024} Ko libérés), "
+            f"{renommes} plat(s) repointé(s)."
+        ))
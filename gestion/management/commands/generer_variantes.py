@@ -0,0 +1,41 @@
+# =========================================================
+# generer_variantes — miniatures WebP/JPEG des photos de plats
+# =========================================================
+# Les nouveaux envois passent par PlatForm qui crée les variantes ;
+# cette commande rattrape les images déjà présentes dans media/. Après un
+# changement de VARIANTES ou FORMATS, les noms signés (images.py) changent
+# aussi : les nouvelles variantes sont « manquantes » et générées sans --force.
+
+from django.core.management.base import BaseCommand
+
+from gestion.images import generer_variantes, variantes_manquantes
+from gestion.models import Plat, VersionMenu
+
+
+class Command(BaseCommand):
+    help = "Génère les variantes redimensionnées (WebP/JPEG) des photos de plats."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Régénère aussi les variantes déjà présentes.",
+        )
+
+    def handle(self, *args, **options):
+        generees, erreurs = 0, 0
+        for plat in Plat.objects.exclude(image='').exclude(image__isnull=True).iterator():
+            if not options['force'] and not variantes_manquantes(plat.image.name):
+                continue
+            try:
+                generer_variantes(plat.image)
+                generees += 1
+            except (OSError, ValueError) as e:
+                erreurs += 1
+                self.stderr.write(f"{plat.image.name} : {e}")
+
+        if generees:
+            # Les fragments du menu en cache pointent encore vers les originaux
+            VersionMenu.objects.incrementer()
+        self.stdout.write(self.style.SUCCESS(
+            f"{generees} image(s) traitée(s), {erreurs} erreur(s)."
+        ))
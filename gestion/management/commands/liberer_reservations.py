@@ -0,0 +1,25 @@
+# =========================================================
+# liberer_reservations — balayage des réservations expirées
+# =========================================================
+# Les réservations expirées sont déjà rendues au fil des ajouts au panier ;
+# à lancer périodiquement (cron) pour libérer le stock en heures creuses.
+
+from django.core.management.base import BaseCommand
+
+from gestion.models import ReservationStock
+
+
+class Command(BaseCommand):
+    help = "Libère les portions retenues par des paniers abandonnés."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recalculer', action='store_true',
+            help="Recalcule aussi le compteur de portions réservées de tous les plats (hors service).",
+        )
+
+    def handle(self, *args, **options):
+        liberees = ReservationStock.objects.liberer_expirees()
+        if options['recalculer']:
+            ReservationStock.objects.recalculer()
+        self.stdout.write(self.style.SUCCESS(f"{liberees} réservation(s) expirée(s) libérée(s)."))
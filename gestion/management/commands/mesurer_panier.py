@@ -0,0 +1,119 @@
+# =========================================================
+# mesurer_panier — formulaires (302 + page) contre API JSON
+# =========================================================
+# Rejoue des rafales de clics « Commander » sur une tablette fictive :
+#   - formulaire : POST ajouter_au_panier puis rechargement de la carte,
+#     pour chaque clic (comportement sans JavaScript) ;
+#   - api        : un seul POST tablette/api/panier/ par rafale.
+# Tout est fait dans une transaction annulée, avec un cache local : la base
+# et le cache partagé ne sont pas modifiés.
+
+from decimal import Decimal
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from gestion.models import CustomUser, Plat, TableRestaurant, Tablette
+
+NB_PLATS = 12
+
+
+def centile(valeurs, p):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = "Compare le panier par formulaires (302 + page complète) et l'API JSON par lots."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rafales', type=int, default=20, help="Nombre de rafales mesurées.")
+        parser.add_argument('--clics', type=int, default=5, help="Clics « Commander » par rafale.")
+        parser.add_argument(
+            '--backend', choices=['bd', 'cache'],
+            help="Stockage du panier (défaut : PANIER_BACKEND).",
+        )
+
+    def handle(self, *args, **options):
+        reglages = override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'mesurer_panier',
+            }},
+            PANIER_BACKEND=options['backend'] or settings.PANIER_BACKEND,
+        )
+        with reglages, transaction.atomic():
+            resultats = self.mesurer(options['rafales'], options['clics'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{options['rafales']} rafales de {options['clics']} clics "
+            f"(panier '{options['backend'] or settings.PANIER_BACKEND}')"
+        )
+        self.stdout.write(
+            f"{'flux':<12}{'req. HTTP':>10}{'Ko':>10}{'req. SQL':>10}"
+            f"{'ms p50':>10}{'ms p95':>10}   (par rafale)"
+        )
+        for flux, mesures in resultats.items():
+            n = len(mesures['ms'])
+            self.stdout.write(
+                f"{flux:<12}{mesures['http'] / n:>10.1f}{mesures['octets'] / n / 1024:>10.1f}"
+                f"{mesures['sql'] / n:>10.1f}{centile(mesures['ms'], 50):>10.1f}{centile(mesures['ms'], 95):>10.1f}"
+            )
+
+    def mesurer(self, rafales, clics):
+        suffixe = uuid.uuid4().hex[:8]
+        plats = Plat.objects.bulk_create(
+            Plat(nom=f"Mesure {i}", prix_unitaire=Decimal('10000'), quantite_disponible=10 ** 6)
+            for i in range(NB_PLATS)
+        )
+        numero = (TableRestaurant.objects.order_by('-numero_table').values_list('numero_table', flat=True).first() or 0) + 1
+        user = CustomUser.objects.create_user(f'mesure-{suffixe}', role='tablette')
+        Tablette.objects.create(
+            user=user, table=TableRestaurant.objects.create(numero_table=numero, nombre_places=4)
+        )
+        client = Client()
+        client.force_login(user)
+        url_menu = reverse('cuisinier_index')
+        url_api = reverse('api_panier')
+        client.get(url_menu)
+
+        def rafale_formulaire(plats_rafale):
+            reponses = []
+            for plat in plats_rafale:
+                reponses.append(client.post(
+                    reverse('ajouter_au_panier', args=[plat.id]), {'quantite': 1}, HTTP_REFERER=url_menu,
+                ))
+                reponses.append(client.get(url_menu))
+            return reponses
+
+        def rafale_api(plats_rafale):
+            quantites = {}
+            for plat in plats_rafale:
+                quantites[plat.id] = quantites.get(plat.id, 0) + 1
+            return [client.post(url_api, json.dumps({'quantites': quantites}), content_type='application/json')]
+
+        resultats = {}
+        for flux, rejouer in (('formulaire', rafale_formulaire), ('api', rafale_api)):
+            mesures = resultats[flux] = {'http': 0, 'octets': 0, 'sql': 0, 'ms': []}
+            for r in range(rafales):
+                # Panier vidé entre deux rafales : chaque rafale part de zéro
+                client.post(url_api, json.dumps({'quantites': {p.id: 0 for p in plats}}), content_type='application/json')
+                plats_rafale = [plats[(r * clics + k) % NB_PLATS] for k in range(clics)]
+
+                with CaptureQueriesContext(connection) as requetes:
+                    debut = time.perf_counter()
+                    reponses = rejouer(plats_rafale)
+                    mesures['ms'].append((time.perf_counter() - debut) * 1000)
+                mesures['http'] += len(reponses)
+                mesures['octets'] += sum(len(reponse.content) for reponse in reponses)
+                mesures['sql'] += len(requetes)
+        return resultats
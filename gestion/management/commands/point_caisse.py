@@ -0,0 +1,22 @@
+# =========================================================
+# point_caisse — pose un point de caisse
+# =========================================================
+# À planifier (cron) pour que le calcul du solde ne relise
+# qu'une petite fin de journal.
+
+from django.core.management.base import BaseCommand
+
+from gestion.models import CaisseMouvement
+
+
+class Command(BaseCommand):
+    help = "Pose un point de caisse à partir du journal des mouvements."
+
+    def handle(self, *args, **options):
+        point = CaisseMouvement.objects.poser_point()
+        if point is None:
+            self.stdout.write("Aucun mouvement à intégrer.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Point de caisse : {point.solde_actuel} FG (mouvement #{point.mouvement_id})"
+        ))
@@ -0,0 +1,81 @@
+# =========================================================
+# recalculer_statistiques — reconstruit les cumuls journaliers
+# =========================================================
+# Les cumuls sont tenus à jour par les signaux ; cette commande les
+# recalcule entièrement depuis l'historique (après un import, une
+# modification en base hors application…). Quelques requêtes GROUP BY,
+# puis une réécriture en masse dans une seule transaction.
+
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+
+from gestion.models import (
+    Commande, CommandeItem, Depense, Paiement, StatistiqueHeure, StatistiqueJour,
+    VentePlatJour,
+)
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques journalières, horaires et les ventes par plat depuis l'historique."
+
+    def handle(self, *args, **options):
+        jours = defaultdict(dict)
+        heures = defaultdict(dict)
+
+        par_jour = {'jour': TruncDate('date')}
+        par_heure = {'jour': TruncDate('date'), 'heure': ExtractHour('date')}
+
+        for ligne in Commande.objects.annotate(**par_jour).values('jour').annotate(
+            nb_commandes=Count('id'), couverts=Sum('tablette__table__nombre_places'),
+        ):
+            jours[ligne.pop('jour')].update(ligne)
+        for ligne in Paiement.objects.annotate(**par_jour).values('jour').annotate(
+            recettes=Sum('montant'), nb_paiements=Count('id'),
+        ):
+            jours[ligne.pop('jour')].update(ligne)
+        for ligne in Depense.objects.annotate(**par_jour).values('jour').annotate(
+            depenses=Sum('montant'), nb_depenses=Count('id'),
+        ):
+            jours[ligne.pop('jour')].update(ligne)
+
+        for ligne in Commande.objects.annotate(**par_heure).values('jour', 'heure').annotate(
+            nb_commandes=Count('id'),
+        ):
+            heures[(ligne.pop('jour'), ligne.pop('heure'))].update(ligne)
+        for ligne in Paiement.objects.annotate(**par_heure).values('jour', 'heure').annotate(
+            recettes=Sum('montant'),
+        ):
+            heures[(ligne.pop('jour'), ligne.pop('heure'))].update(ligne)
+
+        ventes = list(
+            CommandeItem.objects.annotate(jour=TruncDate('commande__date'))
+            .values('plat_id', 'jour')
+            # recettes d'abord : F('quantite') doit viser la colonne, pas l'agrégat
+            .annotate(recettes=Sum(F('quantite') * F('prix_unitaire')), quantite=Sum('quantite'))
+        )
+
+        with transaction.atomic():
+            StatistiqueJour.objects.all().delete()
+            StatistiqueHeure.objects.all().delete()
+            VentePlatJour.objects.all().delete()
+            StatistiqueJour.objects.bulk_create(
+                [StatistiqueJour(jour=jour, **totaux) for jour, totaux in jours.items()],
+                batch_size=500,
+            )
+            StatistiqueHeure.objects.bulk_create(
+                [StatistiqueHeure(jour=jour, heure=heure, **totaux)
+                 for (jour, heure), totaux in heures.items()],
+                batch_size=500,
+            )
+            VentePlatJour.objects.bulk_create(
+                [VentePlatJour(**vente) for vente in ventes], batch_size=500,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(jours)} jour(s), {len(heures)} tranche(s) horaire(s) "
+            f"et {len(ventes)} ligne(s) de ventes par plat recalculés."
+        ))
@@ -0,0 +1,302 @@
+# =========================================================
+# simuler_service — charge d'un service du soir complet
+# =========================================================
+# Des fils simulent en parallèle, par HTTP :
+#   - N tablettes : carte, ajouts au panier, panier, validation ;
+#   - les serveurs : écran serveur, commande servie, paiement ;
+#   - un comptable : rafraîchissement de l'écran comptable.
+# Par défaut l'application tourne dans un serveur WSGI multi-fils lancé par
+# la commande (comme runserver) : les requêtes SQL de chaque vue y sont
+# comptées. Avec --url, la charge vise un serveur existant (gunicorn…) qui
+# partage la même base ; les requêtes SQL ne sont alors pas comptées.
+# À lancer sur une base de test : les données "simu-*" sont supprimées à la
+# fin et les paiements simulés sont annulés dans le journal de caisse par un
+# mouvement inverse (le journal ne se réécrit pas).
+# Sous SQLite les écritures sont sérialisées : erreurs "database is locked"
+# possibles dès quelques dizaines de tablettes.
+
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.urls import Resolver404, resolve, reverse
+
+from gestion.jetons import jeton_tablette
+from gestion.models import CaisseMouvement, Commande, CustomUser, Plat, TableRestaurant, Tablette
+
+PREFIXE = 'simu-'
+NUMERO_TABLE_DEPART = 800000
+MOT_DE_PASSE = 'simu-service'
+
+
+def centile(valeurs, p):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p / 100))]
+
+
+class Mesures:
+    """Durées (ms), statuts HTTP et requêtes SQL par nom d'URL, partagés entre fils."""
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.durees = defaultdict(list)
+        self.erreurs = Counter()
+        self.requetes_sql = Counter()
+
+    def appel(self, nom, duree, statut):
+        with self.verrou:
+            self.durees[nom].append(duree)
+            if not 200 <= statut < 400:
+                self.erreurs[nom] += 1
+
+    def sql(self, nom, nombre):
+        with self.verrou:
+            self.requetes_sql[nom] += nombre
+
+
+class AppliComptee:
+    """Application WSGI qui compte les requêtes SQL de chaque vue."""
+
+    def __init__(self, appli, mesures):
+        self.appli = appli
+        self.mesures = mesures
+
+    def __call__(self, environ, start_response):
+        try:
+            nom = resolve(environ['PATH_INFO']).url_name
+        except Resolver404:
+            nom = None
+        nombre = 0
+
+        def compter(execute, sql, params, many, context):
+            nonlocal nombre
+            nombre += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(compter):
+            reponse = self.appli(environ, start_response)
+            try:
+                # Réponses en flux : le contenu est produit ici, sous le compteur
+                corps = b''.join(reponse)
+            finally:
+                reponse.close()
+        if nom:
+            self.mesures.sql(nom, nombre)
+        return [corps]
+
+
+class RequetesSilencieuses(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class SansRedirection(HTTPRedirectHandler):
+    # Chaque appel mesuré est une seule requête HTTP : le scénario enchaîne
+    # lui-même la page suivante
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Navigateur:
+    def __init__(self, base_url, mesures):
+        self.base_url = base_url
+        self.mesures = mesures
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), SansRedirection)
+
+    def csrf(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+    def appeler(self, nom, args=(), donnees=None, parametres=None):
+        url = self.base_url + reverse(nom, args=args)
+        if parametres:
+            url += '?' + urlencode(parametres)
+        requete = Request(url)
+        if donnees is not None:
+            requete.data = urlencode({**donnees, 'csrfmiddlewaretoken': self.csrf()}).encode()
+            requete.add_header('Referer', url)
+
+        debut = time.perf_counter()
+        try:
+            with self.opener.open(requete, timeout=30) as reponse:
+                reponse.read()
+                statut = reponse.status
+        except HTTPError as e:
+            e.read()
+            statut = e.code
+        except (URLError, OSError):
+            statut = 0
+        self.mesures.appel(nom, (time.perf_counter() - debut) * 1000, statut)
+        return statut
+
+    def connecter(self, identifiant):
+        self.appeler('login')
+        self.appeler('login', donnees={'identifiant': identifiant, 'password': MOT_DE_PASSE})
+
+
+class Command(BaseCommand):
+    help = "Simule un service complet (tablettes, serveurs, comptable) et mesure débit et latences par vue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tablettes', type=int, default=20, help="Nombre de tablettes simultanées.")
+        parser.add_argument('--serveurs', type=int, default=2, help="Nombre de serveurs.")
+        parser.add_argument('--duree', type=float, default=60, help="Durée du service simulé, en secondes.")
+        parser.add_argument(
+            '--pause', type=float, default=1.0,
+            help="Temps de réflexion moyen entre deux actions, en secondes.",
+        )
+        parser.add_argument('--plats', type=int, default=12, help="Nombre de plats à la carte.")
+        parser.add_argument(
+            '--url',
+            help="Serveur visé (ex. http://127.0.0.1:8000) ; par défaut un serveur local est lancé.",
+        )
+
+    def handle(self, *args, **options):
+        self.pause = options['pause']
+        mesures = Mesures()
+
+        self._nettoyer()
+        self.plats = list(Plat.objects.bulk_create(
+            Plat(nom=f"{PREFIXE}plat {i}", prix_unitaire=Decimal('10000') + 500 * i, quantite_disponible=10 ** 6)
+            for i in range(options['plats'])
+        ))
+        tablettes = []
+        for i in range(options['tablettes']):
+            user = CustomUser.objects.create_user(f"{PREFIXE}tab{i}", role='tablette')
+            table = TableRestaurant.objects.create(numero_table=NUMERO_TABLE_DEPART + i, nombre_places=4)
+            tablettes.append(Tablette.objects.create(user=user, table=table))
+        serveurs = [
+            CustomUser.objects.create_user(f"{PREFIXE}serveur{i}", MOT_DE_PASSE, role='serveur')
+            for i in range(options['serveurs'])
+        ]
+        comptable = CustomUser.objects.create_user(f"{PREFIXE}compta", MOT_DE_PASSE, role='comptable')
+
+        serveur_http = None
+        base_url = (options['url'] or '').rstrip('/')
+        if not base_url:
+            serveur_http = ThreadedWSGIServer(('127.0.0.1', 0), RequetesSilencieuses)
+            serveur_http.set_app(AppliComptee(get_internal_wsgi_application(), mesures))
+            threading.Thread(target=serveur_http.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{serveur_http.server_port}"
+
+        self.fin = threading.Event()
+        fils = (
+            [threading.Thread(target=self._tablette, args=(Navigateur(base_url, mesures), t)) for t in tablettes]
+            + [threading.Thread(target=self._serveur, args=(Navigateur(base_url, mesures), s)) for s in serveurs]
+            + [threading.Thread(target=self._comptable, args=(Navigateur(base_url, mesures), comptable))]
+        )
+        debut = time.perf_counter()
+        for f in fils:
+            f.start()
+        time.sleep(options['duree'])
+        self.fin.set()
+        for f in fils:
+            f.join()
+        duree = time.perf_counter() - debut
+        if serveur_http:
+            serveur_http.shutdown()
+            serveur_http.server_close()
+
+        statuts = Counter(
+            Commande.objects.filter(tablette__in=tablettes).values_list('statut', flat=True)
+        )
+        self._rapport(mesures, duree, options, statuts, compter_sql=serveur_http is not None)
+        self._nettoyer()
+
+    # ---------------------------------------------------------
+    # Scénarios
+    # ---------------------------------------------------------
+    def _attendre(self, facteur=1):
+        self.fin.wait(random.uniform(0.5, 1.5) * self.pause * facteur)
+        return not self.fin.is_set()
+
+    def _tablette(self, navigateur, tablette):
+        navigateur.appeler('login', parametres={'t': jeton_tablette(tablette)})
+        while self._attendre():
+            navigateur.appeler('cuisinier_index')
+            for plat in random.sample(self.plats, random.randint(1, min(3, len(self.plats)))):
+                if not self._attendre():
+                    return
+                navigateur.appeler('ajouter_au_panier', [plat.id], {'quantite': random.randint(1, 2)})
+                navigateur.appeler('cuisinier_index')
+            if not self._attendre():
+                return
+            navigateur.appeler('voir_panier')
+            navigateur.appeler('valider_panier', donnees={})
+            # Le temps du repas avant la commande suivante
+            self._attendre(5)
+
+    def _serveur(self, navigateur, serveur):
+        navigateur.connecter(serveur.identifiant)
+        simulees = Commande.objects.filter(tablette__user__identifiant__startswith=PREFIXE).order_by('date', 'id')
+        while self._attendre():
+            navigateur.appeler('serveur_index')
+            # Un autre serveur peut avoir pris la commande entre-temps : 404 compté
+            commande_id = simulees.filter(statut='en_attente').values_list('id', flat=True).first()
+            if commande_id:
+                navigateur.appeler('serveur_valider_commande', [commande_id], {})
+            commande_id = simulees.filter(statut='servie').values_list('id', flat=True).first()
+            if commande_id:
+                navigateur.appeler('serveur_valider_paiement', [commande_id], {})
+
+    def _comptable(self, navigateur, comptable):
+        navigateur.connecter(comptable.identifiant)
+        while self._attendre(3):
+            navigateur.appeler('comptable_index')
+
+    # ---------------------------------------------------------
+    # Rapport
+    # ---------------------------------------------------------
+    def _rapport(self, mesures, duree, options, statuts, compter_sql):
+        total = sum(len(d) for d in mesures.durees.values())
+        self.stdout.write(f"Base            : {connection.vendor}")
+        self.stdout.write(
+            f"Service         : {options['tablettes']} tablettes, {options['serveurs']} serveur(s), "
+            f"1 comptable, {duree:.1f} s"
+        )
+        self.stdout.write(f"Requêtes HTTP   : {total} ({total / duree:.1f} req/s)")
+        self.stdout.write(
+            f"Commandes       : {sum(statuts.values())} validées, "
+            f"{statuts['servie'] + statuts['payee']} servies, {statuts['payee']} payées"
+        )
+        self.stdout.write('')
+        self.stdout.write(
+            f"{'vue':<28}{'req.':>7}{'req/s':>8}{'ms p50':>9}{'ms p95':>9}{'ms p99':>9}"
+            f"{'erreurs':>9}{'SQL':>9}{'SQL/req':>9}"
+        )
+        for nom in sorted(mesures.durees):
+            durees = mesures.durees[nom]
+            sql = mesures.requetes_sql[nom]
+            self.stdout.write(
+                f"{nom:<28}{len(durees):>7}{len(durees) / duree:>8.1f}"
+                f"{centile(durees, 50):>9.1f}{centile(durees, 95):>9.1f}{centile(durees, 99):>9.1f}"
+                f"{mesures.erreurs[nom]:>9}"
+                + (f"{sql:>9}{sql / len(durees):>9.1f}" if compter_sql else f"{'-':>9}{'-':>9}")
+            )
+        if compter_sql:
+            self.stdout.write(f"\nRequêtes SQL    : {sum(mesures.requetes_sql.values())}")
+
+    def _nettoyer(self):
+        with transaction.atomic():
+            # Repérés par leur serveur simulé, avant sa suppression (SET_NULL)
+            mouvements = CaisseMouvement.objects.filter(utilisateur__identifiant__startswith=PREFIXE)
+            totaux = mouvements.aggregate(nombre=Count('id'), montant=Sum('montant'))
+            if totaux['nombre']:
+                CaisseMouvement.objects.enregistrer(
+                    -totaux['montant'], 'annulation_paiement',
+                    f"Simulation de service : {totaux['nombre']} mouvement(s) annulé(s)",
+                )
+            Commande.objects.filter(tablette__user__identifiant__startswith=PREFIXE).delete()
+            CustomUser.objects.filter(identifiant__startswith=PREFIXE).delete()
+            TableRestaurant.objects.filter(numero_table__gte=NUMERO_TABLE_DEPART).delete()
+            Plat.objects.filter(nom__startswith=PREFIXE).delete()
@@ -0,0 +1,37 @@
+# =========================================================
+# middleware.py — Contexte de la tablette connectée
+# =========================================================
+# request.tablette est résolu une fois par requête, depuis le cache
+# (caches.tablette_de), pour les comptes tablette uniquement :
+#   - tablette bloquée  → déconnexion et retour à la page de connexion ;
+#   - tablette inactive → request.tablette = None, comme sans tablette.
+
+from django.contrib import messages
+from django.contrib.auth import logout
+from django.shortcuts import redirect
+
+from . import caches
+
+
+class TabletteMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.tablette = None
+        user = request.user
+        if user.is_authenticated and user.role == 'tablette':
+            tablette = caches.tablette_de(user.pk)
+            if tablette is not None and tablette.user_id != user.pk:
+                # Tablette ré-associée à un autre compte depuis la mise en cache
+                caches.invalider_tablette(user.pk)
+                tablette = caches.tablette_de(user.pk)
+
+            if tablette is not None and tablette.is_blocked:
+                logout(request)
+                messages.error(request, "Cette tablette a été bloquée par l'administrateur.")
+                return redirect('login')
+            if tablette is not None and tablette.active:
+                request.tablette = tablette
+
+        return self.get_response(request)
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 08:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0014_alter_tablette_qr_password'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='caisse',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='caisse',
+            name='mouvement_id',
+            field=models.PositiveBigIntegerField(db_index=True, default=0),
+        ),
+        migrations.CreateModel(
+            name='CaisseMouvement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('type_mouvement', models.CharField(choices=[('paiement', 'Paiement'), ('depense', 'Dépense'), ('annulation_paiement', 'Annulation paiement'), ('annulation_depense', 'Annulation dépense'), ('reinitialisation', 'Réinitialisation')], max_length=20)),
+                ('libelle', models.CharField(blank=True, max_length=200)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mouvements_caisse', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Mouvement de caisse',
+                'verbose_name_plural': 'Journal de caisse',
+            },
+        ),
+    ]
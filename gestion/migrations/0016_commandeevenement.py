@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0015_caisse_mouvement_journal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommandeEvenement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commande_id', models.PositiveBigIntegerField()),
+                ('type_evenement', models.CharField(choices=[('creee', 'Créée'), ('servie', 'Servie'), ('payee', 'Payée'), ('maj', 'Mise à jour'), ('supprimee', 'Supprimée')], max_length=10)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 09:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def indexer_sessions_existantes(apps, schema_editor):
+    # Décodage unique des sessions en cours pour amorcer l'index
+    from importlib import import_module
+    Session = apps.get_model('sessions', 'Session')
+    SessionUtilisateur = apps.get_model('gestion', 'SessionUtilisateur')
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+
+    sessions = {}
+    for session in Session.objects.filter(expire_date__gte=timezone.now()).iterator():
+        user_id = store.decode(session.session_data).get('_auth_user_id')
+        if user_id:
+            sessions[session.session_key] = (int(user_id), session.expire_date)
+
+    CustomUser = apps.get_model('gestion', 'CustomUser')
+    existants = set(CustomUser.objects.filter(
+        id__in={user_id for user_id, _ in sessions.values()}
+    ).values_list('id', flat=True))
+    index = [
+        SessionUtilisateur(session_key=cle, user_id=user_id, expire_date=expire_date)
+        for cle, (user_id, expire_date) in sessions.items()
+        if user_id in existants
+    ]
+    SessionUtilisateur.objects.bulk_create(index, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0016_commandeevenement'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionUtilisateur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=40, unique=True)),
+                ('expire_date', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions_index', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(indexer_sessions_existantes, migrations.RunPython.noop),
+    ]
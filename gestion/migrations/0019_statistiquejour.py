@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-18 10:25
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def calculer_statistiques(apps, schema_editor):
+    # Amorçage unique à partir de l'historique des paiements et dépenses
+    Paiement = apps.get_model('gestion', 'Paiement')
+    Depense = apps.get_model('gestion', 'Depense')
+    StatistiqueJour = apps.get_model('gestion', 'StatistiqueJour')
+
+    jours = defaultdict(lambda: {
+        'recettes': Decimal('0'), 'nb_paiements': 0,
+        'depenses': Decimal('0'), 'nb_depenses': 0,
+    })
+    for date, montant in Paiement.objects.values_list('date', 'montant').iterator():
+        ligne = jours[timezone.localdate(date)]
+        ligne['recettes'] += montant
+        ligne['nb_paiements'] += 1
+    for date, montant in Depense.objects.values_list('date', 'montant').iterator():
+        ligne = jours[timezone.localdate(date)]
+        ligne['depenses'] += montant
+        ligne['nb_depenses'] += 1
+
+    StatistiqueJour.objects.bulk_create(
+        [StatistiqueJour(jour=jour, **totaux) for jour, totaux in jours.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0018_commande_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(unique=True)),
+                ('recettes', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('nb_paiements', models.PositiveIntegerField(default=0)),
+                ('depenses', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('nb_depenses', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Statistique journalière',
+                'verbose_name_plural': 'Statistiques journalières',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='depense',
+            index=models.Index(fields=['date', 'id'], name='depense_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paiement',
+            index=models.Index(fields=['date', 'id'], name='paiement_date_id_idx'),
+        ),
+        migrations.RunPython(calculer_statistiques, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 6.0 on 2026-10-18 10:50
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def calculer_commandes_et_heures(apps, schema_editor):
+    # Amorçage des nouveaux compteurs à partir de l'historique
+    Commande = apps.get_model('gestion', 'Commande')
+    Paiement = apps.get_model('gestion', 'Paiement')
+    StatistiqueJour = apps.get_model('gestion', 'StatistiqueJour')
+    StatistiqueHeure = apps.get_model('gestion', 'StatistiqueHeure')
+
+    jours = defaultdict(lambda: {'nb_commandes': 0, 'couverts': 0})
+    heures = defaultdict(lambda: {'nb_commandes': 0, 'recettes': Decimal('0')})
+    commandes = Commande.objects.values_list('date', 'tablette__table__nombre_places')
+    for date, places in commandes.iterator():
+        date = timezone.localtime(date)
+        jours[date.date()]['nb_commandes'] += 1
+        jours[date.date()]['couverts'] += places or 0
+        heures[(date.date(), date.hour)]['nb_commandes'] += 1
+    for date, montant in Paiement.objects.values_list('date', 'montant').iterator():
+        date = timezone.localtime(date)
+        heures[(date.date(), date.hour)]['recettes'] += montant
+
+    existants = set(StatistiqueJour.objects.values_list('jour', flat=True))
+    for jour, compteurs in jours.items():
+        if jour in existants:
+            StatistiqueJour.objects.filter(jour=jour).update(**compteurs)
+    StatistiqueJour.objects.bulk_create(
+        [StatistiqueJour(jour=jour, **compteurs) for jour, compteurs in jours.items() if jour not in existants],
+        batch_size=500,
+    )
+    StatistiqueHeure.objects.bulk_create(
+        [StatistiqueHeure(jour=jour, heure=heure, **compteurs) for (jour, heure), compteurs in heures.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0019_statistiquejour'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statistiquejour',
+            name='couverts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statistiquejour',
+            name='nb_commandes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='StatistiqueHeure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('heure', models.PositiveSmallIntegerField()),
+                ('nb_commandes', models.PositiveIntegerField(default=0)),
+                ('recettes', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+            ],
+            options={
+                'verbose_name': 'Statistique horaire',
+                'verbose_name_plural': 'Statistiques horaires',
+                'constraints': [models.UniqueConstraint(fields=('jour', 'heure'), name='statistique_jour_heure_unique')],
+            },
+        ),
+        migrations.RunPython(calculer_commandes_et_heures, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 11:15
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def calculer_ventes(apps, schema_editor):
+    # Amorçage des ventes par plat et par jour depuis les lignes de commande
+    CommandeItem = apps.get_model('gestion', 'CommandeItem')
+    VentePlatJour = apps.get_model('gestion', 'VentePlatJour')
+
+    ventes = defaultdict(lambda: {'quantite': 0, 'recettes': Decimal('0')})
+    lignes = CommandeItem.objects.values_list('plat_id', 'commande__date', 'quantite', 'prix_unitaire')
+    for plat_id, date, quantite, prix_unitaire in lignes.iterator():
+        vente = ventes[(plat_id, timezone.localdate(date))]
+        vente['quantite'] += quantite
+        vente['recettes'] += quantite * prix_unitaire
+
+    VentePlatJour.objects.bulk_create(
+        [VentePlatJour(plat_id=plat_id, jour=jour, **vente) for (plat_id, jour), vente in ventes.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0020_statistiques_commandes_heures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentePlatJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('quantite', models.PositiveIntegerField(default=0)),
+                ('recettes', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('plat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventes_jour', to='gestion.plat')),
+            ],
+            options={
+                'verbose_name': "Ventes d'un plat (jour)",
+                'verbose_name_plural': 'Ventes des plats (jour)',
+                'constraints': [models.UniqueConstraint(fields=('jour', 'plat'), name='vente_plat_jour_unique')],
+            },
+        ),
+        migrations.RunPython(calculer_ventes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 11:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0021_venteplatjour'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionMenu',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveBigIntegerField(default=0)),
+                ('date_maj', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Version du menu',
+                'verbose_name_plural': 'Version du menu',
+            },
+        ),
+    ]
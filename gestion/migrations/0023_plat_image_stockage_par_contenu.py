@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 12:05
+
+import gestion.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0022_versionmenu'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='plat',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=gestion.storage.stockage_plats, upload_to='plats/'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 16:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0023_plat_image_stockage_par_contenu'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='tablette',
+            name='qr_password',
+        ),
+        migrations.AddField(
+            model_name='tablette',
+            name='jeton_emis_le',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
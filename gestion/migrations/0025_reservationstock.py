@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0024_tablette_jeton_connexion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plat',
+            name='quantite_reservee',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ReservationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.PositiveIntegerField()),
+                ('expire_le', models.DateTimeField()),
+                ('plat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='gestion.plat')),
+                ('tablette', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='gestion.tablette')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expire_le'], name='reservation_expire_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tablette', 'plat'), name='reservation_tablette_plat_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 17:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def remplir_file(apps, schema_editor):
+    # Amorçage de la file depuis les commandes déjà en attente
+    CommandeItem = apps.get_model('gestion', 'CommandeItem')
+    LigneCuisine = apps.get_model('gestion', 'LigneCuisine')
+
+    lignes = CommandeItem.objects.filter(commande__statut='en_attente').values_list(
+        'commande_id', 'plat_id', 'commande__tablette_id', 'quantite', 'commande__date'
+    )
+    LigneCuisine.objects.bulk_create(
+        [
+            LigneCuisine(commande_id=commande_id, plat_id=plat_id, tablette_id=tablette_id, quantite=quantite, date=date)
+            for commande_id, plat_id, tablette_id, quantite, date in lignes.iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0025_reservationstock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LigneCuisine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.PositiveIntegerField()),
+                ('date', models.DateTimeField()),
+                ('commande', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lignes_cuisine', to='gestion.commande')),
+                ('plat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion.plat')),
+                ('tablette', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion.tablette')),
+            ],
+            options={
+                'verbose_name': 'Ligne en cuisine',
+                'verbose_name_plural': 'File de la cuisine',
+            },
+        ),
+        migrations.RunPython(remplir_file, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0026_lignecuisine'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['tablette', 'statut'], name='commande_tablette_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(condition=models.Q(('statut__in', ['en_attente', 'servie'])), fields=['date', 'id'], name='commande_actives_date_idx'),
+        ),
+    ]
@@ -1,7 +1,16 @@
-from django.db import models
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Exists, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
+from .storage import stockage_plats
+
 # =========================================================
 # Gestion des utilisateurs personnalisés
 # =========================================================
@@ -43,20 +52,88 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return str(self.identifiant)
 
+# =========================================================
+# Index des sessions par utilisateur
+# =========================================================
+# Tenu à jour par les signaux user_logged_in / user_logged_out : permet de
+# déconnecter un utilisateur (ou toutes les tablettes) sans décoder les sessions.
+class SessionUtilisateurManager(models.Manager):
+    def indexer(self, request, user):
+        session_key = request.session.session_key
+        if not session_key:
+            return
+        self.filter(user=user, expire_date__lt=timezone.now()).delete()
+        self.update_or_create(
+            session_key=session_key,
+            defaults={'user': user, 'expire_date': request.session.get_expiry_date()},
+        )
+
+    def deconnecter(self, **filtres):
+        """Supprime les sessions des utilisateurs visés, ex. deconnecter(user__role='tablette')."""
+        from django.contrib.sessions.models import Session
+        index = self.filter(**filtres)
+        Session.objects.filter(session_key__in=index.values('session_key')).delete()
+        index.delete()
+
+
+class SessionUtilisateur(models.Model):
+    session_key = models.CharField(max_length=40, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sessions_index')
+    expire_date = models.DateTimeField()
+
+    objects = SessionUtilisateurManager()
+
+    def __str__(self):
+        return f"{self.user} : {self.session_key}"
+
+
 # =========================================================
 # Table du restaurant
 # =========================================================
+class TableRestaurantQuerySet(models.QuerySet):
+    def avec_etat(self):
+        """
+        Annote chaque table avec sa dernière commande non payée
+        (derniere_commande_id, derniere_commande_statut), en une seule requête.
+        """
+        derniere = (
+            Commande.objects.filter(tablette__table=OuterRef('pk'))
+            .exclude(statut='payee')
+            .order_by('-date', '-id')
+        )
+        return self.annotate(
+            derniere_commande_id=Subquery(derniere.values('id')[:1]),
+            derniere_commande_statut=Subquery(derniere.values('statut')[:1]),
+        )
+
+
 class TableRestaurant(models.Model):
     numero_table = models.PositiveIntegerField(unique=True)
     nombre_places = models.PositiveIntegerField()
     is_occupied = models.BooleanField(default=False)
 
+    objects = TableRestaurantQuerySet.as_manager()
+
     def __str__(self):
         return f"Table {self.numero_table}"
 
 # =========================================================
 # Tablette liée à une table
 # =========================================================
+class TabletteQuerySet(models.QuerySet):
+    def avec_activite(self):
+        """
+        Annote chaque tablette avec en_utilisation (commande non payée)
+        et panier_actif (panier non vide), en une seule requête.
+        """
+        return self.annotate(
+            en_utilisation=Exists(
+                Commande.objects.filter(tablette=OuterRef('pk')).exclude(statut='payee')
+            ),
+            panier_actif=Exists(PanierItem.objects.filter(tablette=OuterRef('pk'))),
+        )
+
+
 class Tablette(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
@@ -67,11 +144,11 @@ class Tablette(models.Model):
     active = models.BooleanField(default=True)
     is_blocked = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    # Stocké en clair uniquement pour générer les QR Codes (usage physique interne)
-    qr_password = models.CharField(
-        max_length=128, blank=True, null=True,
-        help_text="Mot de passe en clair pour les QR Codes"
-    )
+    # Date d'émission des jetons de QR code (voir jetons.py) : la changer
+    # révoque tous les QR codes imprimés pour cette tablette
+    jeton_emis_le = models.DateTimeField(default=timezone.now)
+
+    objects = TabletteQuerySet.as_manager()
 
     def __str__(self):
         return f"Tablette : {self.user.identifiant} (Table {self.table.numero_table})"
@@ -82,13 +159,66 @@ class Tablette(models.Model):
 class Plat(models.Model):
     nom = models.CharField(max_length=100)
     prix_unitaire = models.DecimalField(max_digits=10, decimal_places=2)
-    image = models.ImageField(upload_to='plats/', blank=True, null=True)
+    image = models.ImageField(upload_to='plats/', storage=stockage_plats, blank=True, null=True)
     quantite_disponible = models.PositiveIntegerField(default=0) 
     disponible = models.BooleanField(default=True)
+    # Portions retenues par des paniers (somme des ReservationStock du plat),
+    # tenue à jour par ReservationStockManager
+    quantite_reservee = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.nom}"
 
+    @property
+    def quantite_libre(self):
+        return max(0, self.quantite_disponible - self.quantite_reservee)
+
+    @property
+    def variantes_image(self):
+        """srcset WebP et JPEG des variantes, ou None si elles n'existent pas (encore)."""
+        from . import images
+        if not self.image or images.variantes_manquantes(self.image.name):
+            return None
+        return {
+            'webp': images.srcset(self.image.name, 'webp'),
+            'jpg': images.srcset(self.image.name, 'jpg'),
+            'src': default_storage.url(images.chemin_variante(self.image.name, 'carte', 'jpg')),
+        }
+
+
+# =========================================================
+# Version du menu
+# =========================================================
+class VersionMenuManager(models.Manager):
+    def actuelle(self):
+        version, _ = self.get_or_create(pk=1)
+        return version
+
+    def incrementer(self):
+        """Change la version du menu : les fragments en cache et les ETag expirent."""
+        if self.filter(pk=1).update(numero=F('numero') + 1, date_maj=timezone.now()):
+            return
+        try:
+            with transaction.atomic():
+                self.create(pk=1, numero=1)
+        except IntegrityError:
+            self.filter(pk=1).update(numero=F('numero') + 1, date_maj=timezone.now())
+
+
+# Ligne unique : numéro incrémenté à chaque changement de plat ou de stock
+class VersionMenu(models.Model):
+    numero = models.PositiveBigIntegerField(default=0)
+    date_maj = models.DateTimeField(default=timezone.now)
+
+    objects = VersionMenuManager()
+
+    class Meta:
+        verbose_name = "Version du menu"
+        verbose_name_plural = "Version du menu"
+
+    def __str__(self):
+        return f"Menu v{self.numero}"
+
 # =========================================================
 # Panier
 # =========================================================
@@ -106,9 +236,270 @@ class PanierItem(models.Model):
     def __str__(self):
         return f"{self.plat.nom} x {self.quantite}"
 
+# =========================================================
+# Réservations de stock
+# =========================================================
+# Tentatives de réservation quand le stock libre bouge en même temps
+RESERVATION_ESSAIS = 3
+
+
+class ReservationStockManager(models.Manager):
+    def reserver(self, tablette, cibles):
+        """
+        Retient pour la tablette `cibles` = {plat_id: quantite} portions (0 libère).
+
+        Chaque augmentation passe par un UPDATE conditionnel sur le compteur
+        du plat : deux tablettes ne peuvent pas retenir la même portion. Une
+        demande trop forte est réduite à ce qui reste libre. Toutes les
+        réservations de la tablette sont prolongées. Retourne {plat_id: accordée}.
+        """
+        expire_le = timezone.now() + timedelta(seconds=settings.RESERVATION_PANIER_TTL)
+        with transaction.atomic():
+            self.liberer_expirees()
+            actuelles = dict(
+                self.filter(tablette=tablette, plat_id__in=cibles).values_list('plat_id', 'quantite')
+            )
+            accordees = {}
+            modifie = False
+            for plat_id, cible in cibles.items():
+                actuelle = actuelles.get(plat_id, 0)
+                delta = max(0, cible) - actuelle
+                if delta > 0:
+                    delta = self._retenir(plat_id, delta)
+                elif delta < 0:
+                    Plat.objects.filter(id=plat_id, quantite_reservee__gte=-delta).update(
+                        quantite_reservee=F('quantite_reservee') + delta
+                    )
+                accordees[plat_id] = actuelle + delta
+                modifie = modifie or delta != 0
+
+            self.filter(
+                tablette=tablette, plat_id__in=[p for p, q in accordees.items() if q == 0]
+            ).delete()
+            self.bulk_create(
+                [
+                    ReservationStock(tablette=tablette, plat_id=p, quantite=q, expire_le=expire_le)
+                    for p, q in accordees.items() if q > 0
+                ],
+                update_conflicts=True,
+                unique_fields=['tablette', 'plat'],
+                update_fields=['quantite', 'expire_le'],
+            )
+            self.filter(tablette=tablette).update(expire_le=expire_le)
+            if modifie:
+                # La carte affiche le stock libre
+                transaction.on_commit(VersionMenu.objects.incrementer)
+        return accordees
+
+    def _retenir(self, plat_id, demande):
+        """Retient jusqu'à `demande` portions libres du plat ; retourne le nombre retenu."""
+        for _ in range(RESERVATION_ESSAIS):
+            if Plat.objects.filter(
+                id=plat_id, quantite_disponible__gte=F('quantite_reservee') + demande
+            ).update(quantite_reservee=F('quantite_reservee') + demande):
+                return demande
+            # Moins de portions libres que demandé : on retente avec ce qu'il reste
+            plat = Plat.objects.filter(id=plat_id).only('quantite_disponible', 'quantite_reservee').first()
+            if plat is None or plat.quantite_libre == 0:
+                return 0
+            demande = min(demande, plat.quantite_libre)
+        return 0
+
+    def liberer_expirees(self):
+        """Supprime les réservations expirées et rend leurs portions ; retourne leur nombre."""
+        with transaction.atomic(savepoint=False):
+            return self._liberer(self.filter(expire_le__lte=timezone.now()))
+
+    def liberer_tablette(self, tablette):
+        """Supprime les réservations de la tablette et rend leurs portions."""
+        with transaction.atomic(savepoint=False):
+            return self._liberer(self.filter(tablette=tablette))
+
+    def _liberer(self, reservations):
+        # Les compteurs sont décrémentés des quantités supprimées, jamais
+        # réécrits : une réservation concurrente reste comptée.
+        lignes = list(reservations.select_for_update().values_list('id', 'plat_id', 'quantite'))
+        if not lignes:
+            return 0
+        rendues = {}
+        for _, plat_id, quantite in lignes:
+            rendues[plat_id] = rendues.get(plat_id, 0) + quantite
+        self.filter(id__in=[id_ for id_, _, _ in lignes]).delete()
+        Plat.objects.filter(id__in=list(rendues)).update(
+            quantite_reservee=F('quantite_reservee') - Case(
+                *[When(id=plat_id, then=Value(quantite)) for plat_id, quantite in rendues.items()],
+                default=Value(0),
+                output_field=models.PositiveIntegerField(),
+            )
+        )
+        transaction.on_commit(VersionMenu.objects.incrementer)
+        return len(lignes)
+
+    def recalculer(self, plat_ids=None):
+        """
+        Réparation : recalcule Plat.quantite_reservee depuis les réservations
+        (tous les plats par défaut). À n'utiliser qu'hors service
+        (liberer_reservations --recalculer) : le recalcul écrase les
+        réservations posées pendant qu'il s'exécute.
+        """
+        total = (
+            self.filter(plat=OuterRef('pk')).order_by()
+            .values('plat').annotate(total=Sum('quantite')).values('total')
+        )
+        plats = Plat.objects.all() if plat_ids is None else Plat.objects.filter(id__in=plat_ids)
+        return plats.update(quantite_reservee=Coalesce(Subquery(total), 0))
+
+
+class ReservationStock(models.Model):
+    tablette = models.ForeignKey(Tablette, on_delete=models.CASCADE, related_name='reservations')
+    plat = models.ForeignKey(Plat, on_delete=models.CASCADE, related_name='reservations')
+    quantite = models.PositiveIntegerField()
+    expire_le = models.DateTimeField()
+
+    objects = ReservationStockManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tablette', 'plat'], name='reservation_tablette_plat_unique'),
+        ]
+        indexes = [
+            # Balayage des réservations expirées
+            models.Index(fields=['expire_le'], name='reservation_expire_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.plat} x {self.quantite} (tablette {self.tablette_id})"
+
+
 # =========================================================
 # Commande
 # =========================================================
+class StockInsuffisant(Exception):
+    """Levée quand un plat du panier n'a plus assez de portions."""
+
+    def __init__(self, plats=()):
+        self.plats = list(plats)
+        if self.plats:
+            message = "Stock insuffisant pour : " + ", ".join(self.plats)
+        else:
+            message = "Stock insuffisant pour un ou plusieurs plats."
+        super().__init__(message)
+
+
+class CommandeManager(models.Manager):
+    def creer_depuis_panier(self, tablette, lignes=None):
+        """
+        Transforme le panier d'une tablette en commande.
+
+        Tout se fait dans une seule transaction avec un nombre fixe de requêtes,
+        quelle que soit la taille du panier. Le stock est décrémenté par un
+        UPDATE conditionnel : si un plat n'a plus assez de portions, rien n'est
+        écrit et StockInsuffisant est levée. Retourne None si le panier est vide.
+
+        Sans `lignes`, le panier est lu (et réclamé) dans PanierItem ; sinon
+        `lignes` sont des PanierItem non enregistrés, déjà réclamés par
+        l'appelant (panier en cache, voir paniers.py).
+        """
+        with transaction.atomic():
+            if lignes is not None:
+                items = list(lignes)
+            else:
+                items = list(
+                    PanierItem.objects.filter(tablette=tablette).select_related('plat')
+                )
+                # On "réclame" le panier : si une validation concurrente l'a déjà
+                # supprimé, on ne crée pas de commande en double.
+                if items:
+                    supprimes, _ = PanierItem.objects.filter(
+                        id__in=[item.id for item in items]
+                    ).delete()
+                    if supprimes != len(items):
+                        transaction.set_rollback(True)
+                        return None
+            if not items:
+                return None
+
+            # Les portions réservées par ce panier sont converties : on les
+            # rend au compteur, puis le stock n'est décrémenté que si les
+            # réservations des autres tablettes restent couvertes.
+            plat_ids = [item.plat_id for item in items]
+            ReservationStock.objects.liberer_tablette(tablette)
+
+            condition = Q()
+            decrements = []
+            for item in items:
+                condition |= Q(
+                    id=item.plat_id,
+                    quantite_disponible__gte=F('quantite_reservee') + item.quantite,
+                )
+                decrements.append(
+                    When(id=item.plat_id, then=F('quantite_disponible') - item.quantite)
+                )
+            plats_maj = Plat.objects.filter(condition).update(
+                quantite_disponible=Case(
+                    *decrements,
+                    default=F('quantite_disponible'),
+                    output_field=models.PositiveIntegerField(),
+                )
+            )
+            if plats_maj != len(items):
+                libres = {
+                    plat.id: plat.quantite_libre
+                    for plat in Plat.objects.filter(id__in=plat_ids).only('quantite_disponible', 'quantite_reservee')
+                }
+                raise StockInsuffisant(
+                    item.plat.nom for item in items
+                    if item.quantite > libres.get(item.plat_id, 0)
+                )
+
+            Plat.objects.filter(id__in=plat_ids, quantite_disponible=0).update(disponible=False)
+            transaction.on_commit(VersionMenu.objects.incrementer)
+
+            commande = self.create(
+                tablette=tablette,
+                total=sum(item.montant() for item in items),
+                statut='en_attente',
+            )
+            CommandeItem.objects.bulk_create([
+                CommandeItem(
+                    commande=commande,
+                    plat=item.plat,
+                    quantite=item.quantite,
+                    prix_unitaire=item.plat.prix_unitaire,
+                )
+                for item in items
+            ])
+            LigneCuisine.objects.ajouter(commande, items)
+
+            ventes = {}
+            for item in items:
+                quantite, recettes = ventes.get(item.plat_id, (0, Decimal('0')))
+                ventes[item.plat_id] = (quantite + item.quantite, recettes + item.montant())
+            VentePlatJour.objects.enregistrer(timezone.localdate(commande.date), ventes)
+        return commande
+
+    def purger(self):
+        """
+        Supprime toutes les commandes (lignes, file cuisine et paiements compris)
+        en quelques DELETE en masse, sans les signaux de suppression par commande.
+        Les cumuls ne sont pas décomptés : l'appelant les recalcule une fois
+        (recalculer_statistiques). Retourne le nombre de commandes supprimées.
+        """
+        with transaction.atomic():
+            ids = list(self.values_list('id', flat=True))
+            if not ids:
+                return 0
+            # _raw_delete : le DELETE direct que QuerySet.delete() emploie quand
+            # aucun signal n'est branché sur le modèle
+            for modele in (LigneCuisine, CommandeItem, Paiement):
+                modele.objects.all()._raw_delete(self.db)
+            self.all()._raw_delete(self.db)
+            # Les écrans serveur et cuisine suivent le flux d'événements
+            evenements = [CommandeEvenement(commande_id=id_, type_evenement='supprimee') for id_ in ids]
+            transaction.on_commit(lambda: CommandeEvenement.objects.bulk_create(evenements, batch_size=500))
+        return len(ids)
+
+
 class Commande(models.Model):
     STATUT_CHOICES = (
         ('en_attente', 'En attente'),
@@ -124,12 +515,71 @@ class Commande(models.Model):
     serveur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='commandes_servies')
     comptable = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='paiements_confirmes')
 
+    objects = CommandeManager()
+
+    class Meta:
+        indexes = [
+            # Pagination par curseur et filtres de la liste globale
+            models.Index(fields=['date', 'id'], name='commande_date_id_idx'),
+            models.Index(fields=['statut', 'date', 'id'], name='commande_statut_date_idx'),
+            models.Index(fields=['tablette', 'date', 'id'], name='commande_tablette_date_idx'),
+            # Commandes non payées d'une tablette (état des tables, parc de tablettes)
+            models.Index(fields=['tablette', 'statut'], name='commande_tablette_statut_idx'),
+            # Commandes en cours (écrans serveur et comptable), les plus récentes
+            # d'abord : index partiel, il ne grossit pas avec l'historique payé
+            models.Index(
+                fields=['date', 'id'], name='commande_actives_date_idx',
+                condition=Q(statut__in=['en_attente', 'servie']),
+            ),
+            models.Index(fields=['serveur', 'date', 'id'], name='commande_serveur_date_idx'),
+        ]
+
     def __str__(self):
         try:
             return f"Commande #{self.id} (Table {self.tablette.table.numero_table})"
         except:
             return f"Commande #{self.id}"
 
+# =========================================================
+# Flux des commandes (écran serveur)
+# =========================================================
+class CommandeEvenementManager(models.Manager):
+    # Purge des vieux événements tous les N événements publiés
+    INTERVALLE_PURGE = 500
+    CONSERVATION = timedelta(days=1)
+
+    def publier(self, commande_id, type_evenement):
+        """Publie l'événement une fois la transaction validée."""
+        def _creer():
+            evenement = self.create(commande_id=commande_id, type_evenement=type_evenement)
+            if evenement.pk % self.INTERVALLE_PURGE == 0:
+                self.filter(date__lt=timezone.now() - self.CONSERVATION).delete()
+        transaction.on_commit(_creer)
+
+    def dernier_id(self):
+        return self.aggregate(Max('id'))['id__max'] or 0
+
+
+class CommandeEvenement(models.Model):
+    TYPE_CHOICES = (
+        ('creee', 'Créée'),
+        ('servie', 'Servie'),
+        ('payee', 'Payée'),
+        ('maj', 'Mise à jour'),
+        ('supprimee', 'Supprimée'),
+    )
+
+    # Pas de clé étrangère : l'événement survit à la suppression de la commande
+    commande_id = models.PositiveBigIntegerField()
+    type_evenement = models.CharField(max_length=10, choices=TYPE_CHOICES)
+    date = models.DateTimeField(auto_now_add=True)
+
+    objects = CommandeEvenementManager()
+
+    def __str__(self):
+        return f"Commande #{self.commande_id} : {self.get_type_evenement_display()}"
+
+
 # =========================================================
 # Items d'une commande
 # =========================================================
@@ -145,11 +595,79 @@ class CommandeItem(models.Model):
     def __str__(self):
         return f"{self.plat.nom if self.plat else 'Plat'} x {self.quantite}"
 
+
+# =========================================================
+# File de la cuisine (écran cuisine)
+# =========================================================
+# Copie des lignes des commandes en attente, et d'elles seules : écrite à la
+# création de la commande, effacée quand elle quitte 'en_attente' (signals.py)
+# ou disparaît (cascade). L'écran cuisine ne parcourt jamais l'historique.
+class LigneCuisineManager(models.Manager):
+    def ajouter(self, commande, items):
+        self.bulk_create([
+            LigneCuisine(
+                commande=commande,
+                plat_id=item.plat_id,
+                tablette_id=commande.tablette_id,
+                quantite=item.quantite,
+                date=commande.date,
+            )
+            for item in items
+        ])
+
+    def retirer(self, commande_id):
+        self.filter(commande_id=commande_id).delete()
+
+    def par_plat(self):
+        """
+        Travail en attente regroupé par plat, le plat attendu depuis le plus
+        longtemps en tête : [{plat_id, nom, quantite, tables, nb_commandes, depuis}].
+        """
+        plats = {}
+        lignes = self.order_by('date', 'id').values_list(
+            'plat_id', 'plat__nom', 'quantite', 'tablette__table__numero_table', 'commande_id', 'date'
+        )
+        for plat_id, nom, quantite, table, commande_id, date in lignes:
+            plat = plats.setdefault(plat_id, {
+                'plat_id': plat_id, 'nom': nom, 'quantite': 0,
+                'tables': [], 'commandes': set(), 'depuis': date,
+            })
+            plat['quantite'] += quantite
+            if table not in plat['tables']:
+                plat['tables'].append(table)
+            plat['commandes'].add(commande_id)
+        for plat in plats.values():
+            plat['nb_commandes'] = len(plat.pop('commandes'))
+        # dict ordonné par première apparition : du plus ancien au plus récent
+        return list(plats.values())
+
+
+class LigneCuisine(models.Model):
+    commande = models.ForeignKey(Commande, on_delete=models.CASCADE, related_name='lignes_cuisine')
+    plat = models.ForeignKey(Plat, on_delete=models.CASCADE)
+    tablette = models.ForeignKey(Tablette, on_delete=models.CASCADE)
+    quantite = models.PositiveIntegerField()
+    # Date de la commande
+    date = models.DateTimeField()
+
+    objects = LigneCuisineManager()
+
+    class Meta:
+        verbose_name = "Ligne en cuisine"
+        verbose_name_plural = "File de la cuisine"
+
+    def __str__(self):
+        return f"{self.plat} x {self.quantite} (commande #{self.commande_id})"
+
 # =========================================================
 # Caisse
 # =========================================================
+# Chaque ligne est un point de caisse : le solde exact après le mouvement
+# `mouvement_id` du journal. On n'écrit plus jamais le solde en place.
 class Caisse(models.Model):
     solde_actuel = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    mouvement_id = models.PositiveBigIntegerField(default=0, db_index=True)
+    date = models.DateTimeField(default=timezone.now)
 
     class Meta:
         verbose_name_plural = "Caisse"
@@ -157,6 +675,98 @@ class Caisse(models.Model):
     def __str__(self):
         return f"Solde : {self.solde_actuel} FG"
 
+
+# =========================================================
+# Journal de caisse (append-only)
+# =========================================================
+class CaisseMouvementManager(models.Manager):
+    # Un point de caisse est posé tous les N mouvements
+    INTERVALLE_POINT = 200
+    # Les mouvements plus récents que ce délai ne sont pas intégrés à un point :
+    # une transaction encore ouverte pourrait avoir pris un id plus petit.
+    DELAI_POINT = timedelta(minutes=1)
+
+    def enregistrer(self, montant, type_mouvement, libelle='', utilisateur=None):
+        mouvement = self.create(
+            montant=montant,
+            type_mouvement=type_mouvement,
+            libelle=libelle[:200],
+            utilisateur=utilisateur,
+        )
+        # Compté depuis le dernier point, pas sur l'id : un point refusé
+        # (mouvements trop récents) est retenté au mouvement suivant.
+        depuis = Coalesce(
+            Subquery(Caisse.objects.order_by('-mouvement_id', '-id').values('mouvement_id')[:1]), 0
+        )
+        if self.filter(id__gt=depuis).count() >= self.INTERVALLE_POINT:
+            self.poser_point()
+        return mouvement
+
+    def retirer(self, montant, type_mouvement, libelle='', utilisateur=None):
+        """Retire `montant` de la caisse sans descendre sous zéro ; retourne le mouvement."""
+        with transaction.atomic(savepoint=False):
+            # Le verrou sur le point de caisse sérialise les retraits plafonnés
+            solde = self.solde(verrouiller=True)
+            return self.enregistrer(
+                max(Decimal('0.00'), solde - montant) - solde, type_mouvement, libelle, utilisateur
+            )
+
+    def dernier_point(self, verrouiller=False):
+        points = Caisse.objects.order_by('-mouvement_id', '-id')
+        if verrouiller:
+            points = points.select_for_update()
+        return points.first()
+
+    def solde(self, verrouiller=False):
+        """Solde = dernier point de caisse + mouvements postérieurs."""
+        point = self.dernier_point(verrouiller)
+        base = point.solde_actuel if point else Decimal('0')
+        depuis = point.mouvement_id if point else 0
+        delta = self.filter(id__gt=depuis).aggregate(Sum('montant'))['montant__sum'] or 0
+        return base + delta
+
+    def poser_point(self):
+        point = self.dernier_point()
+        base = point.solde_actuel if point else Decimal('0')
+        depuis = point.mouvement_id if point else 0
+
+        limite = self.filter(
+            id__gt=depuis, date__lt=timezone.now() - self.DELAI_POINT
+        ).aggregate(Max('id'))['id__max']
+        if limite is None:
+            return point
+
+        delta = self.filter(
+            id__gt=depuis, id__lte=limite
+        ).aggregate(Sum('montant'))['montant__sum'] or 0
+        return Caisse.objects.create(solde_actuel=base + delta, mouvement_id=limite)
+
+
+class CaisseMouvement(models.Model):
+    TYPE_CHOICES = (
+        ('paiement', 'Paiement'),
+        ('depense', 'Dépense'),
+        ('annulation_paiement', 'Annulation paiement'),
+        ('annulation_depense', 'Annulation dépense'),
+        ('reinitialisation', 'Réinitialisation'),
+    )
+
+    # Positif = entrée en caisse, négatif = sortie
+    montant = models.DecimalField(max_digits=15, decimal_places=2)
+    type_mouvement = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    libelle = models.CharField(max_length=200, blank=True)
+    date = models.DateTimeField(auto_now_add=True)
+    utilisateur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='mouvements_caisse')
+
+    objects = CaisseMouvementManager()
+
+    class Meta:
+        verbose_name = "Mouvement de caisse"
+        verbose_name_plural = "Journal de caisse"
+
+    def __str__(self):
+        return f"{self.get_type_mouvement_display()} : {self.montant} FG"
+
 # =========================================================
 # Dépense
 # =========================================================
@@ -174,6 +784,11 @@ class Depense(models.Model):
     categorie = models.CharField(max_length=20, choices=CATEGORIES, default='Autre')
     utilisateur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="depenses")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'], name='depense_date_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.description} ({self.montant} FG)"
 
@@ -187,6 +802,156 @@ class Paiement(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='cash')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'], name='paiement_date_id_idx'),
+        ]
+
     def __str__(self):
         return f"Paiement #{self.id} ({self.montant} FG)"
-  
+
+
+# =========================================================
+# Statistiques journalières
+# =========================================================
+class CompteurManager(models.Manager):
+    """Compteurs agrégés, incrémentés en place (UPDATE x = x + delta)."""
+
+    def incrementer(self, cles, deltas):
+        increments = {champ: F(champ) + valeur for champ, valeur in deltas.items()}
+        if self.filter(**cles).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                self.create(**cles, **deltas)
+        except IntegrityError:
+            # Créée entre-temps par une écriture concurrente
+            self.filter(**cles).update(**increments)
+
+
+class StatistiqueJourManager(CompteurManager):
+
+    def ajuster(self, jour, **deltas):
+        """Ajoute les deltas aux compteurs du jour, en créant la ligne si besoin."""
+        self.incrementer({'jour': jour}, deltas)
+
+    def periode(self, jour_debut, jour_fin):
+        """Totaux sur [jour_debut, jour_fin[ — une ligne lue par jour."""
+        totaux = self.filter(jour__gte=jour_debut, jour__lt=jour_fin).aggregate(
+            recettes=Sum('recettes'),
+            nb_paiements=Sum('nb_paiements'),
+            depenses=Sum('depenses'),
+            nb_depenses=Sum('nb_depenses'),
+        )
+        return {cle: valeur or 0 for cle, valeur in totaux.items()}
+
+
+class StatistiqueJour(models.Model):
+    jour = models.DateField(unique=True)
+    nb_commandes = models.PositiveIntegerField(default=0)
+    # Places des tables ayant commandé, une fois par commande
+    couverts = models.PositiveIntegerField(default=0)
+    recettes = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    nb_paiements = models.PositiveIntegerField(default=0)
+    depenses = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    nb_depenses = models.PositiveIntegerField(default=0)
+
+    objects = StatistiqueJourManager()
+
+    class Meta:
+        verbose_name = "Statistique journalière"
+        verbose_name_plural = "Statistiques journalières"
+
+    def __str__(self):
+        return f"{self.jour} : {self.recettes} FG"
+
+
+class StatistiqueHeureManager(CompteurManager):
+
+    def ajuster(self, date, **deltas):
+        date = timezone.localtime(date)
+        self.incrementer({'jour': date.date(), 'heure': date.hour}, deltas)
+
+
+class StatistiqueHeure(models.Model):
+    jour = models.DateField()
+    heure = models.PositiveSmallIntegerField()
+    nb_commandes = models.PositiveIntegerField(default=0)
+    recettes = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    objects = StatistiqueHeureManager()
+
+    class Meta:
+        verbose_name = "Statistique horaire"
+        verbose_name_plural = "Statistiques horaires"
+        constraints = [
+            models.UniqueConstraint(fields=['jour', 'heure'], name='statistique_jour_heure_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.jour} {self.heure:02d}h : {self.nb_commandes} commande(s)"
+
+
+class VentePlatJourManager(CompteurManager):
+
+    def enregistrer(self, jour, ventes):
+        """
+        Ajoute {plat_id: (quantite, recettes)} aux ventes du jour.
+        Deux requêtes quel que soit le nombre de plats : création des lignes
+        manquantes, puis un seul UPDATE conditionnel.
+        """
+        if not ventes:
+            return
+        self.bulk_create(
+            [self.model(plat_id=plat_id, jour=jour) for plat_id in ventes],
+            ignore_conflicts=True,
+        )
+        self._ajouter(jour, ventes, 1)
+
+    def annuler(self, jour, ventes):
+        """Retire {plat_id: (quantite, recettes)} des ventes du jour (commande supprimée)."""
+        if ventes:
+            self._ajouter(jour, ventes, -1)
+
+    def _ajouter(self, jour, ventes, signe):
+        self.filter(jour=jour, plat_id__in=list(ventes)).update(
+            quantite=F('quantite') + Case(
+                *[When(plat_id=plat_id, then=Value(signe * quantite)) for plat_id, (quantite, _) in ventes.items()],
+                default=Value(0),
+                output_field=models.IntegerField(),
+            ),
+            recettes=F('recettes') + Case(
+                *[When(plat_id=plat_id, then=Value(signe * recettes)) for plat_id, (_, recettes) in ventes.items()],
+                default=Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=15, decimal_places=2),
+            ),
+        )
+
+    def meilleures(self, depuis=None, nombre=3):
+        """Plats les plus vendus (en quantité) depuis le jour donné, ou depuis toujours."""
+        ventes = self.all() if depuis is None else self.filter(jour__gte=depuis)
+        return list(
+            ventes.values('plat_id', nom=F('plat__nom'))
+            .annotate(quantite=Sum('quantite'), recettes=Sum('recettes'))
+            .filter(quantite__gt=0)
+            .order_by('-quantite', 'plat_id')[:nombre]
+        )
+
+
+class VentePlatJour(models.Model):
+    plat = models.ForeignKey(Plat, on_delete=models.CASCADE, related_name='ventes_jour')
+    jour = models.DateField()
+    quantite = models.PositiveIntegerField(default=0)
+    recettes = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    objects = VentePlatJourManager()
+
+    class Meta:
+        verbose_name = "Ventes d'un plat (jour)"
+        verbose_name_plural = "Ventes des plats (jour)"
+        constraints = [
+            models.UniqueConstraint(fields=['jour', 'plat'], name='vente_plat_jour_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.plat} — {self.jour} : {self.quantite}"
@@ -0,0 +1,258 @@
+# =========================================================
+# paniers.py — Stockage du panier des tablettes
+# =========================================================
+# PANIER_BACKEND choisit où vit le panier :
+#   - 'bd'    : une ligne PanierItem par plat (comportement historique) ;
+#   - 'cache' : {plat_id: quantite} dans le cache, contrôlé contre le stock
+#               en cache (caches.stock_plats). La base n'est écrite qu'à la
+#               validation, quand le panier devient une Commande.
+# Le mode 'cache' suppose un cache partagé entre workers (Redis, Memcached).
+#
+# Avec RESERVATION_PANIER_TTL > 0, les portions mises au panier sont retenues
+# (ReservationStock) : les quantités sont plafonnées au stock libre plutôt
+# qu'au stock brut, et la base est écrite à chaque changement, dans les deux modes.
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from . import caches
+from .models import Commande, PanierItem, Plat, ReservationStock, StockInsuffisant, VersionMenu
+
+TTL_PANIER = 60 * 60 * 6
+
+
+def reservations_actives():
+    return getattr(settings, 'RESERVATION_PANIER_TTL', 0) > 0
+
+
+class Panier:
+    def __init__(self, tablette):
+        self.tablette = tablette
+
+    def _plafonner(self, cibles, disponibles):
+        """
+        Quantités accordées pour `cibles` = {plat_id: quantite} : réservées si
+        les réservations sont actives, sinon bornées par `disponibles`.
+        """
+        if reservations_actives():
+            return ReservationStock.objects.reserver(self.tablette, cibles)
+        return {
+            plat_id: max(0, min(quantite, disponibles.get(plat_id, 0)))
+            for plat_id, quantite in cibles.items()
+        }
+
+    def _quantite_ligne(self, plat_id, demandee, actuelle, disponible):
+        """
+        Nouvelle quantité d'une ligne déjà au panier. Sans stock libre, la
+        ligne n'est pas supprimée : elle garde sa quantité actuelle, ou la
+        quantité demandée si elle est plus basse (une baisse ne prend rien).
+        """
+        accordee = self._plafonner({plat_id: demandee}, {plat_id: disponible})[plat_id]
+        return accordee if accordee > 0 else min(demandee, actuelle)
+
+    def _liberer(self, plat_id):
+        if reservations_actives():
+            ReservationStock.objects.reserver(self.tablette, {plat_id: 0})
+
+
+class PanierBD(Panier):
+    def lignes(self):
+        return list(PanierItem.objects.filter(tablette=self.tablette).select_related('plat'))
+
+    def compter(self):
+        return PanierItem.objects.filter(tablette=self.tablette).count()
+
+    def ajouter(self, plat_id, quantite):
+        """Ajoute jusqu'à `quantite` portions ; retourne (nom du plat, quantité ajoutée)."""
+        plat = get_object_or_404(Plat, id=plat_id)
+        actuelle = PanierItem.objects.filter(
+            tablette=self.tablette, plat=plat
+        ).values_list('quantite', flat=True).first() or 0
+        accordee = self._plafonner(
+            {plat.id: actuelle + max(1, quantite)}, {plat.id: plat.quantite_disponible}
+        )[plat.id]
+        if accordee <= actuelle:
+            if plat.quantite_disponible <= 0 and plat.disponible:
+                plat.disponible = False
+                plat.save()
+            raise StockInsuffisant([plat.nom])
+
+        PanierItem.objects.update_or_create(
+            tablette=self.tablette, plat=plat, defaults={'quantite': accordee}
+        )
+        return plat.nom, accordee - actuelle
+
+    def ligne(self, ligne_id):
+        return PanierItem.objects.filter(id=ligne_id, tablette=self.tablette).select_related('plat').first()
+
+    def modifier(self, ligne, quantite):
+        if quantite > 0:
+            quantite = self._quantite_ligne(
+                ligne.plat_id, quantite, ligne.quantite, ligne.plat.quantite_disponible
+            )
+        if quantite <= 0:
+            self.supprimer(ligne)
+        else:
+            ligne.quantite = quantite
+            ligne.save()
+
+    def supprimer(self, ligne):
+        ligne.delete()
+        self._liberer(ligne.plat_id)
+
+    def appliquer(self, quantites):
+        """
+        Fixe la quantité de plusieurs plats en trois requêtes d'écriture au plus :
+        {plat_id: quantite}, 0 retire le plat. Les quantités sont plafonnées au stock.
+        """
+        plats = Plat.objects.in_bulk(quantites)
+        accordees = self._plafonner(
+            {plat_id: quantites[plat_id] for plat_id in plats},
+            {plat_id: plat.quantite_disponible for plat_id, plat in plats.items()},
+        )
+        existants = {
+            item.plat_id: item
+            for item in PanierItem.objects.filter(tablette=self.tablette, plat_id__in=plats)
+        }
+        a_creer, a_modifier, a_supprimer = [], [], []
+        for plat_id, plat in plats.items():
+            quantite = accordees[plat_id]
+            item = existants.get(plat_id)
+            if quantite <= 0:
+                if item:
+                    a_supprimer.append(item.id)
+            elif item is None:
+                a_creer.append(PanierItem(tablette=self.tablette, plat=plat, quantite=quantite))
+            elif item.quantite != quantite:
+                item.quantite = quantite
+                a_modifier.append(item)
+        if a_supprimer:
+            PanierItem.objects.filter(id__in=a_supprimer).delete()
+        if a_modifier:
+            PanierItem.objects.bulk_update(a_modifier, ['quantite'])
+        if a_creer:
+            PanierItem.objects.bulk_create(a_creer)
+        if a_creer or a_modifier:
+            # bulk_create / bulk_update n'envoient pas de signaux
+            transaction.on_commit(caches.invalider_flotte_tablettes)
+
+    def valider(self):
+        return Commande.objects.creer_depuis_panier(self.tablette)
+
+
+class PanierCache(Panier):
+    # Une ligne est identifiée par l'id de son plat
+    def __init__(self, tablette):
+        super().__init__(tablette)
+        self.cle = cle_panier(tablette.pk)
+        self._contenu = None
+        self._stock = None
+
+    def contenu(self):
+        if self._contenu is None:
+            self._contenu = cache.get(self.cle, {})
+        return self._contenu
+
+    def stock(self):
+        if self._stock is None:
+            self._stock = caches.stock_plats(VersionMenu.objects.actuelle().numero)
+        return self._stock
+
+    def _enregistrer(self):
+        if self._contenu:
+            cache.set(self.cle, self._contenu, TTL_PANIER)
+        else:
+            cache.delete(self.cle)
+
+    def _lignes(self, contenu):
+        plats = Plat.objects.in_bulk(contenu)
+        return [
+            PanierItem(id=plat_id, tablette=self.tablette, plat=plats[plat_id], quantite=quantite)
+            for plat_id, quantite in contenu.items() if plat_id in plats
+        ]
+
+    def lignes(self):
+        return self._lignes(self.contenu()) if self.contenu() else []
+
+    def compter(self):
+        return len(self.contenu())
+
+    def ajouter(self, plat_id, quantite):
+        if plat_id not in self.stock():
+            raise Http404
+        nom, _prix, disponible = self.stock()[plat_id]
+        contenu = self.contenu()
+        actuelle = contenu.get(plat_id, 0)
+        accordee = self._plafonner({plat_id: actuelle + max(1, quantite)}, {plat_id: disponible})[plat_id]
+        if accordee <= actuelle:
+            raise StockInsuffisant([nom])
+
+        contenu[plat_id] = accordee
+        self._enregistrer()
+        return nom, accordee - actuelle
+
+    def ligne(self, ligne_id):
+        return ligne_id if ligne_id in self.contenu() else None
+
+    def modifier(self, ligne, quantite):
+        if quantite > 0:
+            disponible = self.stock().get(ligne, (None, None, 0))[2]
+            quantite = self._quantite_ligne(ligne, quantite, self.contenu()[ligne], disponible)
+        if quantite <= 0:
+            self.supprimer(ligne)
+            return
+        self.contenu()[ligne] = quantite
+        self._enregistrer()
+
+    def supprimer(self, ligne):
+        self.contenu().pop(ligne, None)
+        self._enregistrer()
+        self._liberer(ligne)
+
+    def appliquer(self, quantites):
+        contenu = self.contenu()
+        accordees = self._plafonner(
+            {plat_id: quantite for plat_id, quantite in quantites.items() if plat_id in self.stock()},
+            {plat_id: self.stock()[plat_id][2] for plat_id in quantites if plat_id in self.stock()},
+        )
+        for plat_id, quantite in accordees.items():
+            if quantite <= 0:
+                contenu.pop(plat_id, None)
+            else:
+                contenu[plat_id] = quantite
+        self._enregistrer()
+
+    def valider(self):
+        contenu = cache.get(self.cle)
+        # On "réclame" le panier : une validation concurrente ne trouve plus la clé
+        if not contenu or not cache.delete(self.cle):
+            return None
+        try:
+            return Commande.objects.creer_depuis_panier(self.tablette, self._lignes(contenu))
+        except StockInsuffisant:
+            # Le client doit pouvoir corriger son panier
+            cache.set(self.cle, contenu, TTL_PANIER)
+            raise
+
+
+PANIERS = {'bd': PanierBD, 'cache': PanierCache}
+
+
+def cle_panier(tablette_id):
+    return f'gestion:panier:{tablette_id}'
+
+
+def panier_de(tablette):
+    return PANIERS[getattr(settings, 'PANIER_BACKEND', 'bd')](tablette)
+
+
+def marquer_paniers_actifs(tablettes):
+    """En mode 'cache', panier_actif (avec_activite) ne voit pas les paniers : on le corrige."""
+    if getattr(settings, 'PANIER_BACKEND', 'bd') != 'cache':
+        return
+    actifs = cache.get_many([cle_panier(t.pk) for t in tablettes])
+    for t in tablettes:
+        t.panier_actif = cle_panier(t.pk) in actifs
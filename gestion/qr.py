@@ -0,0 +1,116 @@
+# =========================================================
+# qr.py — QR codes de connexion des tablettes
+# =========================================================
+# Les images sont mises en cache par URL encodée : une table dont l'URL
+# n'a pas changé n'est jamais ré-encodée. Les lots (planche PDF, archive
+# ZIP) encodent les codes manquants dans un pool de processus.
+
+import hashlib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import qrcode
+from django.core.cache import cache
+from PIL import Image, ImageDraw, ImageFont
+
+from .jetons import jeton_tablette
+
+TTL_QR = 60 * 60 * 24 * 7
+# En dessous de ce nombre de codes à encoder, le pool coûte plus qu'il ne rapporte
+QR_LOT_MIN_PROCESSUS = 8
+
+# Planche PDF : A4 à 150 dpi, 2 × 3 codes par page
+PAGE_TAILLE = (1240, 1754)
+PAGE_RESOLUTION = 150
+PAGE_COLONNES, PAGE_LIGNES = 2, 3
+QR_TAILLE_PLANCHE = 460
+
+
+def url_connexion(base_url, tablette):
+    # Jeton signé → connexion 100% automatique, sans mot de passe dans l'URL
+    return f"{base_url}?t={jeton_tablette(tablette)}"
+
+
+def rendre_qr(url):
+    """PNG du QR code d'une URL (fonction de module : exécutable dans un processus fils)."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        box_size=12,
+        border=4,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="#1a1a2e", back_color="white")
+    buf = BytesIO()
+    img.save(buf)
+    return buf.getvalue()
+
+
+def _cle(url):
+    return 'gestion:qr:' + hashlib.sha256(url.encode()).hexdigest()
+
+
+def qr_png(url):
+    png = cache.get(_cle(url))
+    if png is None:
+        png = rendre_qr(url)
+        cache.set(_cle(url), png, TTL_QR)
+    return png
+
+
+def qr_lot(urls):
+    """PNG de chaque URL, dans l'ordre ; seuls les codes absents du cache sont encodés."""
+    en_cache = cache.get_many([_cle(url) for url in urls])
+    manquantes = list(dict.fromkeys(url for url in urls if _cle(url) not in en_cache))
+
+    if len(manquantes) >= QR_LOT_MIN_PROCESSUS:
+        with ProcessPoolExecutor() as pool:
+            rendus = list(pool.map(rendre_qr, manquantes, chunksize=4))
+    else:
+        rendus = [rendre_qr(url) for url in manquantes]
+
+    nouveaux = {_cle(url): png for url, png in zip(manquantes, rendus)}
+    if nouveaux:
+        cache.set_many(nouveaux, TTL_QR)
+    en_cache.update(nouveaux)
+    return [en_cache[_cle(url)] for url in urls]
+
+
+def planche_pdf(entrees):
+    """PDF multipage à partir de [(libellé, png)]."""
+    police = ImageFont.load_default(size=40)
+    largeur_case = PAGE_TAILLE[0] // PAGE_COLONNES
+    hauteur_case = PAGE_TAILLE[1] // PAGE_LIGNES
+    par_page = PAGE_COLONNES * PAGE_LIGNES
+
+    pages = []
+    for debut in range(0, len(entrees), par_page):
+        page = Image.new('RGB', PAGE_TAILLE, 'white')
+        dessin = ImageDraw.Draw(page)
+        for position, (libelle, png) in enumerate(entrees[debut:debut + par_page]):
+            x = (position % PAGE_COLONNES) * largeur_case
+            y = (position // PAGE_COLONNES) * hauteur_case
+            code = Image.open(BytesIO(png)).convert('RGB')
+            code = code.resize((QR_TAILLE_PLANCHE, QR_TAILLE_PLANCHE), Image.NEAREST)
+            page.paste(code, (x + (largeur_case - QR_TAILLE_PLANCHE) // 2, y + 30))
+            dessin.text(
+                (x + largeur_case // 2, y + 30 + QR_TAILLE_PLANCHE + 20),
+                libelle, fill='#1a1a2e', font=police, anchor='mt',
+            )
+        pages.append(page)
+
+    buf = BytesIO()
+    if pages:
+        pages[0].save(buf, 'PDF', save_all=True, append_images=pages[1:], resolution=PAGE_RESOLUTION)
+    return buf.getvalue()
+
+
+def archive_zip(entrees):
+    """ZIP à partir de [(nom de fichier, png)] ; les PNG sont déjà compressés."""
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as archive:
+        for nom, png in entrees:
+            archive.writestr(nom, png)
+    return buf.getvalue()
@@ -0,0 +1,182 @@
+# =========================================================
+# signals.py — Réactions aux écritures sur les modèles
+# =========================================================
+
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import caches
+from .models import (
+    Commande, CommandeEvenement, CommandeItem, Depense, LigneCuisine, Paiement, PanierItem, Plat,
+    ReservationStock, SessionUtilisateur, StatistiqueHeure, StatistiqueJour, Tablette, VentePlatJour,
+    VersionMenu,
+)
+
+
+# =========================================================
+# FLUX SERVEUR
+# =========================================================
+@receiver(post_save, sender=Commande)
+def publier_commande_enregistree(sender, instance, created, **kwargs):
+    if created:
+        type_evenement = 'creee'
+    elif instance.statut in ('servie', 'payee'):
+        type_evenement = instance.statut
+    else:
+        type_evenement = 'maj'
+    CommandeEvenement.objects.publier(instance.id, type_evenement)
+
+
+@receiver(post_delete, sender=Commande)
+def publier_commande_supprimee(sender, instance, **kwargs):
+    CommandeEvenement.objects.publier(instance.id, 'supprimee')
+
+
+# =========================================================
+# FILE DE LA CUISINE
+# =========================================================
+# Les lignes sont créées avec la commande (CommandeManager) et partent en
+# cascade avec elle ; une commande servie ou payée quitte la file.
+@receiver(post_save, sender=Commande)
+def retirer_de_la_cuisine(sender, instance, created, **kwargs):
+    if not created and instance.statut != 'en_attente':
+        LigneCuisine.objects.retirer(instance.id)
+
+
+# =========================================================
+# ÉTAT DES TABLES
+# =========================================================
+@receiver(post_save, sender=Commande)
+@receiver(post_delete, sender=Commande)
+def maj_etat_table_commande(sender, instance, **kwargs):
+    tablette_id = instance.tablette_id
+    transaction.on_commit(lambda: caches.maj_etat_table(tablette_id))
+
+
+# =========================================================
+# PARC DE TABLETTES
+# =========================================================
+@receiver(post_save, sender=Commande)
+@receiver(post_delete, sender=Commande)
+@receiver(post_save, sender=PanierItem)
+@receiver(post_delete, sender=PanierItem)
+@receiver(post_save, sender=Tablette)
+@receiver(post_delete, sender=Tablette)
+def invalider_flotte(sender, **kwargs):
+    transaction.on_commit(caches.invalider_flotte_tablettes)
+
+
+@receiver(post_save, sender=Tablette)
+@receiver(post_delete, sender=Tablette)
+def invalider_tablette_utilisateur(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: caches.invalider_tablette(user_id))
+
+
+# =========================================================
+# RÉSERVATIONS DE STOCK
+# =========================================================
+# Les réservations d'une tablette supprimée partiraient en cascade sans
+# passer par ReservationStockManager : on les rend avant la suppression.
+@receiver(pre_delete, sender=Tablette)
+def liberer_reservations_tablette(sender, instance, **kwargs):
+    ReservationStock.objects.liberer_tablette(instance)
+
+
+# =========================================================
+# VERSION DU MENU
+# =========================================================
+# Les décréments de stock passent par un UPDATE en masse et
+# incrémentent la version eux-mêmes (CommandeManager).
+@receiver(post_save, sender=Plat)
+@receiver(post_delete, sender=Plat)
+def changer_version_menu(sender, **kwargs):
+    transaction.on_commit(VersionMenu.objects.incrementer)
+
+
+# =========================================================
+# STATISTIQUES JOURNALIÈRES
+# =========================================================
+def _couverts(commande):
+    return Tablette.objects.filter(pk=commande.tablette_id).values_list(
+        'table__nombre_places', flat=True
+    ).first() or 0
+
+
+@receiver(post_save, sender=Commande)
+def compter_commande(sender, instance, created, **kwargs):
+    if created:
+        StatistiqueJour.objects.ajuster(
+            timezone.localdate(instance.date), nb_commandes=1, couverts=_couverts(instance)
+        )
+        StatistiqueHeure.objects.ajuster(instance.date, nb_commandes=1)
+
+
+# Les lignes de la commande sont supprimées en cascade avant elle : les
+# ventes par plat sont relevées avant la suppression, décomptées après.
+@receiver(pre_delete, sender=Commande)
+def relever_ventes_commande(sender, instance, **kwargs):
+    instance._ventes = {
+        ligne['plat_id']: (ligne['quantite'], ligne['recettes'])
+        for ligne in CommandeItem.objects.filter(commande_id=instance.pk).values('plat_id').annotate(
+            recettes=Sum(F('quantite') * F('prix_unitaire')), quantite=Sum('quantite'),
+        )
+    }
+
+
+@receiver(post_delete, sender=Commande)
+def decompter_commande(sender, instance, **kwargs):
+    jour = timezone.localdate(instance.date)
+    StatistiqueJour.objects.ajuster(jour, nb_commandes=-1, couverts=-_couverts(instance))
+    StatistiqueHeure.objects.ajuster(instance.date, nb_commandes=-1)
+    VentePlatJour.objects.annuler(jour, getattr(instance, '_ventes', {}))
+
+
+@receiver(post_save, sender=Paiement)
+def compter_paiement(sender, instance, created, **kwargs):
+    if created:
+        StatistiqueJour.objects.ajuster(
+            timezone.localdate(instance.date), recettes=instance.montant, nb_paiements=1
+        )
+        StatistiqueHeure.objects.ajuster(instance.date, recettes=instance.montant)
+
+
+@receiver(post_delete, sender=Paiement)
+def decompter_paiement(sender, instance, **kwargs):
+    StatistiqueJour.objects.ajuster(
+        timezone.localdate(instance.date), recettes=-instance.montant, nb_paiements=-1
+    )
+    StatistiqueHeure.objects.ajuster(instance.date, recettes=-instance.montant)
+
+
+@receiver(post_save, sender=Depense)
+def compter_depense(sender, instance, created, **kwargs):
+    if created:
+        StatistiqueJour.objects.ajuster(
+            timezone.localdate(instance.date), depenses=instance.montant, nb_depenses=1
+        )
+
+
+@receiver(post_delete, sender=Depense)
+def decompter_depense(sender, instance, **kwargs):
+    StatistiqueJour.objects.ajuster(
+        timezone.localdate(instance.date), depenses=-instance.montant, nb_depenses=-1
+    )
+
+
+# =========================================================
+# INDEX DES SESSIONS
+# =========================================================
+@receiver(user_logged_in)
+def indexer_session(sender, request, user, **kwargs):
+    SessionUtilisateur.objects.indexer(request, user)
+
+
+@receiver(user_logged_out)
+def desindexer_session(sender, request, user, **kwargs):
+    if request.session.session_key:
+        SessionUtilisateur.objects.filter(session_key=request.session.session_key).delete()
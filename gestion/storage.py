@@ -0,0 +1,58 @@
+# =========================================================
+# storage.py — Stockage des fichiers adressé par contenu
+# =========================================================
+# Un fichier envoyé est nommé d'après l'empreinte SHA-256 de son contenu :
+# plats/pizza.png -> plats/3f5a…c2.png. Renvoyer la même photo réutilise
+# le fichier existant au lieu d'en créer une copie, et une URL donnée
+# désigne toujours le même contenu (cache navigateur « immutable »).
+
+import hashlib
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+LONGUEUR_EMPREINTE = 32
+NOM_ADRESSE = re.compile(rf'(^|/)[0-9a-f]{{{LONGUEUR_EMPREINTE}}}(-[a-z]+-[0-9a-f]{{8}})?\.[a-z0-9]+$')
+
+
+def empreinte(fichier):
+    """Empreinte d'un django.core.files.File, relu depuis le début."""
+    sha = hashlib.sha256()
+    for morceau in fichier.chunks():
+        sha.update(morceau)
+    fichier.seek(0)
+    return sha.hexdigest()[:LONGUEUR_EMPREINTE]
+
+
+def nom_adresse(nom, hash_contenu):
+    dossier, fichier = posixpath.split(nom)
+    extension = posixpath.splitext(fichier)[1].lower()
+    return posixpath.join(dossier, hash_contenu + extension)
+
+
+def est_adresse(nom):
+    """Vrai si le nom a été dérivé d'une empreinte (original ou variante)."""
+    return bool(NOM_ADRESSE.search(nom))
+
+
+class StockageParContenu(FileSystemStorage):
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # upload_to est déjà appliqué : seul le nom de fichier change
+        name = nom_adresse(name, empreinte(content))
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+stockage_par_contenu = StockageParContenu()
+
+
+def stockage_plats():
+    return stockage_par_contenu
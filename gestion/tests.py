@@ -1,3 +1,1524 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+import gzip
+from io import BytesIO, StringIO
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import urls
+from .caches import meilleures_ventes
+from .images import FORMATS, VARIANTES, chemin_variante
+from .jetons import jeton_tablette
+from .management.commands import simuler_service
+from .storage import est_adresse
+
+from .models import (
+    CustomUser, TableRestaurant, Tablette,
+    Plat, Commande, CommandeEvenement, CommandeItem, LigneCuisine, SessionUtilisateur,
+    Paiement, Caisse, CaisseMouvement, Depense, StatistiqueJour, StatistiqueHeure, PanierItem, ReservationStock,
+    StockInsuffisant, VentePlatJour, VersionMenu,
+)
+
+
+# =========================================================
+# ACCUEIL
+# =========================================================
+class AccueilTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user('admin', role='admin')
+        self.client.force_login(self.admin)
+        for numero, places in ((1, 4), (2, 6)):
+            user = CustomUser.objects.create_user(f'tab{numero}', role='tablette')
+            table = TableRestaurant.objects.create(numero_table=numero, nombre_places=places)
+            tablette = Tablette.objects.create(user=user, table=table)
+            for _ in range(3):
+                commande = Commande.objects.create(tablette=tablette, total=Decimal('15'), statut='payee')
+                Paiement.objects.create(commande=commande, montant=commande.total)
+        Depense.objects.create(description='Gaz', montant=Decimal('20'))
+
+    def test_tableau_de_bord_lit_le_cumul(self):
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('Accueil'))
+        self.assertEqual(response.context['nb_commandes'], 6)
+        self.assertEqual(response.context['couverts'], 30)
+        self.assertEqual(response.context['recette_total'], Decimal('90'))
+        heure = timezone.localtime(Paiement.objects.earliest('date').date).hour
+        self.assertEqual(
+            [(h.heure, h.nb_commandes, h.recettes, h.part) for h in response.context['activite_horaire']],
+            [(heure, 6, Decimal('90'), 100)],
+        )
+        self.assertContains(response, f'{heure:02d}h')
+
+        Commande.objects.filter(tablette__table__numero_table=2).first().delete()
+        response = self.client.get(reverse('Accueil'))
+        self.assertEqual(response.context['nb_commandes'], 5)
+        self.assertEqual(response.context['couverts'], 24)
+        self.assertEqual(response.context['recette_total'], Decimal('75'))
+
+    def test_recalcul_identique_aux_increments(self):
+        champs = ('jour', 'nb_commandes', 'couverts', 'recettes', 'nb_paiements', 'depenses', 'nb_depenses')
+        jours = list(StatistiqueJour.objects.values_list(*champs))
+        heures = list(StatistiqueHeure.objects.values_list('jour', 'heure', 'nb_commandes', 'recettes'))
+        call_command('recalculer_statistiques', stdout=StringIO())
+        self.assertEqual(list(StatistiqueJour.objects.values_list(*champs)), jours)
+        self.assertEqual(list(StatistiqueHeure.objects.values_list('jour', 'heure', 'nb_commandes', 'recettes')), heures)
+
+
+class MeilleuresVentesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user('tab1', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=1, nombre_places=4)
+        self.tablette = Tablette.objects.create(user=user, table=table)
+        self.burger = Plat.objects.create(nom='Burger', prix_unitaire=Decimal('20'), quantite_disponible=100)
+        self.soda = Plat.objects.create(nom='Soda', prix_unitaire=Decimal('5'), quantite_disponible=100)
+
+    def commander(self, *lignes):
+        for plat, quantite in lignes:
+            PanierItem.objects.create(tablette=self.tablette, plat=plat, quantite=quantite)
+        return Commande.objects.creer_depuis_panier(self.tablette)
+
+    def test_classement_par_quantite(self):
+        self.commander((self.burger, 10))
+        self.commander((self.soda, 1), (self.burger, 1))
+        self.commander((self.soda, 1))
+
+        vente = VentePlatJour.objects.get(plat=self.burger, jour=timezone.localdate())
+        self.assertEqual((vente.quantite, vente.recettes), (11, Decimal('220')))
+        for fenetre in ('jour', 'semaine', 'total'):
+            classement = meilleures_ventes(fenetre)
+            self.assertEqual([p['nom'] for p in classement], ['Burger', 'Soda'])
+            self.assertEqual([p['quantite'] for p in classement], [11, 2])
+
+        # Servi depuis le cache
+        with self.assertNumQueries(0):
+            meilleures_ventes('total')
+
+        lignes = list(VentePlatJour.objects.values_list('plat', 'jour', 'quantite', 'recettes').order_by('plat'))
+        call_command('recalculer_statistiques', stdout=StringIO())
+        self.assertEqual(
+            list(VentePlatJour.objects.values_list('plat', 'jour', 'quantite', 'recettes').order_by('plat')), lignes
+        )
+
+    def test_suppression_decompte_les_ventes(self):
+        premiere = self.commander((self.burger, 4), (self.soda, 2))
+        self.commander((self.burger, 1))
+        premiere.delete()
+        ventes = dict(VentePlatJour.objects.values_list('plat__nom', 'quantite'))
+        self.assertEqual(ventes, {'Burger': 1, 'Soda': 0})
+        self.assertEqual(VentePlatJour.objects.get(plat=self.burger).recettes, Decimal('20'))
+
+        # Suppression en masse (admin_tout_supprimer) : même décompte
+        Commande.objects.all().delete()
+        self.assertEqual(set(VentePlatJour.objects.values_list('quantite', 'recettes')), {(0, Decimal('0'))})
+
+    def test_purge_en_masse(self):
+        admin = CustomUser.objects.create_user('admin', role='admin')
+        self.client.force_login(admin)
+        Depense.objects.create(description='Gaz', montant=Decimal('20'))
+
+        def purger(nombre):
+            for _ in range(nombre):
+                commande = self.commander((self.burger, 2), (self.soda, 1))
+                Paiement.objects.create(commande=commande, montant=commande.total)
+            with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as requetes:
+                self.client.post(reverse('admin_tout_supprimer'), {'type': 'commandes'})
+            return len(requetes)
+
+        # Pas de décompte par commande : le coût ne dépend pas du nombre de commandes
+        self.assertEqual(purger(2), purger(20))
+        self.assertFalse(Commande.objects.exists() or Paiement.objects.exists())
+        stats = StatistiqueJour.objects.get(jour=timezone.localdate())
+        self.assertEqual((stats.nb_commandes, stats.recettes, stats.depenses), (0, 0, Decimal('20')))
+        self.assertFalse(VentePlatJour.objects.exists())
+        self.assertEqual(CommandeEvenement.objects.filter(type_evenement='supprimee').count(), 22)
+
+    def test_fenetres_glissantes(self):
+        il_y_a_dix_jours = timezone.localdate() - timedelta(days=10)
+        VentePlatJour.objects.create(plat=self.soda, jour=il_y_a_dix_jours, quantite=50, recettes=Decimal('250'))
+        self.commander((self.burger, 3))
+
+        self.assertEqual([p['nom'] for p in meilleures_ventes('semaine')], ['Burger'])
+        self.assertEqual([p['nom'] for p in meilleures_ventes('total')], ['Soda', 'Burger'])
+
+
+# =========================================================
+# MENU
+# =========================================================
+class MenuTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user('tab1', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=1, nombre_places=4)
+        self.tablette = Tablette.objects.create(user=user, table=table)
+        self.plat = Plat.objects.create(nom='Burger', prix_unitaire=Decimal('20'), quantite_disponible=10)
+        self.client.force_login(user)
+
+    def test_get_conditionnel(self):
+        response = self.client.get(reverse('cuisinier_index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Burger')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        etag = response['ETag']
+
+        response = self.client.get(reverse('cuisinier_index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Un changement de plat fait expirer l'ETag et le fragment
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plat.nom = 'Cheeseburger'
+            self.plat.save()
+        response = self.client.get(reverse('cuisinier_index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Cheeseburger')
+
+    def test_commande_change_la_version(self):
+        version = VersionMenu.objects.actuelle().numero
+        PanierItem.objects.create(tablette=self.tablette, plat=self.plat, quantite=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Commande.objects.creer_depuis_panier(self.tablette)
+        self.assertEqual(VersionMenu.objects.actuelle().numero, version + 1)
+
+        response = self.client.get(reverse('cuisinier_index'))
+        self.assertContains(response, 'Stock : 8')
+
+
+MEDIA_TEST = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST)
+class VariantesImageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_TEST, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.cuisinier = CustomUser.objects.create_user('chef', role='cuisinier')
+        self.client.force_login(self.cuisinier)
+
+    def photo(self, nom='pizza.png', taille=(1400, 900)):
+        tampon = BytesIO()
+        Image.new('RGBA', taille, (200, 80, 20, 255)).save(tampon, 'PNG')
+        return SimpleUploadedFile(nom, tampon.getvalue(), content_type='image/png')
+
+    def test_envoi_cree_les_variantes(self):
+        self.client.post(reverse('ajouter_plat'), {
+            'nom': 'Pizza', 'prix_unitaire': '30', 'quantite_disponible': '5',
+            'disponible': 'on', 'image': self.photo(),
+        })
+        plat = Plat.objects.get(nom='Pizza')
+        for variante, largeur in VARIANTES.items():
+            for extension in FORMATS:
+                with default_storage.open(chemin_variante(plat.image.name, variante, extension)) as f:
+                    self.assertEqual(Image.open(f).width, largeur)
+
+        response = self.client.get(reverse('cuisinier_index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, f"{chemin_variante(plat.image.name, 'miniature', 'webp')} 240w")
+
+    def test_commande_de_rattrapage(self):
+        plat = Plat.objects.create(nom='Pizza', prix_unitaire=Decimal('30'))
+        plat.image.save('ancienne.png', self.photo('ancienne.png', (300, 200)))
+        self.assertIsNone(plat.variantes_image)
+
+        call_command('generer_variantes', stdout=StringIO())
+        self.assertIsNotNone(plat.variantes_image)
+        # Jamais d'agrandissement : l'original fait 300 px de large
+        with default_storage.open(chemin_variante(plat.image.name, 'carte', 'jpg')) as f:
+            self.assertEqual(Image.open(f).width, 300)
+
+    def test_reglages_modifies_nouvelle_url(self):
+        plat = Plat.objects.create(nom='Pizza', prix_unitaire=Decimal('30'))
+        plat.image.save('pizza.png', self.photo())
+        call_command('generer_variantes', stdout=StringIO())
+        ancien = chemin_variante(plat.image.name, 'carte', 'webp')
+        self.assertTrue(est_adresse(ancien))
+
+        with mock.patch.dict(FORMATS['webp'], quality=60):
+            nouveau = chemin_variante(plat.image.name, 'carte', 'webp')
+            self.assertNotEqual(nouveau, ancien)
+            self.assertIsNone(plat.variantes_image)
+            call_command('generer_variantes', stdout=StringIO())
+            self.assertTrue(default_storage.exists(nouveau))
+        # Les octets derrière l'ancienne URL immuable n'ont pas bougé
+        self.assertTrue(default_storage.exists(ancien))
+        self.assertFalse(est_adresse(f"plats/variantes/{'0' * 32}-carte.webp"))
+
+
+class StockageParContenuTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        reglages = override_settings(MEDIA_ROOT=self.media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.client.force_login(CustomUser.objects.create_user('admin', role='admin'))
+
+    def photo(self, couleur=(10, 120, 200)):
+        tampon = BytesIO()
+        Image.new('RGB', (64, 64), couleur).save(tampon, 'PNG')
+        return SimpleUploadedFile('pizza.png', tampon.getvalue(), content_type='image/png')
+
+    def test_envois_identiques_dedupliques(self):
+        for nom in ('Pizza', 'Pizza XL'):
+            self.client.post(reverse('ajouter_plat'), {
+                'nom': nom, 'prix_unitaire': '30', 'quantite_disponible': '5', 'image': self.photo(),
+            })
+        noms = set(Plat.objects.values_list('image', flat=True))
+        self.assertEqual(len(noms), 1)
+        self.assertTrue(est_adresse(noms.pop()))
+        self.assertEqual(len(os.listdir(os.path.join(self.media, 'plats'))), 2)  # photo + variantes/
+
+    def test_service_immuable_et_plages(self):
+        plat = Plat.objects.create(nom='Pizza', prix_unitaire=Decimal('30'))
+        plat.image.save('pizza.png', self.photo())
+        url = plat.image.url
+        contenu = plat.image.read()
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), contenu)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(contenu)}')
+        self.assertEqual(b''.join(response.streaming_content), contenu[10:20])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), contenu[-5:])
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f'bytes={len(contenu)}-').status_code, 416)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+    def test_commande_de_deduplication(self):
+        ancien = FileSystemStorage()
+        contenu = self.photo().read()
+        noms = [ancien.save('plats/salade.jpeg', ContentFile(contenu)) for _ in range(3)]
+        autre = ancien.save('plats/burger.png', ContentFile(self.photo((1, 2, 3)).read()))
+        plats = [Plat.objects.create(nom=f'Salade {i}', prix_unitaire=Decimal('10'), image=nom) for i, nom in enumerate(noms)]
+        burger = Plat.objects.create(nom='Burger', prix_unitaire=Decimal('10'), image=autre)
+
+        call_command('dedupliquer_medias', stdout=StringIO())
+        images = {Plat.objects.get(pk=p.pk).image.name for p in plats}
+        self.assertEqual(len(images), 1)
+        self.assertTrue(est_adresse(images.pop()))
+        burger.refresh_from_db()
+        self.assertTrue(est_adresse(burger.image.name))
+        fichiers = [f for f in os.listdir(os.path.join(self.media, 'plats')) if f != 'variantes']
+        self.assertEqual(len(fichiers), 2)
+        self.assertIsNotNone(burger.variantes_image)
+
+# =========================================================
+# VALIDATION DU PANIER
+# =========================================================
+class ValidationPanierTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user('tab1', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=1, nombre_places=4)
+        self.tablette = Tablette.objects.create(user=user, table=table)
+        self.burger = Plat.objects.create(nom='Burger', prix_unitaire=Decimal('20'), quantite_disponible=5)
+        self.soda = Plat.objects.create(nom='Soda', prix_unitaire=Decimal('5'), quantite_disponible=3)
+        PanierItem.objects.create(tablette=self.tablette, plat=self.burger, quantite=2)
+        PanierItem.objects.create(tablette=self.tablette, plat=self.soda, quantite=4)
+
+    def test_panier_survendu_annule_tout(self):
+        version = VersionMenu.objects.actuelle().numero
+        with self.captureOnCommitCallbacks(execute=True) as rappels:
+            with self.assertRaises(StockInsuffisant) as erreur:
+                Commande.objects.creer_depuis_panier(self.tablette)
+        self.assertEqual(erreur.exception.plats, ['Soda'])
+        self.assertEqual(rappels, [])
+
+        # Ni stock décrémenté, ni commande, et le panier est rendu intact
+        self.assertEqual(
+            dict(Plat.objects.values_list('nom', 'quantite_disponible')), {'Burger': 5, 'Soda': 3}
+        )
+        self.assertEqual(Plat.objects.filter(disponible=True).count(), 2)
+        self.assertFalse(Commande.objects.exists())
+        self.assertFalse(CommandeItem.objects.exists())
+        self.assertEqual(
+            dict(PanierItem.objects.values_list('plat__nom', 'quantite')), {'Burger': 2, 'Soda': 4}
+        )
+        self.assertEqual(VersionMenu.objects.actuelle().numero, version)
+
+
+# =========================================================
+# SERVEUR
+# =========================================================
+@override_settings(CACHE_PARTAGE=True)
+class ServeurIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.serveur = CustomUser.objects.create_user('serveur', password='x', role='serveur')
+        self.plat = Plat.objects.create(nom='Burger', prix_unitaire=Decimal('25000'), quantite_disponible=500)
+        self.client.force_login(self.serveur)
+
+    def creer_tables(self, debut, nombre):
+        for numero in range(debut, debut + nombre):
+            table = TableRestaurant.objects.create(numero_table=numero, nombre_places=4)
+            user = CustomUser.objects.create_user(f'tab{numero}', role='tablette')
+            tablette = Tablette.objects.create(user=user, table=table)
+            commande = Commande.objects.create(tablette=tablette, total=Decimal('25000'))
+            CommandeItem.objects.create(commande=commande, plat=self.plat, quantite=1, prix_unitaire=Decimal('25000'))
+
+    def test_nombre_de_requetes_independant_du_nombre_de_tables(self):
+        self.creer_tables(1, 1)
+        with self.assertNumQueries(8):
+            self.client.get(reverse('serveur_index'))
+
+        cache.clear()
+        self.creer_tables(2, 99)
+        with self.assertNumQueries(8) as ctx:
+            response = self.client.get(reverse('serveur_index'))
+        self.assertEqual(len(response.context['tables_context']), 100)
+        self.assertTrue(all(t['etat'] == 'en_attente' for t in response.context['tables_context']))
+
+        # Carte des états en cache : plus de sous-requête
+        with self.assertNumQueries(len(ctx.captured_queries) - 1):
+            self.client.get(reverse('serveur_index'))
+
+    def test_etat_des_tables_suit_les_commandes(self):
+        self.creer_tables(1, 1)
+        self.client.get(reverse('serveur_index'))
+        commande = Commande.objects.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            commande.statut = 'servie'
+            commande.save()
+        response = self.client.get(reverse('serveur_index'))
+        self.assertEqual(response.context['tables_context'][0]['etat'], 'servie')
+        self.assertEqual(response.context['tables_context'][0]['derniere_commande'], commande)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            commande.statut = 'payee'
+            commande.save()
+        response = self.client.get(reverse('serveur_index'))
+        self.assertEqual(response.context['tables_context'][0]['etat'], 'libre')
+        self.assertIsNone(response.context['tables_context'][0]['derniere_commande'])
+
+    def test_une_cle_par_table(self):
+        self.creer_tables(1, 2)
+        self.client.get(reverse('serveur_index'))
+        premiere, seconde = Commande.objects.order_by('id')
+
+        # Deux validations simultanées : chacune n'écrit que l'état de sa table
+        with self.captureOnCommitCallbacks(execute=True):
+            premiere.statut = 'servie'
+            premiere.save()
+            seconde.delete()
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('serveur_index'))
+        self.assertEqual([t['etat'] for t in response.context['tables_context']], ['servie', 'libre'])
+        self.assertFalse([q for q in requetes if 'derniere_commande_statut' in q['sql']])
+
+
+@override_settings(SERVEUR_FLUX_ATTENTE=0)
+class ServeurFluxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.serveur = CustomUser.objects.create_user('serveur', role='serveur')
+        self.client.force_login(self.serveur)
+        plat = Plat.objects.create(nom='Burger', prix_unitaire=Decimal('25000'), quantite_disponible=500)
+        user = CustomUser.objects.create_user('tab1', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=7, nombre_places=4)
+        tablette = Tablette.objects.create(user=user, table=table)
+        self.commandes = []
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                commande = Commande.objects.create(tablette=tablette, total=Decimal('25000'))
+                CommandeItem.objects.create(commande=commande, plat=plat, quantite=1, prix_unitaire=Decimal('25000'))
+            self.commandes.append(commande)
+        self.premier, self.second = CommandeEvenement.objects.order_by('id').values_list('id', flat=True)
+
+    def evenements(self, response):
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        contenu = response.content.decode()
+        return [
+            (int(eid), json.loads(data))
+            for eid, data in re.findall(r'id: (\d+)\nevent: commande\ndata: (.*)\n\n', contenu)
+        ]
+
+    def test_reprise_depuis_dernier_id_et_last_event_id(self):
+        evenements = self.evenements(self.client.get(reverse('serveur_flux'), {'dernier_id': self.premier}))
+        self.assertEqual([eid for eid, _ in evenements], [self.second])
+        self.assertEqual(evenements[0][1]['id'], self.commandes[1].id)
+        self.assertEqual(evenements[0][1]['table'], 7)
+        self.assertEqual(evenements[0][1]['items'], [{'plat': 'Burger', 'quantite': 1}])
+
+        # Reconnexion d'EventSource : l'en-tête l'emporte sur l'URL d'origine
+        commande_id = self.commandes[0].id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.commandes[0].delete()
+        evenements = self.evenements(self.client.get(
+            reverse('serveur_flux'), {'dernier_id': 0}, HTTP_LAST_EVENT_ID=str(self.second)
+        ))
+        self.assertEqual([data for _, data in evenements], [{'id': commande_id, 'type': 'supprimee'}])
+        self.assertGreater(evenements[0][0], self.second)
+
+    def test_long_poll_sans_evenement(self):
+        response = self.client.get(reverse('serveur_flux'), HTTP_LAST_EVENT_ID=str(self.second))
+        self.assertEqual(response.content, b'retry: 500\n\n')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    def test_index_lit_le_curseur_avant_les_commandes(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('serveur_index'))
+        self.assertEqual(response.context['dernier_evenement_id'], self.second)
+        tables = [q['sql'] for q in ctx.captured_queries]
+        curseur = next(i for i, sql in enumerate(tables) if 'gestion_commandeevenement' in sql)
+        commandes = next(i for i, sql in enumerate(tables) if 'FROM "gestion_commande"' in sql)
+        self.assertLess(curseur, commandes)
+
+
+# =========================================================
+# ADMINISTRATION
+# =========================================================
+class AdminPageTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('admin', password='x', role='admin')
+        self.client.force_login(self.admin)
+
+        CustomUser.objects.bulk_create(
+            CustomUser(identifiant=f'user{i}', role='serveur') for i in range(300)
+        )
+        tablettes_users = CustomUser.objects.bulk_create(
+            CustomUser(identifiant=f'tab{i}', role='tablette') for i in range(200)
+        )
+        tables = TableRestaurant.objects.bulk_create(
+            TableRestaurant(numero_table=i, nombre_places=4) for i in range(1, 201)
+        )
+        Tablette.objects.bulk_create(
+            Tablette(user=u, table=t) for u, t in zip(tablettes_users[:150], tables[:150])
+        )
+
+    def test_panneau_de_controle_sans_n_plus_un(self):
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('controle_general'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_utilisateurs'].paginator.count, 501)
+        self.assertEqual(response.context['page_tables'].paginator.count, 200)
+
+        with self.assertNumQueries(8):
+            self.client.get(reverse('controle_general'), {'page_table': 7, 'page_user': 3})
+
+    def test_recherche(self):
+        response = self.client.get(reverse('controle_general'), {'q_user': 'user29', 'q_table': '12'})
+        self.assertEqual(
+            {u.identifiant for u in response.context['utilisateurs']},
+            {'user29'} | {f'user29{i}' for i in range(10)},
+        )
+        self.assertEqual([t['numero'] for t in response.context['tables']], [12])
+
+        response = self.client.get(reverse('controle_general'), {'q_table': 'tab14'})
+        self.assertEqual(response.context['page_tables'].paginator.count, 11)
+
+
+@override_settings(CACHE_PARTAGE=True)
+class FlotteTablettesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(CustomUser.objects.create_user('admin', role='admin'))
+        self.plat = Plat.objects.create(nom='Riz', prix_unitaire=Decimal('20000'), quantite_disponible=10)
+        self.tablettes = []
+        for numero in (1, 2):
+            user = CustomUser.objects.create_user(f'tab{numero}', role='tablette')
+            table = TableRestaurant.objects.create(numero_table=numero, nombre_places=4)
+            self.tablettes.append(Tablette.objects.create(user=user, table=table))
+
+    def flotte(self):
+        response = self.client.get(reverse('tablette_index'))
+        etats = {
+            t.table.numero_table: (t.en_utilisation, t.panier_actif)
+            for t in response.context['toutes_les_tablettes']
+        }
+        return etats, response.context['taux_occupation']
+
+    def test_panier_et_commande_changent_la_flotte(self):
+        self.assertEqual(self.flotte(), ({1: (False, False), 2: (False, False)}, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PanierItem.objects.create(tablette=self.tablettes[0], plat=self.plat, quantite=2)
+        self.assertEqual(self.flotte(), ({1: (False, True), 2: (False, False)}, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Commande.objects.creer_depuis_panier(self.tablettes[0])
+        self.assertEqual(self.flotte(), ({1: (True, False), 2: (False, False)}, 50))
+
+        # Sans changement, l'instantané est relu depuis le cache
+        with CaptureQueriesContext(connection) as requetes:
+            self.flotte()
+        self.assertFalse([q for q in requetes if 'FROM "gestion_tablette"' in q['sql']])
+
+
+# =========================================================
+# QR CODES
+# =========================================================
+class QrTablesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(CustomUser.objects.create_user('admin', role='admin'))
+        for numero in range(1, 11):
+            user = CustomUser.objects.create_user(f'tab{numero}', role='tablette')
+            table = TableRestaurant.objects.create(numero_table=numero, nombre_places=4)
+            Tablette.objects.create(user=user, table=table)
+
+    def test_planche_pdf_et_archive_zip(self):
+        response = self.client.get(reverse('qr_tables'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertEqual(response.content.count(b'/Type /Page\n'), 2)  # 10 codes, 6 par page
+
+        # Tout est en cache : aucun code n'est ré-encodé
+        with mock.patch('gestion.qr.rendre_qr', side_effect=AssertionError):
+            response = self.client.get(reverse('qr_tables'), {'format': 'zip'})
+        with zipfile.ZipFile(BytesIO(response.content)) as archive:
+            noms = archive.namelist()
+            self.assertEqual(len(noms), 10)
+            self.assertEqual(noms[0], 'table_001.png')
+            self.assertEqual(Image.open(BytesIO(archive.read(noms[0]))).format, 'PNG')
+
+    def test_seules_les_urls_modifiees_sont_reencodees(self):
+        self.client.get(reverse('qr_tables'), {'format': 'zip'})
+        Tablette.objects.filter(table__numero_table=3).update(
+            jeton_emis_le=timezone.now() + timedelta(seconds=1)
+        )
+        with mock.patch('gestion.qr.rendre_qr', return_value=b'png') as rendre:
+            self.client.get(reverse('qr_tables'), {'format': 'zip'})
+        self.assertEqual(rendre.call_count, 1)
+        self.assertIn('/login/?t=', rendre.call_args[0][0])
+
+
+class JetonConnexionTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user('tab1', password='secret', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=1, nombre_places=4)
+        self.tablette = Tablette.objects.create(user=user, table=table)
+
+    def connexion(self):
+        return self.client.get(reverse('login'), {'t': jeton_tablette(self.tablette)})
+
+    def test_connexion_sans_hacheur(self):
+        with mock.patch('django.contrib.auth.base_user.check_password', side_effect=AssertionError):
+            response = self.connexion()
+        self.assertRedirects(response, reverse('Accueil'), fetch_redirect_response=False)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.tablette.user_id)
+
+    def test_jeton_refuse(self):
+        jeton = jeton_tablette(self.tablette)
+        response = self.client.get(reverse('login'), {'t': jeton[:-1] + 'x'})
+        self.assertContains(response, 'QR code invalide')
+
+        Tablette.objects.filter(pk=self.tablette.pk).update(is_blocked=True)
+        self.assertContains(self.client.get(reverse('login'), {'t': jeton}), 'bloquée')
+
+        Tablette.objects.filter(pk=self.tablette.pk).update(
+            is_blocked=False, jeton_emis_le=self.tablette.jeton_emis_le - timedelta(days=181)
+        )
+        self.tablette.refresh_from_db()
+        self.assertContains(self.connexion(), 'expiré')
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_changement_de_mot_de_passe_revoque(self):
+        jeton = jeton_tablette(self.tablette)
+        self.tablette.user.set_password('autre')
+        self.tablette.user.save()
+        self.assertContains(self.client.get(reverse('login'), {'t': jeton}), 'révoqué')
+
+# =========================================================
+# DÉCONNEXION DES TABLETTES
+# =========================================================
+class DeconnexionTablettesTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('admin', role='admin')
+        self.client.force_login(self.admin)
+        self.tablettes = []
+        for numero in (1, 2):
+            user = CustomUser.objects.create_user(f'tab{numero}', role='tablette')
+            table = TableRestaurant.objects.create(numero_table=numero, nombre_places=4)
+            self.tablettes.append(Tablette.objects.create(user=user, table=table))
+            Client().force_login(user)
+
+    def sessions_de(self, user):
+        return Session.objects.filter(
+            session_key__in=SessionUtilisateur.objects.filter(user=user).values('session_key')
+        ).count()
+
+    def test_deconnecter_toutes_les_tablettes(self):
+        self.assertEqual(SessionUtilisateur.objects.count(), 3)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('deconnecter_tablettes'))
+        self.assertEqual(SessionUtilisateur.objects.filter(user__role='tablette').count(), 0)
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(self.sessions_de(self.admin), 1)
+
+    def test_bloquer_une_tablette_la_deconnecte(self):
+        self.client.post(reverse('toggle_blocage_tablette', args=[self.tablettes[0].id]))
+        self.assertEqual(self.sessions_de(self.tablettes[0].user), 0)
+        self.assertEqual(self.sessions_de(self.tablettes[1].user), 1)
+
+
+# =========================================================
+# CONTEXTE TABLETTE (middleware)
+# =========================================================
+@override_settings(CACHE_PARTAGE=True)
+class TabletteMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user('tab1', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=1, nombre_places=4)
+        self.tablette = Tablette.objects.create(user=user, table=table)
+        self.client.force_login(user)
+
+    def test_tablette_resolue_depuis_le_cache(self):
+        self.client.get(reverse('tablette_index'))
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('tablette_index'))
+        self.assertEqual(response.context['tablette'], self.tablette)
+        self.assertFalse([q for q in requetes if 'FROM "gestion_tablette"' in q['sql']])
+
+        # Cache propre à chaque worker : une invalidation ne les atteindrait pas tous
+        with override_settings(CACHE_PARTAGE=False), CaptureQueriesContext(connection) as requetes:
+            self.client.get(reverse('tablette_index'))
+        self.assertTrue([q for q in requetes if 'FROM "gestion_tablette"' in q['sql']])
+
+    def test_blocage_et_desactivation(self):
+        self.client.get(reverse('voir_panier'))
+        self.tablette.active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tablette.save()
+        self.assertEqual(self.client.get(reverse('voir_panier')).status_code, 404)
+
+        self.tablette.is_blocked = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tablette.save()
+        response = self.client.get(reverse('voir_panier'))
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+
+# =========================================================
+# PANIER EN CACHE
+# =========================================================
+@override_settings(PANIER_BACKEND='cache')
+class PanierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user('tab1', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=1, nombre_places=4)
+        self.tablette = Tablette.objects.create(user=user, table=table)
+        self.plat = Plat.objects.create(nom='Riz', prix_unitaire=Decimal('20000'), quantite_disponible=5)
+        self.client.force_login(user)
+
+    def ajouter(self, quantite):
+        return self.client.post(reverse('ajouter_au_panier', args=[self.plat.id]), {'quantite': quantite})
+
+    def test_aucune_ecriture_avant_validation(self):
+        self.ajouter(1)
+        with CaptureQueriesContext(connection) as requetes:
+            self.ajouter(3)
+            self.ajouter(4)  # plafonné au stock
+            self.client.post(reverse('modifier_panier', args=[self.plat.id]), {'quantite': 4})
+        self.assertFalse([q for q in requetes if not q['sql'].startswith('SELECT')])
+        self.assertFalse(PanierItem.objects.exists())
+
+        response = self.client.get(reverse('voir_panier'))
+        self.assertEqual([(i.plat, i.quantite) for i in response.context['items']], [(self.plat, 4)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse('valider_panier'))
+        commande = response.context['commande']
+        self.assertEqual(commande.total, Decimal('80000'))
+        self.assertEqual(commande.items.get().quantite, 4)
+        self.plat.refresh_from_db()
+        self.assertEqual(self.plat.quantite_disponible, 1)
+        self.assertEqual(self.client.get(reverse('voir_panier')).context['items'], [])
+
+    def test_stock_insuffisant_conserve_le_panier(self):
+        self.ajouter(3)
+        Plat.objects.filter(pk=self.plat.pk).update(quantite_disponible=2)
+        response = self.client.get(reverse('valider_panier'))
+        self.assertRedirects(response, reverse('voir_panier'), fetch_redirect_response=False)
+        self.assertFalse(Commande.objects.exists())
+        self.assertEqual(len(self.client.get(reverse('voir_panier')).context['items']), 1)
+
+
+# =========================================================
+# RÉSERVATIONS DE STOCK
+# =========================================================
+@override_settings(RESERVATION_PANIER_TTL=900)
+class ReservationStockTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plat = Plat.objects.create(nom='Riz', prix_unitaire=Decimal('20000'), quantite_disponible=5)
+        self.clients = []
+        for numero in (1, 2):
+            user = CustomUser.objects.create_user(f'tab{numero}', role='tablette')
+            table = TableRestaurant.objects.create(numero_table=numero, nombre_places=4)
+            Tablette.objects.create(user=user, table=table)
+            client = Client()
+            client.force_login(user)
+            self.clients.append(client)
+
+    def quantites_panier(self):
+        return dict(PanierItem.objects.values_list('tablette__user__identifiant', 'quantite'))
+
+    def test_portions_retenues_puis_converties(self):
+        tab1, tab2 = self.clients
+        tab1.post(reverse('ajouter_au_panier', args=[self.plat.id]), {'quantite': 4})
+        tab2.post(reverse('ajouter_au_panier', args=[self.plat.id]), {'quantite': 3})
+        self.assertEqual(self.quantites_panier(), {'tab1': 4, 'tab2': 1})
+        self.plat.refresh_from_db()
+        self.assertEqual((self.plat.quantite_reservee, self.plat.quantite_libre), (5, 0))
+
+        response = tab2.post(reverse('ajouter_au_panier', args=[self.plat.id]), {'quantite': 1})
+        self.assertIn('épuisé', str(list(get_messages(response.wsgi_request))[-1]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tab1.get(reverse('valider_panier'))
+        self.plat.refresh_from_db()
+        self.assertEqual((self.plat.quantite_disponible, self.plat.quantite_reservee), (1, 1))
+        self.assertEqual(list(ReservationStock.objects.values_list('tablette__user__identifiant', 'quantite')), [('tab2', 1)])
+
+    def test_balayage_des_reservations_expirees(self):
+        tab1, tab2 = self.clients
+        tab1.post(reverse('ajouter_au_panier', args=[self.plat.id]), {'quantite': 5})
+        ReservationStock.objects.update(expire_le=timezone.now() - timedelta(seconds=1))
+        sortie = StringIO()
+        call_command('liberer_reservations', stdout=sortie)
+        self.assertIn('1 réservation', sortie.getvalue())
+        self.plat.refresh_from_db()
+        self.assertEqual(self.plat.quantite_reservee, 0)
+
+        # Le panier abandonné ne retient plus rien : la validation échoue si le stock a été pris
+        tab2.post(reverse('ajouter_au_panier', args=[self.plat.id]), {'quantite': 5})
+        response = tab1.get(reverse('valider_panier'))
+        self.assertRedirects(response, reverse('voir_panier'), fetch_redirect_response=False)
+        self.assertFalse(Commande.objects.exists())
+
+    def test_liberation_decremente_et_carte_stock_libre(self):
+        tab1, tab2 = self.clients
+        tab1.post(reverse('ajouter_au_panier', args=[self.plat.id]), {'quantite': 2})
+        tab2.post(reverse('ajouter_au_panier', args=[self.plat.id]), {'quantite': 2})
+        self.assertEqual(tab1.get(reverse('api_menu')).json()['plats'][0]['stock'], 1)
+
+        # Une portion retenue par une réservation pas encore enregistrée
+        Plat.objects.filter(id=self.plat.id).update(quantite_reservee=F('quantite_reservee') + 1)
+        ReservationStock.objects.filter(tablette__user__identifiant='tab1').update(
+            expire_le=timezone.now() - timedelta(seconds=1)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ReservationStock.objects.liberer_expirees(), 1)
+        self.plat.refresh_from_db()
+        self.assertEqual(self.plat.quantite_reservee, 3)
+        self.assertEqual(tab1.get(reverse('api_menu')).json()['plats'][0]['stock'], 2)
+
+    def test_modifier_sans_stock_libre_garde_la_ligne(self):
+        tab1, tab2 = self.clients
+        tab1.post(reverse('ajouter_au_panier', args=[self.plat.id]), {'quantite': 3})
+        ReservationStock.objects.update(expire_le=timezone.now() - timedelta(seconds=1))
+        tab2.post(reverse('ajouter_au_panier', args=[self.plat.id]), {'quantite': 5})
+        ligne = PanierItem.objects.get(tablette__user__identifiant='tab1')
+
+        # Plus aucune portion libre : la ligne reste, sans jamais grossir
+        tab1.post(reverse('modifier_panier', args=[ligne.id]), {'quantite': 4})
+        self.assertEqual(self.quantites_panier(), {'tab1': 3, 'tab2': 5})
+        tab1.post(reverse('modifier_panier', args=[ligne.id]), {'quantite': 2})
+        self.assertEqual(self.quantites_panier(), {'tab1': 2, 'tab2': 5})
+
+        with self.settings(RESERVATION_PANIER_TTL=0):
+            Plat.objects.filter(id=self.plat.id).update(quantite_disponible=0)
+            tab1.post(reverse('modifier_panier', args=[ligne.id]), {'quantite': 1})
+        self.assertEqual(self.quantites_panier(), {'tab1': 1, 'tab2': 5})
+
+
+# =========================================================
+# API TABLETTE
+# =========================================================
+class ApiTabletteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user('tab1', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=1, nombre_places=4)
+        self.tablette = Tablette.objects.create(user=user, table=table)
+        self.riz = Plat.objects.create(nom='Riz', prix_unitaire=Decimal('20000'), quantite_disponible=5)
+        self.jus = Plat.objects.create(nom='Jus', prix_unitaire=Decimal('5000'), quantite_disponible=10)
+        self.client.force_login(user)
+
+    def appliquer(self, quantites):
+        return self.client.post(
+            reverse('api_panier'), json.dumps({'quantites': quantites}), content_type='application/json'
+        )
+
+    def test_menu_avec_stock_et_etag(self):
+        response = self.client.get(reverse('api_menu'))
+        plats = {p['nom']: p for p in response.json()['plats']}
+        self.assertEqual(plats['Riz']['stock'], 5)
+        self.assertEqual(plats['Riz']['prix'], '20000.00')
+        response = self.client.get(reverse('api_menu'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_mutation_par_lot(self):
+        PanierItem.objects.create(tablette=self.tablette, plat=self.jus, quantite=1)
+        data = self.appliquer({self.riz.id: 8, self.jus.id: 3}).json()
+        self.assertEqual({l['plat']: l['quantite'] for l in data['lignes']}, {self.riz.id: 5, self.jus.id: 3})
+        self.assertEqual(data['total'], '115000.00')
+        self.assertEqual(data['ajustes'], [self.riz.id])
+
+        data = self.appliquer({self.riz.id: 0}).json()
+        self.assertEqual(data['nb'], 1)
+        self.assertEqual(self.client.get(reverse('api_panier')).json()['lignes'][0]['plat'], self.jus.id)
+        self.assertEqual(PanierItem.objects.get().quantite, 3)
+
+    def test_corps_invalide(self):
+        self.assertEqual(self.appliquer([1, 2]).status_code, 400)
+        self.assertEqual(self.appliquer({self.riz.id: -1}).status_code, 400)
+        self.assertFalse(PanierItem.objects.exists())
+
+    def test_mesure_sans_ecriture(self):
+        sortie = StringIO()
+        call_command('mesurer_panier', rafales=2, clics=2, stdout=sortie)
+        self.assertIn('api', sortie.getvalue())
+        self.assertEqual(Plat.objects.count(), 2)
+
+
+# =========================================================
+# FILE CUISINE
+# =========================================================
+class FileCuisineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tablettes = []
+        for numero in (1, 2):
+            user = CustomUser.objects.create_user(f'tab{numero}', role='tablette')
+            table = TableRestaurant.objects.create(numero_table=numero, nombre_places=4)
+            self.tablettes.append(Tablette.objects.create(user=user, table=table))
+        self.riz = Plat.objects.create(nom='Riz', prix_unitaire=Decimal('20000'), quantite_disponible=20)
+        self.jus = Plat.objects.create(nom='Jus', prix_unitaire=Decimal('5000'), quantite_disponible=20)
+        self.cuisinier = CustomUser.objects.create_user('chef', role='cuisinier')
+        self.client.force_login(self.cuisinier)
+
+    def commander(self, tablette, **quantites):
+        for nom, quantite in quantites.items():
+            PanierItem.objects.create(tablette=tablette, plat=getattr(self, nom), quantite=quantite)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Commande.objects.creer_depuis_panier(tablette)
+
+    def test_regroupement_par_plat(self):
+        premiere = self.commander(self.tablettes[0], jus=2)
+        self.commander(self.tablettes[1], riz=3, jus=1)
+        self.commander(self.tablettes[1], riz=4)
+
+        plats = self.client.get(reverse('api_cuisine')).json()['plats']
+        self.assertEqual([p['nom'] for p in plats], ['Jus', 'Riz'])
+        self.assertEqual(
+            (plats[1]['quantite'], plats[1]['tables'], plats[1]['nb_commandes']), (7, [2], 2)
+        )
+        self.assertEqual((plats[0]['quantite'], plats[0]['tables']), (3, [1, 2]))
+
+        premiere.statut = 'servie'
+        with self.captureOnCommitCallbacks(execute=True):
+            premiere.save()
+        plats = self.client.get(reverse('api_cuisine')).json()['plats']
+        self.assertEqual([(p['nom'], p['quantite']) for p in plats], [('Riz', 7), ('Jus', 1)])
+        self.assertEqual(LigneCuisine.objects.count(), 3)
+
+    def test_etag_sans_agregation(self):
+        self.commander(self.tablettes[0], riz=1)
+        response = self.client.get(reverse('api_cuisine'))
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('api_cuisine'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('gestion_lignecuisine' in q['sql'] for q in requetes.captured_queries))
+
+        commande = self.commander(self.tablettes[1], jus=1)
+        response = self.client.get(reverse('api_cuisine'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(len(response.json()['plats']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            commande.delete()
+        self.assertContains(self.client.get(reverse('cuisine_file')), 'Riz')
+        self.assertEqual(LigneCuisine.objects.count(), 1)
+
+
+# =========================================================
+# COMMANDES (liste globale)
+# =========================================================
+class CommandeIndexTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('admin', role='admin')
+        self.client.force_login(self.admin)
+        tablettes = []
+        for numero in (1, 2):
+            user = CustomUser.objects.create_user(f'tab{numero}', role='tablette')
+            table = TableRestaurant.objects.create(numero_table=numero, nombre_places=4)
+            tablettes.append(Tablette.objects.create(user=user, table=table))
+        Commande.objects.bulk_create(
+            Commande(tablette=tablettes[i % 2], total=i, statut='payee' if i % 3 else 'en_attente')
+            for i in range(120)
+        )
+
+    def parcourir(self, params):
+        ids, curseur = [], None
+        while True:
+            if curseur:
+                params = {**params, 'avant': curseur}
+            with self.assertNumQueries(5):
+                response = self.client.get(reverse('commande_index'), params)
+            ids += [c.id for c in response.context['commandes']]
+            curseur = response.context['curseur_suivant']
+            if not curseur:
+                return ids, response
+
+    def test_pagination_par_curseur(self):
+        ids, derniere = self.parcourir({})
+        self.assertEqual(ids, list(Commande.objects.order_by('-date', '-id').values_list('id', flat=True)))
+
+        # Retour en arrière depuis la dernière page
+        response = self.client.get(reverse('commande_index'), {'apres': derniere.context['curseur_precedent']})
+        self.assertEqual([c.id for c in response.context['commandes']], ids[50:100])
+
+    def test_filtres(self):
+        ids, _ = self.parcourir({'statut': 'en_attente', 'table': '1'})
+        attendus = Commande.objects.filter(statut='en_attente', tablette__table__numero_table=1)
+        self.assertEqual(sorted(ids), sorted(attendus.values_list('id', flat=True)))
+
+
+# =========================================================
+# EXPORT CSV
+# =========================================================
+@mock.patch('gestion.views.EXPORT_TAILLE_LOT', 3)
+class ExportGlobalTests(TestCase):
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create_user('admin', role='admin'))
+        user = CustomUser.objects.create_user('tab1', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=4, nombre_places=4)
+        tablette = Tablette.objects.create(user=user, table=table)
+        plat = Plat.objects.create(nom='Riz', prix_unitaire=Decimal('20000'), quantite_disponible=100)
+        commandes = Commande.objects.bulk_create(
+            Commande(tablette=tablette, total=Decimal('20000'), statut='payee' if i % 2 else 'en_attente')
+            for i in range(8)
+        )
+        CommandeItem.objects.bulk_create(
+            CommandeItem(commande=c, plat=plat, quantite=1, prix_unitaire=Decimal('20000')) for c in commandes
+        )
+        # Dates égales à cheval sur deux lots : le curseur départage par id
+        maintenant = timezone.now()
+        self.hier = maintenant - timedelta(days=1)
+        Commande.objects.filter(id__in=[c.id for c in commandes[:3]]).update(date=self.hier)
+        Commande.objects.filter(id__in=[c.id for c in commandes[3:]]).update(date=maintenant)
+
+    def ids(self, contenu):
+        lignes = contenu.lstrip('\ufeff').splitlines()
+        self.assertEqual(lignes[0].split(';')[0], 'ID')
+        return [int(ligne.split(';')[0]) for ligne in lignes[1:]]
+
+    def exporter(self, **parametres):
+        response = self.client.get(reverse('export_global'), parametres)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_flux_par_lots(self):
+        attendus = list(Commande.objects.order_by('-date', '-id').values_list('id', flat=True))
+        with CaptureQueriesContext(connection) as requetes:
+            contenu = self.exporter().decode('utf-8')
+        self.assertEqual(self.ids(contenu), attendus)
+        self.assertIn('1x Riz', contenu)
+        # Lots de 3, 3 et 2 commandes puis un lot vide
+        lots = [q for q in requetes if 'FROM "gestion_commande" ' in q['sql']]
+        self.assertEqual(len(lots), 4)
+
+    def test_filtres_periode_et_statut(self):
+        jour = timezone.localdate(self.hier).isoformat()
+        anciens = list(Commande.objects.filter(date=self.hier).order_by('-id').values_list('id', flat=True))
+        self.assertEqual(self.ids(self.exporter(**{'from': jour, 'to': jour}).decode('utf-8')), anciens)
+
+        payees = self.ids(self.exporter(statut='payee').decode('utf-8'))
+        self.assertEqual(len(payees), 4)
+        self.assertEqual(set(Commande.objects.filter(id__in=payees).values_list('statut', flat=True)), {'payee'})
+
+    def test_gzip(self):
+        response = self.client.get(reverse('export_global'), {'gzip': 1})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.csv.gz', response['Content-Disposition'])
+        compresse = b''.join(response.streaming_content)
+        self.assertEqual(gzip.decompress(compresse), self.exporter())
+
+
+# =========================================================
+# COMPTABLE
+# =========================================================
+class ComptableIndexTests(TestCase):
+    def setUp(self):
+        self.comptable = CustomUser.objects.create_user('compta', role='comptable')
+        self.client.force_login(self.comptable)
+        user = CustomUser.objects.create_user('tab1', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=1, nombre_places=4)
+        tablette = Tablette.objects.create(user=user, table=table)
+        commandes = Commande.objects.bulk_create(
+            Commande(tablette=tablette, total=10, statut='payee') for _ in range(35)
+        )
+        for commande in commandes:
+            Paiement.objects.create(commande=commande, montant=Decimal('10'))
+        Depense.objects.create(description='Gaz', montant=Decimal('25'))
+
+    def test_cumul_journalier_incremental(self):
+        stats = StatistiqueJour.objects.get(jour=timezone.localdate())
+        self.assertEqual((stats.recettes, stats.nb_paiements), (Decimal('350'), 35))
+        self.assertEqual((stats.depenses, stats.nb_depenses), (Decimal('25'), 1))
+
+        Paiement.objects.first().delete()
+        Depense.objects.all().delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.recettes, stats.nb_paiements), (Decimal('340'), 34))
+        self.assertEqual((stats.depenses, stats.nb_depenses), (Decimal('0'), 0))
+
+    def test_depense_sans_lecture_du_registre(self):
+        CaisseMouvement.objects.enregistrer(Decimal('100'), 'paiement')
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.post(reverse('comptable_index'), {
+                'ajouter_depense': '1', 'description': 'Charbon', 'montant': '30', 'categorie': '',
+            })
+        self.assertRedirects(response, reverse('comptable_index'), fetch_redirect_response=False)
+        self.assertFalse([q for q in requetes if 'FROM "gestion_paiement"' in q['sql']])
+        self.assertEqual(CaisseMouvement.objects.solde(), Decimal('70'))
+
+    def test_depense_au_dela_du_solde_refusee(self):
+        CaisseMouvement.objects.enregistrer(Decimal('100'), 'paiement')
+        depense = {'ajouter_depense': '1', 'description': 'Four', 'montant': '150', 'categorie': ''}
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.post(reverse('comptable_index'), depense)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Solde insuffisant', str(list(get_messages(response.wsgi_request))[-1]))
+        self.assertEqual(Depense.objects.count(), 1)
+        self.assertEqual(CaisseMouvement.objects.solde(), Decimal('100'))
+        if connection.features.has_select_for_update:
+            self.assertTrue([q for q in requetes if 'FOR UPDATE' in q['sql']])
+
+    def test_periode_et_pagination(self):
+        response = self.client.get(reverse('comptable_index'))
+        self.assertEqual(response.context['recette_periode'], Decimal('350'))
+        self.assertEqual(response.context['nb_paiements_periode'], 35)
+        self.assertEqual(response.context['total_depenses'], Decimal('25'))
+        self.assertEqual(len(response.context['paiements']), 30)
+
+        suite = self.client.get(reverse('comptable_index'), {'p_avant': response.context['paiements_suivant']})
+        ids = [p.id for p in response.context['paiements']] + [p.id for p in suite.context['paiements']]
+        self.assertEqual(ids, list(Paiement.objects.order_by('-date', '-id').values_list('id', flat=True)))
+        self.assertIsNone(suite.context['paiements_suivant'])
+
+        hier = (timezone.localdate() - timedelta(days=1)).isoformat()
+        response = self.client.get(reverse('comptable_index'), {'from': hier, 'to': hier})
+        self.assertEqual(list(response.context['paiements']), [])
+        self.assertEqual(response.context['recette_periode'], 0)
+
+
+# =========================================================
+# JOURNAL DE CAISSE
+# =========================================================
+class JournalCaisseTests(TestCase):
+    def vieillir(self):
+        # Au-delà de DELAI_POINT : les mouvements peuvent entrer dans un point
+        CaisseMouvement.objects.update(date=timezone.now() - timedelta(minutes=5))
+
+    def test_enregistrer_et_solde(self):
+        self.assertEqual(CaisseMouvement.objects.solde(), 0)
+        CaisseMouvement.objects.enregistrer(Decimal('150'), 'paiement', 'Commande #1')
+        CaisseMouvement.objects.enregistrer(Decimal('-40'), 'depense', 'Gaz')
+        self.assertEqual(CaisseMouvement.objects.solde(), Decimal('110'))
+        self.assertFalse(Caisse.objects.exists())
+
+    def test_point_de_caisse_conserve_le_solde(self):
+        for montant in ('100', '-30', '45'):
+            CaisseMouvement.objects.enregistrer(Decimal(montant), 'paiement')
+        # Mouvements trop récents : pas de point
+        self.assertIsNone(CaisseMouvement.objects.poser_point())
+
+        self.vieillir()
+        point = CaisseMouvement.objects.poser_point()
+        self.assertEqual(point.solde_actuel, Decimal('115'))
+        self.assertEqual(point.mouvement_id, CaisseMouvement.objects.latest('id').id)
+        self.assertEqual(CaisseMouvement.objects.solde(), Decimal('115'))
+
+        CaisseMouvement.objects.enregistrer(Decimal('5'), 'paiement')
+        self.assertEqual(CaisseMouvement.objects.solde(), Decimal('120'))
+
+    def test_point_retente_apres_une_rafale(self):
+        with mock.patch.object(type(CaisseMouvement.objects), 'INTERVALLE_POINT', 3):
+            for _ in range(4):
+                CaisseMouvement.objects.enregistrer(Decimal('10'), 'paiement')
+            # Rafale plus récente que DELAI_POINT : le point est remis à plus tard
+            self.assertFalse(Caisse.objects.exists())
+
+            self.vieillir()
+            CaisseMouvement.objects.enregistrer(Decimal('10'), 'paiement')
+        point = Caisse.objects.get()
+        self.assertEqual(point.solde_actuel, Decimal('40'))
+        self.assertEqual(CaisseMouvement.objects.solde(), Decimal('50'))
+
+    def test_suppression_paiement_plafonnee(self):
+        admin = CustomUser.objects.create_user('admin', role='admin')
+        self.client.force_login(admin)
+        user = CustomUser.objects.create_user('tab1', role='tablette')
+        table = TableRestaurant.objects.create(numero_table=1, nombre_places=4)
+        commande = Commande.objects.create(
+            tablette=Tablette.objects.create(user=user, table=table), total=Decimal('100'), statut='payee'
+        )
+        paiement = Paiement.objects.create(commande=commande, montant=Decimal('100'))
+        CaisseMouvement.objects.enregistrer(Decimal('100'), 'paiement')
+        CaisseMouvement.objects.enregistrer(Decimal('-70'), 'depense', 'Gaz')
+        self.vieillir()
+        CaisseMouvement.objects.poser_point()
+
+        self.client.get(reverse('supprimer_paiement', args=[paiement.id]))
+        self.assertFalse(Paiement.objects.exists())
+        self.assertEqual(CaisseMouvement.objects.latest('id').montant, Decimal('-30'))
+        self.assertEqual(CaisseMouvement.objects.solde(), 0)
+
+    def test_simulation_de_service_annulee(self):
+        serveur = CustomUser.objects.create_user('simu-serveur0', role='serveur')
+        CaisseMouvement.objects.enregistrer(Decimal('50'), 'paiement')
+        for _ in range(3):
+            CaisseMouvement.objects.enregistrer(Decimal('25000'), 'paiement', 'Commande', serveur)
+        simuler_service.Command()._nettoyer()
+        self.assertEqual(CaisseMouvement.objects.solde(), Decimal('50'))
+        self.assertEqual(CaisseMouvement.objects.latest('id').montant, Decimal('-75000'))
+        self.assertFalse(CustomUser.objects.filter(identifiant__startswith='simu-').exists())
+
+        # Un second nettoyage n'annule rien de plus
+        simuler_service.Command()._nettoyer()
+        self.assertEqual(CaisseMouvement.objects.solde(), Decimal('50'))
+
+
+class MigrationCaisseTests(TransactionTestCase):
+    avant = [('gestion', '0014_alter_tablette_qr_password')]
+
+    def test_solde_historique_repris(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.avant)
+        anciennes = executor.loader.project_state(self.avant).apps
+        anciennes.get_model('gestion', 'Caisse').objects.create(id=1, solde_actuel=Decimal('125000'))
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        # L'ancienne ligne unique devient le point de départ du journal
+        self.assertEqual(CaisseMouvement.objects.dernier_point().mouvement_id, 0)
+        self.assertEqual(CaisseMouvement.objects.solde(), Decimal('125000'))
+        CaisseMouvement.objects.enregistrer(Decimal('5000'), 'paiement')
+        self.assertEqual(CaisseMouvement.objects.solde(), Decimal('130000'))
+
+
+# =========================================================
+# PLANS D'EXÉCUTION
+# =========================================================
+# Les vues chaudes sont rejouées sur une base peuplée ; chaque SELECT
+# exécuté passe par EXPLAIN. Un parcours complet d'une grande table fait
+# échouer le test : index manquant, ou filtre qui empêche de s'en servir
+# (ex. date__date=… au lieu d'un intervalle [début, fin[).
+GRANDES_TABLES = {
+    'gestion_commande', 'gestion_commandeitem', 'gestion_paiement', 'gestion_depense',
+    'gestion_caissemouvement', 'gestion_commandeevenement', 'gestion_venteplatjour',
+}
+INDEX_PARTIELS = {
+    index.name for modele in apps.get_app_config('gestion').get_models()
+    for index in modele._meta.indexes if index.condition is not None
+}
+
+
+class PlansRequetesTests(TestCase):
+    JOURS = 60
+    COMMANDES_PAR_JOUR = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        tablettes = []
+        for numero in range(1, 21):
+            user = CustomUser.objects.create_user(f'tab{numero}', role='tablette')
+            table = TableRestaurant.objects.create(numero_table=numero, nombre_places=4)
+            tablettes.append(Tablette.objects.create(user=user, table=table))
+        plats = Plat.objects.bulk_create(
+            Plat(nom=f'Plat {i}', prix_unitaire=Decimal('10000'), quantite_disponible=100) for i in range(30)
+        )
+
+        # Historique payé sur JOURS jours, quelques commandes du jour en cours
+        maintenant = timezone.now()
+        for jour in range(cls.JOURS):
+            commandes = Commande.objects.bulk_create(
+                Commande(
+                    tablette=tablettes[i % len(tablettes)], total=Decimal('20000'),
+                    statut='payee' if jour or i >= 10 else ('en_attente', 'servie')[i % 2],
+                )
+                for i in range(cls.COMMANDES_PAR_JOUR)
+            )
+            date = maintenant - timedelta(days=jour)
+            Commande.objects.filter(id__in=[c.id for c in commandes]).update(date=date)
+            CommandeItem.objects.bulk_create(
+                CommandeItem(commande=c, plat=plats[(c.id * k) % len(plats)], quantite=1, prix_unitaire=Decimal('10000'))
+                for c in commandes for k in (1, 7)
+            )
+            Paiement.objects.bulk_create(
+                Paiement(commande=c, montant=c.total) for c in commandes if c.statut == 'payee'
+            )
+            Paiement.objects.filter(commande__in=commandes).update(date=date)
+            Depense.objects.bulk_create(Depense(description='Achat', montant=Decimal('5000')) for _ in range(5))
+            Depense.objects.filter(date__gt=date).update(date=date)
+            VentePlatJour.objects.bulk_create(
+                VentePlatJour(plat=plat, jour=timezone.localdate(date), quantite=3) for plat in plats
+            )
+
+        with connection.cursor() as curseur:
+            curseur.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+        if connection.vendor == 'postgresql':
+            # Sur un petit jeu de données le planificateur préfère souvent le
+            # parcours séquentiel ; on ne le garde que s'il n'y a pas d'index utilisable.
+            with connection.cursor() as curseur:
+                curseur.execute('SET LOCAL enable_seqscan = off')
+
+    def parcours_complets(self, sql):
+        """Grandes tables lues en entier par la requête."""
+        with connection.cursor() as curseur:
+            if connection.vendor == 'postgresql':
+                curseur.execute('EXPLAIN ' + sql)
+                lignes = [ligne[0] for ligne in curseur.fetchall()]
+                motif = re.compile(r'Seq Scan on (\w+)')
+            else:
+                curseur.execute('EXPLAIN QUERY PLAN ' + sql)
+                # « SCAN t USING INDEX i » est admis avec LIMIT (lecture dans l'ordre
+                # de l'index, arrêtée après une page) ou si l'index est partiel
+                lignes = [
+                    ligne[-1] for ligne in curseur.fetchall()
+                    if not (' LIMIT ' in sql and ' USING ' in ligne[-1])
+                    and not any(ligne[-1].endswith(f'INDEX {nom}') for nom in INDEX_PARTIELS)
+                ]
+                motif = re.compile(r'SCAN (\w+)')
+        return {
+            table for ligne in lignes for table in motif.findall(ligne)
+            if table in GRANDES_TABLES
+        }
+
+    def assertSansParcoursComplet(self, user, url, params=None):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        for requete in requetes.captured_queries:
+            sql = requete['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            with self.subTest(url=url, sql=sql[:120]):
+                self.assertEqual(self.parcours_complets(sql), set(), sql)
+
+    def test_vues_serveur(self):
+        serveur = CustomUser.objects.create_user('serveur', role='serveur')
+        self.assertSansParcoursComplet(serveur, reverse('serveur_index'))
+
+    def test_vues_comptable(self):
+        comptable = CustomUser.objects.create_user('compta', role='comptable')
+        hier = (timezone.localdate() - timedelta(days=1)).isoformat()
+        self.assertSansParcoursComplet(comptable, reverse('comptable_index'))
+        self.assertSansParcoursComplet(comptable, reverse('comptable_index'), {'from': hier, 'to': hier})
+
+    def test_vues_admin(self):
+        admin = CustomUser.objects.create_user('admin', role='admin')
+        self.assertSansParcoursComplet(admin, reverse('Accueil'), {'top': 'semaine'})
+        self.assertSansParcoursComplet(admin, reverse('commande_index'))
+        self.assertSansParcoursComplet(admin, reverse('commande_index'), {'statut': 'en_attente'})
+        self.assertSansParcoursComplet(admin, reverse('admin_page'))
+        self.assertSansParcoursComplet(admin, reverse('api_cuisine'))
+
+    def test_detection_parcours_complet(self):
+        # date__date=… applique une fonction à la colonne : l'index n'est plus utilisable
+        sql, params = Paiement.objects.filter(date__date=timezone.localdate()).query.sql_with_params()
+        with connection.cursor() as curseur:
+            sql = connection.ops.last_executed_query(curseur, sql, params)
+        self.assertEqual(self.parcours_complets(sql), {'gestion_paiement'})
+
+
+# =========================================================
+# BUDGETS DE REQUÊTES PAR VUE
+# =========================================================
+# Chaque URL de gestion/urls.py est appelée sous chaque rôle, sur un jeu de
+# données de service (tables, commandes à tous les statuts, paiements,
+# dépenses), caches vidés : le nombre de requêtes SQL ne doit pas dépasser
+# le budget de la vue. Un N+1 ou une URL sans budget fait échouer le test.
+# Chaque appel est annulé (savepoint) : les vues d'action ne modifient pas
+# le jeu de données des appels suivants. Le temps de rendu de chaque appel
+# est mesuré et figure dans les messages d'échec.
+ROLES = ('admin', 'serveur', 'cuisinier', 'comptable', 'tablette')
+# Plafond large du temps de rendu (ms) : une régression de latence échoue
+# aussi, avec le temps mesuré dans le message
+PLAFOND_RENDU_MS = 2000
+
+# nom de l'URL : (méthode, données, budget de requêtes SQL)
+BUDGETS_VUES = {
+    'login':                    ('GET', None, 3),
+    'logout':                   ('GET', None, 6),
+    'Accueil':                  ('GET', None, 6),
+    'tablette_index':           ('GET', None, 7),
+    'voir_panier':              ('GET', None, 4),
+    'ajouter_au_panier':        ('POST', {'quantite': 1}, 20),
+    'modifier_panier':          ('POST', {'quantite': 2}, 14),
+    'supprimer_du_panier':      ('POST', {}, 13),
+    'valider_panier':           ('POST', {}, 27),
+    'api_menu':                 ('GET', None, 8),
+    'api_panier':               ('GET', None, 4),
+    'cuisinier_index':          ('GET', None, 10),
+    'ajouter_plat':             ('POST', {'nom': 'Fonio', 'prix_unitaire': '15000', 'quantite_disponible': 5}, 3),
+    'modifier_plat':            ('POST', {'nom': 'Riz gras', 'prix_unitaire': '22000', 'quantite_disponible': 9}, 4),
+    'supprimer_plat':           ('POST', {}, 9),
+    'cuisine_file':             ('GET', None, 4),
+    'api_cuisine':              ('GET', None, 4),
+    'table_index':              ('GET', None, 4),
+    'serveur_index':            ('GET', None, 8),
+    'serveur_valider_commande': ('POST', {}, 5),
+    'serveur_valider_paiement': ('POST', {}, 22),
+    'serveur_flux':             ('GET', {'dernier_id': 0}, 3),
+    'comptable_index':          ('GET', None, 12),
+    'commande_index':           ('GET', None, 6),
+    'admin_page':               ('GET', None, 8),
+    'controle_general':         ('GET', None, 8),
+    'qr_tables':                ('GET', {'format': 'zip'}, 3),
+    'deconnecter_tablettes':    ('POST', {}, 4),
+    'toggle_blocage_tablette':  ('POST', {}, 7),
+    'toggle_blocage_tablette_direct': ('POST', {}, 7),
+    'deconnecter_tablettes_direct':   ('POST', {}, 4),
+    'supprimer_commande':       ('POST', {}, 22),
+    'supprimer_depense':        ('POST', {}, 14),
+    'supprimer_paiement':       ('POST', {}, 20),
+    'supprimer_commande_compta': ('POST', {}, 22),
+    'reinitialiser_solde':      ('POST', {}, 8),
+    'admin_tout_supprimer':     ('POST', {}, 3),
+    'export_facture':           ('GET', None, 8),
+    'export_global':            ('GET', None, 6),
+    'password_change':          ('GET', None, 3),
+}
+
+
+@override_settings(SERVEUR_FLUX_ATTENTE=0)
+class BudgetsVuesTests(TestCase):
+    NB_TABLES = 6
+    NB_COMMANDES = 120
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateurs = {
+            role: CustomUser.objects.create_user(f'budget-{role}', role=role)
+            for role in ROLES if role != 'tablette'
+        }
+        tablettes = []
+        for numero in range(1, cls.NB_TABLES + 1):
+            user = CustomUser.objects.create_user(f'budget-tab{numero}', role='tablette')
+            table = TableRestaurant.objects.create(numero_table=numero, nombre_places=4, is_occupied=numero % 2 == 0)
+            tablettes.append(Tablette.objects.create(user=user, table=table))
+        cls.tablette = tablettes[0]
+        cls.utilisateurs['tablette'] = cls.tablette.user
+        plats = Plat.objects.bulk_create(
+            Plat(nom=f'Plat {i}', prix_unitaire=Decimal('10000') + i, quantite_disponible=50) for i in range(10)
+        )
+        cls.plat = plats[0]
+        cls.panier_item = PanierItem.objects.create(tablette=cls.tablette, plat=plats[1], quantite=2)
+
+        statuts = ('payee',) * 8 + ('servie', 'en_attente')
+        commandes = Commande.objects.bulk_create(
+            Commande(
+                tablette=tablettes[i % cls.NB_TABLES], total=Decimal('30000'),
+                statut=statuts[i % len(statuts)], serveur=cls.utilisateurs['serveur'],
+            )
+            for i in range(cls.NB_COMMANDES)
+        )
+        CommandeItem.objects.bulk_create(
+            CommandeItem(commande=c, plat=plats[(c.id + k) % len(plats)], quantite=k, prix_unitaire=Decimal('10000'))
+            for c in commandes for k in (1, 2)
+        )
+        paiements = Paiement.objects.bulk_create(
+            Paiement(commande=c, montant=c.total) for c in commandes if c.statut == 'payee'
+        )
+        depenses = Depense.objects.bulk_create(
+            Depense(description=f'Achat {i}', montant=Decimal('5000'), utilisateur=cls.utilisateurs['comptable'])
+            for i in range(20)
+        )
+        CaisseMouvement.objects.enregistrer(Decimal('1000000'), 'paiement', 'Fond de caisse')
+        cls.commande_attente = next(c for c in commandes if c.statut == 'en_attente')
+        cls.commande_servie = next(c for c in commandes if c.statut == 'servie')
+        cls.paiement = paiements[0]
+        cls.depense = depenses[0]
+
+    def arguments(self, nom, motif):
+        valeurs = {
+            'plat_id': self.plat.id,
+            'panier_item_id': self.panier_item.id,
+            'tablette_id': self.tablette.id,
+            'depense_id': self.depense.id,
+            'paiement_id': self.paiement.id,
+            'commande_id': (
+                self.commande_servie if nom == 'serveur_valider_paiement' else self.commande_attente
+            ).id,
+        }
+        return {cle: valeurs[cle] for cle in motif.pattern.regex.groupindex}
+
+    def appeler(self, role, nom, motif):
+        methode, donnees, _ = BUDGETS_VUES[nom]
+        url = reverse(nom, kwargs=self.arguments(nom, motif))
+        self.client.force_login(self.utilisateurs[role])
+        cache.clear()
+        with transaction.atomic(), CaptureQueriesContext(connection) as requetes:
+            debut = time.perf_counter()
+            if methode == 'POST':
+                response = self.client.post(url, donnees)
+            else:
+                response = self.client.get(url, donnees or {})
+            if response.streaming:
+                response.getvalue()
+            duree = (time.perf_counter() - debut) * 1000
+            transaction.set_rollback(True)
+        self.client.logout()
+        return response, [q['sql'] for q in requetes], duree
+
+    def test_budgets(self):
+        motifs = [motif for motif in urls.urlpatterns if motif.name]
+        self.assertEqual(
+            sorted({motif.name for motif in motifs} - set(BUDGETS_VUES)), [],
+            "URL sans budget de requêtes dans BUDGETS_VUES",
+        )
+
+        for motif in motifs:
+            budget = BUDGETS_VUES[motif.name][2]
+            for role in ROLES:
+                response, requetes, duree = self.appeler(role, motif.name, motif)
+                with self.subTest(vue=motif.name, role=role):
+                    self.assertLess(response.status_code, 500)
+                    self.assertLessEqual(
+                        len(requetes), budget, f"rendu en {duree:.1f} ms\n" + '\n'.join(requetes)
+                    )
+                    self.assertLessEqual(duree, PLAFOND_RENDU_MS, f"rendu en {duree:.1f} ms")
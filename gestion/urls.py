@@ -22,6 +22,8 @@ urlpatterns = [
     path('tablette/modifier/<int:panier_item_id>/',             views.modifier_panier,                  name='modifier_panier'),
     path('tablette/supprimer/<int:panier_item_id>/',            views.supprimer_du_panier,              name='supprimer_du_panier'),
     path('tablette/valider/',                                   views.valider_panier,                   name='valider_panier'),
+    path('tablette/api/menu/',                                  views.api_menu,                         name='api_menu'),
+    path('tablette/api/panier/',                                views.api_panier,                       name='api_panier'),
 
     # ─────────────────────────────────────────────────────────
     # Menu / Cuisine
@@ -30,6 +32,8 @@ urlpatterns = [
     path('plat/ajouter/',                                       views.ajouter_plat,                     name='ajouter_plat'),
     path('plat/modifier/<int:plat_id>/',                        views.modifier_plat,                    name='modifier_plat'),
     path('plat/supprimer/<int:plat_id>/',                       views.supprimer_plat,                   name='supprimer_plat'),
+    path('cuisine/',                                            views.cuisine_file,                     name='cuisine_file'),
+    path('cuisine/api/file/',                                   views.api_cuisine,                      name='api_cuisine'),
 
     # ─────────────────────────────────────────────────────────
     # Tables
@@ -42,6 +46,7 @@ urlpatterns = [
     path('serveur/',                                            views.serveur_index,                    name='serveur_index'),
     path('serveur/valider/<int:commande_id>/',                  views.serveur_valider_commande,         name='serveur_valider_commande'),
     path('serveur/payer/<int:commande_id>/',                    views.serveur_valider_paiement,         name='serveur_valider_paiement'),
+    path('serveur/flux/',                                       views.serveur_flux,                     name='serveur_flux'),
 
     # ─────────────────────────────────────────────────────────
     # Comptable
@@ -60,6 +65,7 @@ urlpatterns = [
     # ─────────────────────────────────────────────────────────
     path('gestion/panel/',                                      views.admin_page,                       name='admin_page'),
     path('gestion/controle/',                                   views.admin_page,                       name='controle_general'),
+    path('gestion/controle/qr-codes/',                          views.qr_tables,                        name='qr_tables'),
 
     # ─────────────────────────────────────────────────────────
     # Administration — gestion tablettes
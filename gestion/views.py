@@ -6,20 +6,57 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import update_session_auth_hash, authenticate, login, logout
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.decorators import login_required
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
 from django.contrib import messages
-from django.db.models import Sum, Count
-from django.http import HttpResponse, HttpResponseForbidden
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Count, Q
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed,
+    HttpResponseNotModified, JsonResponse, StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from django.template.loader import render_to_string
+from django.middleware.csrf import get_token
+from django.utils.safestring import mark_safe
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.utils.dateparse import parse_date
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
 from django.urls import reverse
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from datetime import datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal
+from io import StringIO
+import asyncio
 import csv
+import json
+import mimetypes
+import os
+import re
+import time
+import zlib
 
 from .models import (
     CustomUser, TableRestaurant, Tablette,
-    Plat, PanierItem, Commande, CommandeItem,
-    Paiement, Caisse, Depense
+    Plat, Commande, CommandeItem, CommandeEvenement,
+    Paiement, CaisseMouvement, Depense, StockInsuffisant, SessionUtilisateur,
+    StatistiqueHeure, StatistiqueJour, VersionMenu,
 )
 from .forms import PlatForm
+from .jetons import JetonInvalide, tablette_du_jeton
+from .paniers import marquer_paniers_actifs, panier_de
+from .storage import est_adresse
+from .qr import archive_zip, planche_pdf, qr_lot, qr_png, url_connexion
+from .caches import (
+    FENETRES_VENTES, etats_tables, file_cuisine, flotte_tablettes, invalider_etats_tables,
+    invalider_flotte_tablettes, meilleures_ventes, menu_rendu, tablette_de,
+)
 
 
 # =========================================================
@@ -37,36 +74,99 @@ def role_required(*roles):
     return decorator
 
 
+# =========================================================
+# UTILITAIRES
+# =========================================================
+def _intervalle_dates(request, param_debut='from', param_fin='to'):
+    """
+    Lit deux dates AAAA-MM-JJ dans la requête et renvoie l'intervalle
+    [début du premier jour, début du lendemain du second jour[ en datetimes
+    conscients du fuseau. Une borne absente ou invalide vaut None.
+    """
+    def _lire(param):
+        try:
+            return parse_date(request.GET.get(param, ''))
+        except ValueError:
+            return None
+
+    debut, fin = _lire(param_debut), _lire(param_fin)
+    if debut:
+        debut = timezone.make_aware(datetime.combine(debut, datetime.min.time()))
+    if fin:
+        fin = timezone.make_aware(datetime.combine(fin + timedelta(days=1), datetime.min.time()))
+    return debut, fin
+
+
+# Pagination par curseur (keyset) sur (date, id) : le coût d'une page ne
+# dépend pas de sa position dans l'historique, contrairement à OFFSET.
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _encoder_curseur(obj):
+    return f"{(obj.date - _EPOCH) // timedelta(microseconds=1)}-{obj.id}"
+
+
+def _decoder_curseur(valeur):
+    try:
+        micro, id_ = valeur.split('-')
+        return _EPOCH + timedelta(microseconds=int(micro)), int(id_)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _page_keyset(queryset, request, taille, prefixe=''):
+    """
+    Renvoie (objets, curseur_precedent, curseur_suivant) pour un queryset
+    ayant des champs `date` et `id`, du plus récent au plus ancien.
+    Les curseurs sont lus dans les paramètres <prefixe>avant / <prefixe>apres.
+    """
+    avant = _decoder_curseur(request.GET.get(prefixe + 'avant', ''))
+    apres = _decoder_curseur(request.GET.get(prefixe + 'apres', ''))
+
+    if apres:
+        date, id_ = apres
+        objets = list(
+            queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=id_))
+            .order_by('date', 'id')[:taille + 1]
+        )
+        plus_recents, plus_anciens = len(objets) > taille, True
+        objets = objets[:taille][::-1]
+    else:
+        if avant:
+            date, id_ = avant
+            queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=id_))
+        objets = list(queryset.order_by('-date', '-id')[:taille + 1])
+        plus_recents, plus_anciens = avant is not None, len(objets) > taille
+        objets = objets[:taille]
+
+    if not objets:
+        return objets, None, None
+    precedent = _encoder_curseur(objets[0]) if plus_recents else None
+    suivant = _encoder_curseur(objets[-1]) if plus_anciens else None
+    return objets, precedent, suivant
+
+
 # =========================================================
 # LOGIN / LOGOUT
 # =========================================================
 def login_view(request):
     initial_identifiant = ''
-    initial_password = ''
     auto_login = False
 
     u = request.GET.get('u', '')
-    p = request.GET.get('p', '')
-
-    # Tentative de connexion automatique si u et p sont dans l'URL (QR code)
-    if u and p and request.method == 'GET':
-        user = authenticate(request, identifiant=u, password=p)
-        if user is not None:
-            if user.role == 'tablette':
-                tablette = Tablette.objects.filter(user=user).first()
-                if tablette and tablette.is_blocked:
-                    return render(request, 'login.html', {
-                        'error': "Cette tablette est temporairement bloquée par l'administrateur.",
-                        'initial_identifiant': u,
-                    })
-            login(request, user)
-            return redirect('Accueil')
-        else:
-            initial_identifiant = u
-            initial_password = p
-            auto_login = True
+    t = request.GET.get('t', '')
+
+    # Connexion automatique par QR code : jeton signé, sans hacheur de mot de passe
+    if t and request.method == 'GET':
+        try:
+            tablette = tablette_du_jeton(t)
+        except JetonInvalide as e:
+            return render(request, 'login.html', {'error': str(e)})
+        login(request, tablette.user, backend='django.contrib.auth.backends.ModelBackend')
+        return redirect('Accueil')
 
-    if u and not p:
+    # Anciens QR codes (?u=…) : identifiant pré-rempli, le client saisit son mot de passe
+    if u:
         initial_identifiant = u
         auto_login = True
 
@@ -76,7 +176,7 @@ def login_view(request):
         user = authenticate(request, identifiant=identifiant, password=password)
         if user is not None:
             if user.role == 'tablette':
-                tablette = Tablette.objects.filter(user=user).first()
+                tablette = tablette_de(user.pk)
                 if tablette and tablette.is_blocked:
                     return render(request, 'login.html', {
                         'error': "Cette tablette est temporairement bloquée par l'administrateur."
@@ -91,7 +191,6 @@ def login_view(request):
 
     return render(request, 'login.html', {
         'initial_identifiant': initial_identifiant,
-        'initial_password': initial_password,
         'auto_login': auto_login,
     })
 
@@ -104,34 +203,49 @@ def logout_view(request):
 # =========================================================
 # ACCUEIL
 # =========================================================
+LIBELLES_FENETRES_VENTES = (('jour', "Aujourd'hui"), ('semaine', '7 jours'), ('total', 'Total'))
+
+
 @login_required(login_url='login')
 def Accueil(request):
-    from django.utils import timezone
-    today = timezone.now().date()
-    context = {}
+    # Classement servi depuis le cache des ventes par plat et par jour
+    fenetre = request.GET.get('top', 'total')
+    if fenetre not in FENETRES_VENTES:
+        fenetre = 'total'
+    meilleures = meilleures_ventes('total', 1)
+    context = {
+        'plats_populaires': meilleures_ventes(fenetre),
+        'suggestion_chef': meilleures[0] if meilleures else None,
+        'fenetre_ventes': fenetre,
+        'fenetres_ventes': LIBELLES_FENETRES_VENTES,
+    }
 
     if request.user.role in ('admin', 'comptable') or request.user.is_superuser:
-        nb_commandes = Commande.objects.filter(date__date=today).count()
-        recette_total = (
-            Commande.objects.filter(date__date=today, statut='payee')
-            .aggregate(Sum('total'))['total__sum'] or 0
+        # Une ligne du cumul journalier au lieu d'agréger les tables brutes.
+        # Les recettes sont celles encaissées aujourd'hui (paiements du jour,
+        # comme la comptabilité), et non plus le total des commandes du jour
+        # marquées payées : une commande d'hier réglée ce matin compte ce jour.
+        aujourd_hui = timezone.localdate()
+        stats = StatistiqueJour.objects.filter(jour=aujourd_hui).first()
+        tables = TableRestaurant.objects.aggregate(
+            total=Count('id'), occupees=Count('id', filter=Q(is_occupied=True))
         )
-        tables_occupees = TableRestaurant.objects.filter(is_occupied=True).count()
-        total_tables = TableRestaurant.objects.count()
-
-        plats_populaires = Plat.objects.annotate(
-            nombre_ventes=Count('commandeitem')
-        ).filter(nombre_ventes__gt=0).order_by('-nombre_ventes')[:3]
-
-        suggestion_chef = plats_populaires.first() if plats_populaires else None
+        # Activité heure par heure, au plus 24 lignes du cumul horaire
+        heures = list(
+            StatistiqueHeure.objects.filter(jour=aujourd_hui)
+            .exclude(nb_commandes=0, recettes=0).order_by('heure')
+        )
+        pic = max((h.recettes for h in heures), default=0)
+        for h in heures:
+            h.part = int(h.recettes * 100 / pic) if pic > 0 else 0
 
         context.update({
-            'nb_commandes': nb_commandes,
-            'recette_total': recette_total,
-            'tables_occupees': tables_occupees,
-            'total_tables': total_tables,
-            'plats_populaires': plats_populaires,
-            'suggestion_chef': suggestion_chef,
+            'nb_commandes': stats.nb_commandes if stats else 0,
+            'couverts': stats.couverts if stats else 0,
+            'recette_total': stats.recettes if stats else 0,
+            'tables_occupees': tables['occupees'],
+            'total_tables': tables['total'],
+            'activite_horaire': heures,
         })
 
     return render(request, 'Accueil.html', context)
@@ -143,21 +257,15 @@ def Accueil(request):
 @login_required(login_url='login')
 @role_required('tablette', 'admin')
 def tablette_index(request):
-    if request.user.role == 'tablette':
-        tablette_check = Tablette.objects.filter(user=request.user).first()
-        if tablette_check and tablette_check.is_blocked:
-            logout(request)
-            messages.error(request, "Cette tablette a été bloquée par l'administrateur.")
-            return redirect('login')
+    # Blocage et activité déjà vérifiés par TabletteMiddleware
+    tablette = request.tablette
 
-    tablette = Tablette.objects.filter(user=request.user, active=True).first()
-
-    panier_items = PanierItem.objects.none()
+    panier_items = []
     commandes_envoyees = Commande.objects.none()
     total = 0
 
     if tablette:
-        panier_items = PanierItem.objects.filter(tablette=tablette).select_related('plat')
+        panier_items = panier_de(tablette).lignes()
         total = sum(item.montant() for item in panier_items)
         commandes_envoyees = (
             Commande.objects.filter(tablette=tablette)
@@ -169,21 +277,17 @@ def tablette_index(request):
     stats_occupation = 0
 
     if request.user.is_superuser or request.user.role == 'admin':
-        toutes_les_tablettes = Tablette.objects.all().select_related('table')
-        for t in toutes_les_tablettes:
-            t.en_utilisation = Commande.objects.filter(tablette=t).exclude(statut='payee').exists()
-            t.panier_actif = PanierItem.objects.filter(tablette=t).exists()
-        total_tabs = toutes_les_tablettes.count()
-        if total_tabs > 0:
-            occupees = sum(1 for t in toutes_les_tablettes if t.en_utilisation)
-            stats_occupation = round((occupees / total_tabs) * 100)
+        flotte = flotte_tablettes()
+        toutes_les_tablettes = flotte['tablettes']
+        stats_occupation = flotte['taux_occupation']
+        marquer_paniers_actifs(toutes_les_tablettes)
 
     return render(request, 'tablette/index.html', {
         'tablette': tablette,
         'panier_items': panier_items,
         'commandes_envoyees': commandes_envoyees,
-        'panier': panier_items.exists(),
-        'panier_count': panier_items.count(),
+        'panier': bool(panier_items),
+        'panier_count': len(panier_items),
         'total': total,
         'toutes_les_tablettes': toutes_les_tablettes,
         'taux_occupation': stats_occupation,
@@ -199,57 +303,40 @@ def ajouter_au_panier(request, plat_id):
     if request.user.role == 'admin' or request.user.is_superuser:
         tablette = Tablette.objects.filter(active=True).first()
     else:
-        tablette = Tablette.objects.filter(user=request.user).first()
+        tablette = request.tablette
 
     if not tablette:
         messages.error(request, "Aucune tablette active trouvée.")
         return redirect(request.META.get('HTTP_REFERER', 'tablette_index'))
 
-    plat = get_object_or_404(Plat, id=plat_id)
-
-    if plat.quantite_disponible <= 0:
-        if plat.disponible:
-            plat.disponible = False
-            plat.save()
-        messages.error(request, f"Le plat '{plat.nom}' est épuisé.")
-        return redirect(request.META.get('HTTP_REFERER', 'tablette_index'))
-
     try:
         qte_demandee = int(request.POST.get('quantite', 1))
     except (ValueError, TypeError):
         qte_demandee = 1
 
-    qte_finale = min(max(1, qte_demandee), plat.quantite_disponible)
-
-    item, created = PanierItem.objects.get_or_create(
-        tablette=tablette,
-        plat=plat,
-        defaults={'quantite': qte_finale}
-    )
-
-    if not created:
-        nouvelle_qte = item.quantite + qte_finale
-        item.quantite = min(nouvelle_qte, plat.quantite_disponible)
-        item.save()
+    try:
+        nom, qte_finale = panier_de(tablette).ajouter(plat_id, qte_demandee)
+    except StockInsuffisant as e:
+        messages.error(request, f"Le plat '{e.plats[0]}' est épuisé.")
+        return redirect(request.META.get('HTTP_REFERER', 'tablette_index'))
 
-    messages.success(request, f"✅ {plat.nom} ajouté (×{qte_finale})")
+    messages.success(request, f"✅ {nom} ajouté (×{qte_finale})")
     return redirect(request.META.get('HTTP_REFERER', 'tablette_index'))
 
 
 @login_required(login_url='login')
 @role_required('tablette', 'admin')
 def consulter_panier(request):
-    tablette = Tablette.objects.filter(user=request.user, active=True).first()
+    tablette = request.tablette
 
     if not tablette:
         if request.user.role == 'admin' or request.user.is_superuser:
             messages.warning(request, "En mode admin, vous n'avez pas de panier personnel.")
             return redirect('tablette_index')
         else:
-            from django.http import Http404
             raise Http404("Aucune tablette active associée à ce compte.")
 
-    items = PanierItem.objects.filter(tablette=tablette).select_related('plat')
+    items = panier_de(tablette).lignes()
     total = sum(item.montant() for item in items)
 
     return render(request, 'tablette/panier.html', {
@@ -259,25 +346,29 @@ def consulter_panier(request):
     })
 
 
+def _tablette_requise(request):
+    if request.tablette is None:
+        raise Http404("Aucune tablette active associée à ce compte.")
+    return request.tablette
+
+
 @login_required(login_url='login')
 @role_required('tablette')
 def modifier_panier(request, panier_item_id):
-    tablette = get_object_or_404(Tablette, user=request.user, active=True)
-    item = get_object_or_404(PanierItem, id=panier_item_id, tablette=tablette)
+    panier = panier_de(_tablette_requise(request))
+    ligne = panier.ligne(panier_item_id)
+    if ligne is None:
+        raise Http404
 
     if request.method == "POST":
         if 'supprimer' in request.POST:
-            item.delete()
+            panier.supprimer(ligne)
         elif 'quantite' in request.POST:
             try:
                 quantite = int(request.POST['quantite'])
             except ValueError:
                 quantite = 1
-            if quantite <= 0:
-                item.delete()
-            else:
-                item.quantite = max(1, min(quantite, item.plat.quantite_disponible))
-                item.save()
+            panier.modifier(ligne, quantite)
 
     return redirect('voir_panier')
 
@@ -285,44 +376,28 @@ def modifier_panier(request, panier_item_id):
 @login_required(login_url='login')
 @role_required('tablette')
 def supprimer_du_panier(request, panier_item_id):
-    tablette = get_object_or_404(Tablette, user=request.user, active=True)
-    item = get_object_or_404(PanierItem, id=panier_item_id, tablette=tablette)
-    item.delete()
+    panier = panier_de(_tablette_requise(request))
+    ligne = panier.ligne(panier_item_id)
+    if ligne is None:
+        raise Http404
+    panier.supprimer(ligne)
     return redirect('voir_panier')
 
 
 @login_required(login_url='login')
 @role_required('tablette')
 def valider_panier(request):
-    tablette = get_object_or_404(Tablette, user=request.user, active=True)
-    items = PanierItem.objects.filter(tablette=tablette).select_related('plat')
+    panier = panier_de(_tablette_requise(request))
 
-    if not items.exists():
-        messages.warning(request, "Le panier est vide.")
+    try:
+        commande = panier.valider()
+    except StockInsuffisant as e:
+        messages.error(request, str(e))
         return redirect('voir_panier')
 
-    total = sum(item.montant() for item in items)
-
-    commande = Commande.objects.create(
-        tablette=tablette,
-        total=total,
-        statut='en_attente'
-    )
-
-    for item in items:
-        CommandeItem.objects.create(
-            commande=commande,
-            plat=item.plat,
-            quantite=item.quantite,
-            prix_unitaire=item.plat.prix_unitaire
-        )
-        plat = item.plat
-        plat.quantite_disponible = max(0, plat.quantite_disponible - item.quantite)
-        if plat.quantite_disponible == 0:
-            plat.disponible = False
-        plat.save()
-
-    items.delete()
+    if commande is None:
+        messages.warning(request, "Le panier est vide.")
+        return redirect('voir_panier')
 
     return render(request, 'tablette/validation_commande.html', {
         'commande': commande
@@ -332,28 +407,56 @@ def valider_panier(request):
 # =========================================================
 # MENU / CUISINIER
 # =========================================================
+# Le fragment de la carte est partagé entre utilisateurs d'un même rôle :
+# il est rendu avec ce marqueur à la place du jeton CSRF, remplacé à chaque
+# réponse par le jeton de la requête.
+_MARQUEUR_CSRF = '__jeton_csrf__'
+
+
+def _version_menu(request):
+    if not hasattr(request, '_version_menu'):
+        request._version_menu = VersionMenu.objects.actuelle()
+    return request._version_menu
+
+
+def _etag_menu(request):
+    # Des messages en attente doivent être affichés : pas de 304
+    if len(messages.get_messages(request)):
+        return None
+    nb_panier = 0
+    if request.tablette:
+        nb_panier = panier_de(request.tablette).compter()
+    # Le secret CSRF (cookie) fait partie de l'ETag : une page en cache du
+    # navigateur doit porter un jeton encore valide.
+    get_token(request)
+    jeton = zlib.crc32(request.META.get('CSRF_COOKIE', '').encode())
+    return f"menu-{_version_menu(request).numero}-{request.user.role}-{request.user.pk}-{nb_panier}-{jeton:x}"
+
+
+def _derniere_modif_menu(request):
+    if len(messages.get_messages(request)):
+        return None
+    return _version_menu(request).date_maj
+
+
 @login_required(login_url='login')
 @role_required('cuisinier', 'tablette', 'admin')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_menu, last_modified_func=_derniere_modif_menu)
 def cuisinier_index(request):
-    plats = Plat.objects.all()
+    version = _version_menu(request)
+    menu_plats = menu_rendu(version.numero, request.user.role, lambda: render_to_string(
+        'cuisinier/_menu_plats.html',
+        {'plats': Plat.objects.all(), 'user': request.user, 'csrf_token': _MARQUEUR_CSRF},
+    ))
 
-    plats_populaires = Plat.objects.annotate(
-        total_vendu=Count('commandeitem')
-    ).filter(total_vendu__gt=0).order_by('-total_vendu')[:3]
-
-    suggestion_chef = plats_populaires.first() if plats_populaires else None
-
-    panier_items = PanierItem.objects.none()
-    if request.user.role == 'tablette':
-        tablette = Tablette.objects.filter(user=request.user, active=True).first()
-        if tablette:
-            panier_items = PanierItem.objects.filter(tablette=tablette)
+    panier_count = 0
+    if request.tablette:
+        panier_count = panier_de(request.tablette).compter()
 
     return render(request, 'cuisinier/index.html', {
-        'plats': plats,
-        'plats_populaires': plats_populaires,
-        'suggestion_chef': suggestion_chef,
-        'panier_items': panier_items,
+        'menu_plats': mark_safe(menu_plats.replace(_MARQUEUR_CSRF, get_token(request))),
+        'panier_count': panier_count,
     })
 
 
@@ -405,12 +508,101 @@ def supprimer_plat(request, plat_id):
     return redirect('cuisinier_index')
 
 
+# =========================================================
+# API TABLETTE (JSON)
+# =========================================================
+# La carte et le panier pour les mises à jour sur place : une rafale de
+# clics sur la tablette devient un seul POST de quantités.
+API_PANIER_MAX_LIGNES = 50
+
+
+def _plat_json(plat):
+    image = None
+    if plat.image:
+        variantes = plat.variantes_image
+        image = variantes['src'] if variantes else plat.image.url
+    return {
+        'id': plat.id,
+        'nom': plat.nom,
+        'prix': str(plat.prix_unitaire),
+        'stock': plat.quantite_libre,
+        'disponible': plat.disponible and plat.quantite_libre > 0,
+        'image': image,
+    }
+
+
+def _etag_api_menu(request):
+    return f"api-menu-{_version_menu(request).numero}"
+
+
+@login_required(login_url='login')
+@role_required('tablette', 'admin')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_api_menu)
+def api_menu(request):
+    version = _version_menu(request)
+    contenu = menu_rendu(version.numero, 'api', lambda: json.dumps({
+        'version': version.numero,
+        'plats': [_plat_json(plat) for plat in Plat.objects.all()],
+    }))
+    return HttpResponse(contenu, content_type='application/json')
+
+
+def _panier_json(panier, demandees=None):
+    lignes = panier.lignes()
+    quantites = {ligne.plat_id: ligne.quantite for ligne in lignes}
+    return {
+        'lignes': [
+            {
+                'id': ligne.id,
+                'plat': ligne.plat_id,
+                'nom': ligne.plat.nom,
+                'prix': str(ligne.plat.prix_unitaire),
+                'quantite': ligne.quantite,
+                'montant': str(ligne.montant()),
+            }
+            for ligne in lignes
+        ],
+        'nb': len(lignes),
+        'total': str(sum((ligne.montant() for ligne in lignes), Decimal('0'))),
+        # Plats dont la quantité demandée a été réduite (stock) ou refusée
+        'ajustes': sorted(
+            plat_id for plat_id, quantite in (demandees or {}).items()
+            if quantites.get(plat_id, 0) != quantite
+        ),
+    }
+
+
+@login_required(login_url='login')
+@role_required('tablette')
+def api_panier(request):
+    """GET : contenu du panier. POST {"quantites": {"<plat_id>": n}} : fixe n portions (0 = retirer)."""
+    panier = panier_de(_tablette_requise(request))
+    if request.method == 'GET':
+        return JsonResponse(_panier_json(panier))
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['GET', 'POST'])
+
+    try:
+        quantites = json.loads(request.body)['quantites']
+        quantites = {int(plat_id): int(quantite) for plat_id, quantite in quantites.items()}
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'erreur': 'Corps attendu : {"quantites": {"<plat_id>": quantite}}'}, status=400)
+    if len(quantites) > API_PANIER_MAX_LIGNES or any(q < 0 for q in quantites.values()):
+        return JsonResponse({'erreur': 'Quantités invalides.'}, status=400)
+
+    with transaction.atomic():
+        panier.appliquer(quantites)
+    return JsonResponse(_panier_json(panier, quantites))
+
+
 # =========================================================
 # TABLES
 # =========================================================
 @login_required(login_url='login')
 def table_index(request):
-    tables = TableRestaurant.objects.all()
+    # Tablette et compte de chaque table dans la même requête
+    tables = TableRestaurant.objects.select_related('tablette__user')
     return render(request, 'tables/index.html', {'tables': tables})
 
 
@@ -420,33 +612,32 @@ def table_index(request):
 @login_required(login_url='login')
 @role_required('serveur')
 def serveur_index(request):
-    tables = TableRestaurant.objects.all()
+    # Lu avant les commandes : un événement publié entre les deux lectures
+    # est rejoué par le flux plutôt que perdu
+    dernier_evenement_id = CommandeEvenement.objects.dernier_id()
+    commandes = list(
+        Commande.objects.filter(statut__in=['en_attente', 'servie'])
+        .select_related('tablette__table')
+        .prefetch_related('items__plat')
+        .order_by('-date')
+    )
+    commandes_par_id = {c.id: c for c in commandes}
+    tables = list(TableRestaurant.objects.all())
+    etats = etats_tables([table.id for table in tables])
 
     tables_context = []
     for table in tables:
-        derniere_commande = (
-            Commande.objects.filter(tablette__table=table)
-            .exclude(statut='payee')
-            .order_by('-date')
-            .first()
-        )
-        etat = 'libre' if derniere_commande is None else derniere_commande.statut
+        commande_id, statut = etats.get(table.id, (None, None))
         tables_context.append({
             'table': table,
-            'etat': etat,
-            'derniere_commande': derniere_commande,
+            'etat': statut or 'libre',
+            'derniere_commande': commandes_par_id.get(commande_id),
         })
 
-    commandes = (
-        Commande.objects.filter(statut__in=['en_attente', 'servie'])
-        .select_related('tablette__table')
-        .prefetch_related('items__plat')
-        .order_by('-date')
-    )
-
     return render(request, 'serveur/index.html', {
         'tables_context': tables_context,
         'commandes': commandes,
+        'dernier_evenement_id': dernier_evenement_id,
     })
 
 
@@ -478,19 +669,25 @@ def serveur_valider_paiement(request, commande_id):
         messages.error(request, "Cette commande est déjà payée.")
         return redirect('serveur_index')
 
-    Paiement.objects.create(
-        commande=commande,
-        montant=commande.total,
-        mode='cash'
-    )
-
-    commande.statut = 'payee'
-    commande.serveur = request.user
-    commande.save()
-
-    caisse, _ = Caisse.objects.get_or_create(id=1)
-    caisse.solde_actuel += commande.total
-    caisse.save()
+    try:
+        with transaction.atomic():
+            Paiement.objects.create(
+                commande=commande,
+                montant=commande.total,
+                mode='cash'
+            )
+
+            commande.statut = 'payee'
+            commande.serveur = request.user
+            commande.save()
+
+            CaisseMouvement.objects.enregistrer(
+                commande.total, 'paiement', f"Commande #{commande.id}", request.user
+            )
+    except IntegrityError:
+        # Payée au même moment par un autre serveur (un seul Paiement par commande)
+        messages.error(request, "Cette commande est déjà payée.")
+        return redirect('serveur_index')
 
     table = commande.tablette.table
     commandes_actives = Commande.objects.filter(
@@ -504,9 +701,163 @@ def serveur_valider_paiement(request, commande_id):
     return redirect('serveur_index')
 
 
+# =========================================================
+# SERVEUR — FLUX EN DIRECT (Server-Sent Events)
+# =========================================================
+# Sous ASGI le flux reste ouvert et pousse les événements au fil de l'eau.
+# Sous WSGI (gunicorn sync) on fait du long-poll : la réponse attend au plus
+# SERVEUR_FLUX_ATTENTE secondes puis se ferme, et EventSource se reconnecte
+# tout seul avec l'en-tête Last-Event-ID.
+FLUX_INTERVALLE = 2
+
+
+def _curseur_flux(request):
+    valeur = request.headers.get('Last-Event-ID') or request.GET.get('dernier_id', '0')
+    try:
+        return max(0, int(valeur))
+    except ValueError:
+        return 0
+
+
+def _evenements_depuis(dernier_id, limite=200):
+    evenements = list(
+        CommandeEvenement.objects.filter(id__gt=dernier_id).order_by('id')[:limite]
+    )
+    if not evenements:
+        return []
+
+    commandes = {
+        c.id: c for c in
+        Commande.objects.filter(id__in={e.commande_id for e in evenements})
+        .select_related('tablette__table')
+        .prefetch_related('items__plat')
+    }
+
+    resultats = []
+    for e in evenements:
+        data = {'id': e.commande_id, 'type': e.type_evenement}
+        commande = commandes.get(e.commande_id)
+        if commande is None:
+            data['type'] = 'supprimee'
+        else:
+            data.update({
+                'statut': commande.statut,
+                'table': commande.tablette.table.numero_table,
+                'total': str(commande.total),
+                'heure': timezone.localtime(commande.date).strftime('%H:%M'),
+                'items': [
+                    {'plat': i.plat.nom, 'quantite': i.quantite}
+                    for i in commande.items.all()
+                ],
+            })
+        resultats.append((e.id, data))
+    return resultats
+
+
+def _format_sse(evenements):
+    return ''.join(
+        f"id: {eid}\nevent: commande\ndata: {json.dumps(data)}\n\n"
+        for eid, data in evenements
+    )
+
+
+async def _flux_continu(dernier_id):
+    yield f"retry: {FLUX_INTERVALLE * 1000}\n\n"
+    while True:
+        evenements = await sync_to_async(_evenements_depuis)(dernier_id)
+        if evenements:
+            dernier_id = evenements[-1][0]
+            yield _format_sse(evenements)
+        else:
+            yield ": ping\n\n"
+        await asyncio.sleep(FLUX_INTERVALLE)
+
+
+@login_required(login_url='login')
+@role_required('serveur')
+def serveur_flux(request):
+    dernier_id = _curseur_flux(request)
+
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(_flux_continu(dernier_id), content_type='text/event-stream')
+    else:
+        attente = getattr(settings, 'SERVEUR_FLUX_ATTENTE', 15)
+        limite = time.monotonic() + attente
+        evenements = _evenements_depuis(dernier_id)
+        while not evenements and time.monotonic() < limite:
+            time.sleep(FLUX_INTERVALLE)
+            evenements = _evenements_depuis(dernier_id)
+        response = HttpResponse(
+            f"retry: 500\n\n{_format_sse(evenements)}", content_type='text/event-stream'
+        )
+
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# =========================================================
+# CUISINE — FILE DES COMMANDES EN ATTENTE
+# =========================================================
+# L'écran cuisine interroge l'API toutes les CUISINE_INTERVALLE secondes.
+# L'ETag est le dernier événement de commande : sans nouvelle commande
+# servie ou supprimée, la réponse est un 304 après une seule requête SQL.
+CUISINE_INTERVALLE = 5
+
+
+def _dernier_evenement(request):
+    if not hasattr(request, '_dernier_evenement'):
+        request._dernier_evenement = CommandeEvenement.objects.dernier_id()
+    return request._dernier_evenement
+
+
+def _file_cuisine_json(request):
+    # L'attente est calculée par l'écran à partir de 'depuis' : la réponse
+    # ne dépend que des commandes et reste valable pour son ETag.
+    return {
+        'evenement': _dernier_evenement(request),
+        'plats': [
+            {
+                'plat': plat['plat_id'],
+                'nom': plat['nom'],
+                'quantite': plat['quantite'],
+                'tables': plat['tables'],
+                'nb_commandes': plat['nb_commandes'],
+                'depuis': plat['depuis'].isoformat(),
+                'heure': timezone.localtime(plat['depuis']).strftime('%H:%M'),
+            }
+            for plat in file_cuisine(_dernier_evenement(request))
+        ],
+    }
+
+
+def _etag_cuisine(request):
+    return f"cuisine-{_dernier_evenement(request)}"
+
+
+@login_required(login_url='login')
+@role_required('cuisinier', 'admin')
+def cuisine_file(request):
+    return render(request, 'cuisinier/file.html', {
+        'file': _file_cuisine_json(request),
+        'intervalle': CUISINE_INTERVALLE,
+    })
+
+
+@login_required(login_url='login')
+@role_required('cuisinier', 'admin')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_cuisine)
+def api_cuisine(request):
+    return JsonResponse(_file_cuisine_json(request))
+
+
 # =========================================================
 # COMMANDE (liste globale)
 # =========================================================
+COMMANDES_TAILLE_PAGE = 50
+
+
 @login_required(login_url='login')
 def Commande_index(request):
     roles_autorises = ['admin', 'serveur', 'comptable']
@@ -517,11 +868,36 @@ def Commande_index(request):
         Commande.objects.all()
         .select_related('tablette__table', 'serveur', 'comptable')
         .prefetch_related('items__plat')
-        .order_by('-date')
     )
 
+    filtres = {
+        'statut': request.GET.get('statut', ''),
+        'table': request.GET.get('table', '').strip(),
+        'serveur': request.GET.get('serveur', ''),
+        'from': request.GET.get('from', ''),
+        'to': request.GET.get('to', ''),
+    }
+    if filtres['statut'] in dict(Commande.STATUT_CHOICES):
+        commandes = commandes.filter(statut=filtres['statut'])
+    if filtres['table'].isdigit():
+        commandes = commandes.filter(tablette__table__numero_table=int(filtres['table']))
+    if filtres['serveur'].isdigit():
+        commandes = commandes.filter(serveur_id=int(filtres['serveur']))
+    debut, fin = _intervalle_dates(request)
+    if debut:
+        commandes = commandes.filter(date__gte=debut)
+    if fin:
+        commandes = commandes.filter(date__lt=fin)
+
+    page, precedent, suivant = _page_keyset(commandes, request, COMMANDES_TAILLE_PAGE)
+
     return render(request, 'commande/index.html', {
-        'commandes': commandes,
+        'commandes': page,
+        'curseur_precedent': precedent,
+        'curseur_suivant': suivant,
+        'filtres': filtres,
+        'statuts': Commande.STATUT_CHOICES,
+        'serveurs': CustomUser.objects.filter(role='serveur').order_by('identifiant'),
         'user': request.user,
     })
 
@@ -529,12 +905,48 @@ def Commande_index(request):
 # =========================================================
 # COMPTABLE
 # =========================================================
+COMPTABLE_TAILLE_PAGE = 30
+
+
 @login_required(login_url='login')
 @role_required('comptable')
 def comptable_index(request):
-    caisse, _ = Caisse.objects.get_or_create(id=1)
-    from django.utils import timezone
-    today = timezone.now().date()
+    solde = CaisseMouvement.objects.solde()
+
+    # Une dépense enregistrée redirige avant toute lecture du registre ;
+    # une saisie refusée retombe sur le rendu normal de la page
+    if request.method == "POST":
+        if 'ajouter_depense' in request.POST:
+            description = request.POST.get('description', '').strip()
+            montant_str = request.POST.get('montant', '').strip()
+            categorie = request.POST.get('categorie', '').strip()
+
+            try:
+                montant_val = Decimal(montant_str)
+                if montant_val <= 0:
+                    messages.error(request, "Le montant doit être positif.")
+                else:
+                    with transaction.atomic():
+                        # Relu sous le verrou du point de caisse : deux dépenses
+                        # simultanées ne passent pas toutes deux le contrôle
+                        solde = CaisseMouvement.objects.solde(verrouiller=True)
+                        if montant_val <= solde:
+                            Depense.objects.create(
+                                description=description,
+                                montant=montant_val,
+                                categorie=categorie,
+                                utilisateur=request.user
+                            )
+                            CaisseMouvement.objects.enregistrer(
+                                -montant_val, 'depense', description, request.user
+                            )
+                    if montant_val > solde:
+                        messages.error(request, f"Solde insuffisant. Caisse : {solde} FG")
+                    else:
+                        messages.success(request, "Dépense enregistrée.")
+                        return redirect('comptable_index')
+            except Exception:
+                messages.error(request, "Données invalides.")
 
     commandes_actives = (
         Commande.objects.filter(statut__in=['en_attente', 'servie'])
@@ -543,58 +955,48 @@ def comptable_index(request):
         .order_by('-date')
     )
 
-    paiements = (
+    # Période consultée : aujourd'hui par défaut, bornes incluses côté saisie
+    aujourd_hui = timezone.localdate()
+    debut, fin = _intervalle_dates(request)
+    jour_debut = timezone.localdate(debut) if debut else aujourd_hui
+    jour_fin = timezone.localdate(fin) if fin else aujourd_hui + timedelta(days=1)
+    debut = timezone.make_aware(datetime.combine(jour_debut, datetime.min.time()))
+    fin = timezone.make_aware(datetime.combine(jour_fin, datetime.min.time()))
+
+    paiements, paiements_precedent, paiements_suivant = _page_keyset(
         Paiement.objects
+        .filter(date__gte=debut, date__lt=fin)
         .select_related(
             'commande__tablette__table',
             'commande__serveur',
             'commande__comptable',
         )
-        .prefetch_related('commande__items__plat')
-        .order_by('-date')
+        .prefetch_related('commande__items__plat'),
+        request, COMPTABLE_TAILLE_PAGE, prefixe='p_',
+    )
+    depenses, depenses_precedent, depenses_suivant = _page_keyset(
+        Depense.objects.filter(date__gte=debut, date__lt=fin).select_related('utilisateur'),
+        request, COMPTABLE_TAILLE_PAGE, prefixe='d_',
     )
 
-    paiements_today = paiements.filter(date__date=today)
-    recette_du_jour = paiements_today.aggregate(Sum('montant'))['montant__sum'] or 0
-    nb_paiements_today = paiements_today.count()
-
-    depenses = Depense.objects.select_related('utilisateur').order_by('-date')
-    total_depenses = depenses.aggregate(Sum('montant'))['montant__sum'] or 0
-
-    if request.method == "POST":
-        if 'ajouter_depense' in request.POST:
-            description = request.POST.get('description', '').strip()
-            montant_str = request.POST.get('montant', '').strip()
-            categorie = request.POST.get('categorie', '').strip()
-
-            try:
-                montant_val = Decimal(montant_str)
-                if montant_val <= 0:
-                    messages.error(request, "Le montant doit être positif.")
-                elif montant_val > caisse.solde_actuel:
-                    messages.error(request, f"Solde insuffisant. Caisse : {caisse.solde_actuel} FG")
-                else:
-                    Depense.objects.create(
-                        description=description,
-                        montant=montant_val,
-                        categorie=categorie,
-                        utilisateur=request.user
-                    )
-                    caisse.solde_actuel -= montant_val
-                    caisse.save()
-                    messages.success(request, "Dépense enregistrée.")
-                    return redirect('comptable_index')
-            except Exception:
-                messages.error(request, "Données invalides.")
+    # Totaux lus dans le cumul journalier, une ligne par jour de la période
+    totaux = StatistiqueJour.objects.periode(jour_debut, jour_fin)
 
     return render(request, 'comptable/index.html', {
         'commandes_actives': commandes_actives,
         'paiements': paiements,
+        'paiements_precedent': paiements_precedent,
+        'paiements_suivant': paiements_suivant,
         'depenses': depenses,
-        'solde': caisse.solde_actuel,
-        'recette_du_jour': recette_du_jour,
-        'nb_paiements_today': nb_paiements_today,
-        'total_depenses': total_depenses,
+        'depenses_precedent': depenses_precedent,
+        'depenses_suivant': depenses_suivant,
+        'solde': solde,
+        'recette_periode': totaux['recettes'],
+        'nb_paiements_periode': totaux['nb_paiements'],
+        'total_depenses': totaux['depenses'],
+        'nb_depenses_periode': totaux['nb_depenses'],
+        'periode_debut': jour_debut,
+        'periode_fin': jour_fin - timedelta(days=1),
     })
 
 
@@ -619,10 +1021,11 @@ def supprimer_depense(request, depense_id):
         return redirect('comptable_index')
     depense = get_object_or_404(Depense, id=depense_id)
     montant = depense.montant
-    caisse, _ = Caisse.objects.get_or_create(id=1)
-    caisse.solde_actuel += montant
-    caisse.save()
-    depense.delete()
+    with transaction.atomic():
+        CaisseMouvement.objects.enregistrer(
+            montant, 'annulation_depense', depense.description, request.user
+        )
+        depense.delete()
     messages.success(request, f"Dépense supprimée. {montant} FG réintégrés au solde.")
     return redirect('comptable_index')
 
@@ -648,10 +1051,9 @@ def admin_supprimer_paiement(request, paiement_id):
         return redirect(request.META.get('HTTP_REFERER', 'Accueil'))
     paiement = get_object_or_404(Paiement, id=paiement_id)
     montant = paiement.montant
-    caisse, _ = Caisse.objects.get_or_create(id=1)
-    caisse.solde_actuel = max(0, caisse.solde_actuel - montant)
-    caisse.save()
-    paiement.delete()
+    with transaction.atomic():
+        CaisseMouvement.objects.retirer(montant, 'annulation_paiement', f"Paiement #{paiement.id}", request.user)
+        paiement.delete()
     messages.success(request, f"Paiement supprimé. {montant} FG retirés de la caisse.")
     return redirect('comptable_index')
 
@@ -663,10 +1065,11 @@ def admin_reinitialiser_solde(request):
     if request.user.role != 'admin' and not request.user.is_superuser:
         messages.error(request, "Action réservée à l'administrateur.")
         return redirect('comptable_index')
-    caisse, _ = Caisse.objects.get_or_create(id=1)
-    ancien_solde = caisse.solde_actuel
-    caisse.solde_actuel = Decimal('0.00')
-    caisse.save()
+    with transaction.atomic():
+        ancien_solde = CaisseMouvement.objects.solde(verrouiller=True)
+        CaisseMouvement.objects.enregistrer(
+            -ancien_solde, 'reinitialisation', "Réinitialisation du solde", request.user
+        )
     messages.success(request, f"Caisse réinitialisée. Ancien solde : {ancien_solde} FG.")
     return redirect('comptable_index')
 
@@ -680,29 +1083,36 @@ def admin_tout_supprimer(request):
         return redirect('Accueil')
 
     type_suppression = request.POST.get('type', '')
-    caisse, _ = Caisse.objects.get_or_create(id=1)
 
     if type_suppression == 'commandes':
-        nb = Commande.objects.count()
-        Commande.objects.all().delete()
+        with transaction.atomic():
+            nb = Commande.objects.purger()
+            # Un seul recalcul des cumuls plutôt qu'un décompte par commande
+            call_command('recalculer_statistiques', stdout=StringIO())
+            transaction.on_commit(invalider_etats_tables)
+            transaction.on_commit(invalider_flotte_tablettes)
         messages.success(request, f"{nb} commande(s) supprimée(s).")
         return redirect('commande_index')
 
     elif type_suppression == 'depenses':
         total = Depense.objects.aggregate(Sum('montant'))['montant__sum'] or 0
         nb = Depense.objects.count()
-        Depense.objects.all().delete()
-        caisse.solde_actuel += Decimal(str(total))
-        caisse.save()
+        with transaction.atomic():
+            Depense.objects.all().delete()
+            CaisseMouvement.objects.enregistrer(
+                Decimal(str(total)), 'annulation_depense', f"{nb} dépense(s) supprimée(s)", request.user
+            )
         messages.success(request, f"{nb} dépense(s) supprimée(s). {total} FG réintégrés.")
         return redirect('comptable_index')
 
     elif type_suppression == 'paiements':
-        total = Paiement.objects.aggregate(Sum('montant'))['montant__sum'] or 0
-        nb = Paiement.objects.count()
-        Paiement.objects.all().delete()
-        caisse.solde_actuel = max(Decimal('0.00'), caisse.solde_actuel - Decimal(str(total)))
-        caisse.save()
+        with transaction.atomic():
+            total = Paiement.objects.aggregate(Sum('montant'))['montant__sum'] or 0
+            nb = Paiement.objects.count()
+            Paiement.objects.all().delete()
+            CaisseMouvement.objects.retirer(
+                Decimal(str(total)), 'annulation_paiement', f"{nb} paiement(s) supprimé(s)", request.user
+            )
         messages.success(request, f"{nb} paiement(s) supprimé(s). {total} FG retirés de la caisse.")
         return redirect('comptable_index')
 
@@ -719,6 +1129,9 @@ def admin_tout_supprimer(request):
 # =========================================================
 # ADMINISTRATION
 # =========================================================
+ADMIN_TAILLE_PAGE = 24
+
+
 @login_required(login_url="login")
 def admin_page(request):
     if not request.user.is_superuser and getattr(request.user, 'role', None) != "admin":
@@ -832,30 +1245,23 @@ def admin_page(request):
 
                 if tablette_existante_table and tablette_existante_user:
                     if tablette_existante_table == tablette_existante_user:
-                        # Mettre à jour le qr_password si un nouveau mot de passe est fourni
-                        if pass_tab:
-                            tablette_existante_table.qr_password = pass_tab
-                            tablette_existante_table.save()
+                        # Un nouveau mot de passe a déjà révoqué les anciens QR codes
                         messages.success(request, f"✅ Table {numero} déjà associée à « {ident_tab} ».")
                     else:
                         tablette_existante_table.delete()
                         tablette_existante_user.delete()
-                        Tablette.objects.create(user=user_tab, table=table, qr_password=pass_tab or None)
+                        Tablette.objects.create(user=user_tab, table=table)
                         messages.success(request, f"✅ Table {numero} ré-associée à « {ident_tab} ».")
                 elif tablette_existante_table:
                     tablette_existante_table.user = user_tab
-                    if pass_tab:
-                        tablette_existante_table.qr_password = pass_tab
                     tablette_existante_table.save()
                     messages.success(request, f"✅ Table {numero} ré-associée à « {ident_tab} ».")
                 elif tablette_existante_user:
                     tablette_existante_user.table = table
-                    if pass_tab:
-                        tablette_existante_user.qr_password = pass_tab
                     tablette_existante_user.save()
                     messages.success(request, f"✅ Tablette « {ident_tab} » ré-associée à la Table {numero}.")
                 else:
-                    Tablette.objects.create(user=user_tab, table=table, qr_password=pass_tab or None)
+                    Tablette.objects.create(user=user_tab, table=table)
                     msg_table = "créée" if table_created else "existante"
                     messages.success(request, f"✅ Table {numero} ({msg_table}) et tablette « {ident_tab} » associées.")
 
@@ -869,47 +1275,48 @@ def admin_page(request):
             table_to_del.delete()
             messages.success(request, "Table et compte tablette supprimés.")
 
-        # ── GÉNÉRER QR CODE (connexion automatique avec u + p dans l'URL) ──
-        elif "generer_qr" in request.POST:
-            import qrcode
-            from io import BytesIO
+        # ── RENOUVELER LES QR CODES (révoque tous ceux déjà imprimés) ──
+        elif "renouveler_qr" in request.POST:
+            nombre = Tablette.objects.update(jeton_emis_le=timezone.now())
+            messages.success(request, f"{nombre} QR code(s) renouvelé(s) : réimprimez la planche.")
 
+        # ── GÉNÉRER QR CODE (connexion automatique par jeton signé) ──
+        elif "generer_qr" in request.POST:
             table_id = request.POST.get("table_id")
             table = get_object_or_404(TableRestaurant, id=table_id)
-            tab_info = Tablette.objects.filter(table=table).first()
+            tab_info = Tablette.objects.filter(table=table).select_related("user").first()
 
             if tab_info and tab_info.user:
-                base_url = request.build_absolute_uri(reverse('login'))
-
-                # Si on a le mot de passe stocké → connexion 100% automatique
-                if tab_info.qr_password:
-                    url = f"{base_url}?u={tab_info.user.identifiant}&p={tab_info.qr_password}"
-                else:
-                    # Sinon, seulement l'identifiant → le client saisit son mot de passe
-                    url = f"{base_url}?u={tab_info.user.identifiant}"
-
-                qr = qrcode.QRCode(
-                    version=1,
-                    error_correction=qrcode.constants.ERROR_CORRECT_H,
-                    box_size=12,
-                    border=4,
-                )
-                qr.add_data(url)
-                qr.make(fit=True)
-                img = qr.make_image(fill_color="#1a1a2e", back_color="white")
-                buf = BytesIO()
-                img.save(buf)
-                return HttpResponse(buf.getvalue(), content_type="image/png")
+                url = url_connexion(request.build_absolute_uri(reverse('login')), tab_info)
+                return HttpResponse(qr_png(url), content_type="image/png")
             else:
                 messages.error(request, "Aucune tablette liée à cette table.")
 
         return redirect("controle_general")
 
     # GET
-    utilisateurs = CustomUser.objects.all().order_by("role", "identifiant")
+    q_user = request.GET.get("q_user", "").strip()
+    q_table = request.GET.get("q_table", "").strip()
+
+    utilisateurs = CustomUser.objects.order_by("role", "identifiant")
+    if q_user:
+        utilisateurs = utilisateurs.filter(
+            Q(identifiant__icontains=q_user) | Q(first_name__icontains=q_user)
+            | Q(last_name__icontains=q_user) | Q(email__icontains=q_user)
+        )
+    page_utilisateurs = Paginator(utilisateurs, ADMIN_TAILLE_PAGE).get_page(request.GET.get("page_user"))
+
+    tables = TableRestaurant.objects.select_related("tablette__user").order_by("numero_table")
+    if q_table:
+        if q_table.isdigit():
+            tables = tables.filter(numero_table=int(q_table))
+        else:
+            tables = tables.filter(tablette__user__identifiant__icontains=q_table)
+    page_tables = Paginator(tables, ADMIN_TAILLE_PAGE).get_page(request.GET.get("page_table"))
+
     tables_data = []
-    for t in TableRestaurant.objects.all().order_by("numero_table"):
-        tab_info = Tablette.objects.filter(table=t).first()
+    for t in page_tables:
+        tab_info = getattr(t, "tablette", None)
         tables_data.append({
             "id": t.id,
             "numero": t.numero_table,
@@ -925,13 +1332,54 @@ def admin_page(request):
     ).order_by("identifiant")
 
     return render(request, "admin/admin.html", {
-        "utilisateurs": utilisateurs,
+        "utilisateurs": page_utilisateurs,
         "tables": tables_data,
+        "page_utilisateurs": page_utilisateurs,
+        "page_tables": page_tables,
+        "q_user": q_user,
+        "q_table": q_table,
         "tables_sans_tablette": tables_sans_tablette,
         "users_tablette_sans_table": users_tablette_sans_table,
     })
 
 
+# =========================================================
+# QR CODES EN LOT
+# =========================================================
+@login_required(login_url='login')
+@role_required('admin')
+def qr_tables(request):
+    """Tous les QR codes de connexion des tablettes : planche PDF (défaut) ou ZIP."""
+    format_lot = request.GET.get("format", "pdf")
+    if format_lot not in ("pdf", "zip"):
+        format_lot = "pdf"
+
+    tablettes = list(
+        Tablette.objects.filter(user__isnull=False)
+        .select_related("user", "table")
+        .order_by("table__numero_table")
+    )
+    if not tablettes:
+        messages.error(request, "Aucune tablette liée à une table.")
+        return redirect("controle_general")
+
+    base_url = request.build_absolute_uri(reverse('login'))
+    pngs = qr_lot([url_connexion(base_url, t) for t in tablettes])
+
+    if format_lot == "zip":
+        contenu = archive_zip([
+            (f"table_{t.table.numero_table:03d}.png", png) for t, png in zip(tablettes, pngs)
+        ])
+        response = HttpResponse(contenu, content_type="application/zip")
+    else:
+        contenu = planche_pdf([
+            (f"Table {t.table.numero_table}", png) for t, png in zip(tablettes, pngs)
+        ])
+        response = HttpResponse(contenu, content_type="application/pdf")
+    response["Content-Disposition"] = f'attachment; filename="qr_tables.{format_lot}"'
+    return response
+
+
 # =========================================================
 # DÉCONNECTER / BLOQUER TABLETTES
 # =========================================================
@@ -939,14 +1387,7 @@ def admin_page(request):
 def deconnecter_toutes_tablettes(request):
     if request.user.role != 'admin' and not request.user.is_superuser:
         raise PermissionDenied
-    from django.contrib.sessions.models import Session
-    from django.utils import timezone
-    tablette_users = CustomUser.objects.filter(role='tablette')
-    sessions = Session.objects.filter(expire_date__gte=timezone.now())
-    for session in sessions:
-        data = session.get_decoded()
-        if str(data.get('_auth_user_id')) in [str(u.pk) for u in tablette_users]:
-            session.delete()
+    SessionUtilisateur.objects.deconnecter(user__role='tablette')
     messages.success(request, "Toutes les tablettes ont été déconnectées.")
     return redirect('controle_general')
 
@@ -958,6 +1399,8 @@ def toggle_blocage_tablette(request, tablette_id):
     tablette = get_object_or_404(Tablette, id=tablette_id)
     tablette.is_blocked = not tablette.is_blocked
     tablette.save()
+    if tablette.is_blocked:
+        SessionUtilisateur.objects.deconnecter(user_id=tablette.user_id)
     etat = "bloquée" if tablette.is_blocked else "débloquée"
     messages.success(request, f"Tablette Table {tablette.table.numero_table} {etat}.")
     return redirect('controle_general')
@@ -973,6 +1416,8 @@ def modifier_mot_de_passe(request):
         if form.is_valid():
             user = form.save()
             update_session_auth_hash(request, user)
+            # La clé de session a changé : on remet l'index à jour
+            SessionUtilisateur.objects.indexer(request, user)
             messages.success(request, '✅ Mot de passe mis à jour !')
         else:
             for error in form.non_field_errors():
@@ -986,37 +1431,85 @@ def modifier_mot_de_passe(request):
 # =========================================================
 # EXPORT FACTURE
 # =========================================================
-@login_required
-def export_commande_data(request, commande_id=None):
-    user = request.user
+# L'export global est produit au fil de l'eau : les commandes sont lues par
+# lots ordonnés sur (date, id) et chaque ligne part dès qu'elle est écrite,
+# la mémoire reste donc constante quelle que soit la taille de l'historique.
+EXPORT_TAILLE_LOT = 500
 
-    if commande_id is None:
-        if user.role != 'admin' and not user.is_superuser:
-            return HttpResponseForbidden("Accès refusé.")
 
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="ventes_global.csv"'
-        response.write('\ufeff')
-        writer = csv.writer(response, delimiter=';')
-        writer.writerow(['ID', 'Table', 'Serveur', 'Total (FG)', 'Statut', 'Date', 'Plats'])
+class _TamponEcho:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de la stocker."""
+    def write(self, valeur):
+        return valeur
 
-        commandes = (
-            Commande.objects.all()
-            .select_related('tablette__table', 'serveur')
-            .prefetch_related('items__plat')
-            .order_by('-date')
-        )
-        for cmd in commandes:
+
+def _lignes_export_csv(commandes):
+    writer = csv.writer(_TamponEcho(), delimiter=';')
+    yield '\ufeff'
+    yield writer.writerow(['ID', 'Table', 'Serveur', 'Total (FG)', 'Statut', 'Date', 'Plats'])
+
+    commandes = (
+        commandes.select_related('tablette__table', 'serveur')
+        .prefetch_related('items__plat')
+        .order_by('-date', '-id')
+    )
+    curseur = None
+    while True:
+        lot = commandes
+        if curseur:
+            date, id_ = curseur
+            lot = lot.filter(Q(date__lt=date) | Q(date=date, id__lt=id_))
+        lot = list(lot[:EXPORT_TAILLE_LOT])
+        if not lot:
+            return
+        for cmd in lot:
             plats_str = ', '.join([f"{i.quantite}x {i.plat.nom}" for i in cmd.items.all()])
-            writer.writerow([
+            yield writer.writerow([
                 cmd.id,
                 f"Table {cmd.tablette.table.numero_table}",
                 cmd.serveur.identifiant if cmd.serveur else '—',
                 cmd.total,
                 cmd.get_statut_display(),
-                cmd.date.strftime('%d/%m/%Y %H:%M'),
+                timezone.localtime(cmd.date).strftime('%d/%m/%Y %H:%M'),
                 plats_str,
             ])
+        curseur = (lot[-1].date, lot[-1].id)
+
+
+def _gzip_flux(lignes):
+    compresseur = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for ligne in lignes:
+        bloc = compresseur.compress(ligne.encode('utf-8'))
+        if bloc:
+            yield bloc
+    yield compresseur.flush()
+
+
+@login_required
+def export_commande_data(request, commande_id=None):
+    user = request.user
+
+    if commande_id is None:
+        if user.role != 'admin' and not user.is_superuser:
+            return HttpResponseForbidden("Accès refusé.")
+
+        commandes = Commande.objects.all()
+        debut, fin = _intervalle_dates(request)
+        if debut:
+            commandes = commandes.filter(date__gte=debut)
+        if fin:
+            commandes = commandes.filter(date__lt=fin)
+        statut = request.GET.get('statut', '')
+        if statut in dict(Commande.STATUT_CHOICES):
+            commandes = commandes.filter(statut=statut)
+
+        lignes = _lignes_export_csv(commandes)
+        if request.GET.get('gzip'):
+            response = StreamingHttpResponse(_gzip_flux(lignes), content_type='application/gzip')
+            response['Content-Disposition'] = 'attachment; filename="ventes_global.csv.gz"'
+        else:
+            response = StreamingHttpResponse(lignes, content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = 'attachment; filename="ventes_global.csv"'
         return response
 
     try:
@@ -1058,4 +1551,68 @@ def export_commande_data(request, commande_id=None):
     ]
 
     response.write("\n".join(lignes))
-    return response
\ No newline at end of file
+    return response
+
+
+# =========================================================
+# MÉDIAS
+# =========================================================
+# Les photos envoyées sont servies par l'application, DEBUG ou non.
+# Un nom dérivé du contenu (storage.py) ne change jamais de contenu : il
+# est mis en cache un an côté navigateur. Les requêtes Range sont honorées.
+MEDIA_CACHE_IMMUABLE = 'public, max-age=31536000, immutable'
+MEDIA_CACHE_COURT = 'public, max-age=3600'
+MEDIA_TAILLE_MORCEAU = 64 * 1024
+_PLAGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _lire_plage(fichier, debut, longueur):
+    with fichier:
+        fichier.seek(debut)
+        while longueur > 0:
+            morceau = fichier.read(min(MEDIA_TAILLE_MORCEAU, longueur))
+            if not morceau:
+                break
+            longueur -= len(morceau)
+            yield morceau
+
+
+def servir_media(request, chemin):
+    try:
+        fichier = safe_join(settings.MEDIA_ROOT, chemin)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fichier):
+        raise Http404
+
+    stat = os.stat(fichier)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    type_contenu = mimetypes.guess_type(fichier)[0] or 'application/octet-stream'
+    taille = stat.st_size
+    plage = _PLAGE.match(request.headers.get('Range', ''))
+
+    if plage and any(plage.groups()):
+        debut, fin = plage.groups()
+        if debut:
+            debut, fin = int(debut), min(int(fin), taille - 1) if fin else taille - 1
+        else:
+            debut, fin = max(0, taille - int(fin)), taille - 1
+        if debut > fin:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{taille}'
+            return response
+        response = StreamingHttpResponse(
+            _lire_plage(open(fichier, 'rb'), debut, fin - debut + 1),
+            status=206, content_type=type_contenu,
+        )
+        response['Content-Range'] = f'bytes {debut}-{fin}/{taille}'
+        response['Content-Length'] = fin - debut + 1
+    else:
+        response = FileResponse(open(fichier, 'rb'), content_type=type_contenu)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = MEDIA_CACHE_IMMUABLE if est_adresse(chemin) else MEDIA_CACHE_COURT
+    return response
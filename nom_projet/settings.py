@@ -51,6 +51,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'gestion.middleware.TabletteMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 ROOT_URLCONF = 'nom_projet.urls'
@@ -149,6 +150,43 @@ LOGIN_REDIRECT_URL = 'redirect_after_login'
 LOGOUT_REDIRECT_URL = 'login'
 
 
+# Cache partagé entre workers (gunicorn) : REDIS_URL=redis://hôte:6379/0.
+# Sans lui, chaque worker garde son propre cache mémoire ; les caches
+# invalidés par signal (états des tables, parc de tablettes, tablette
+# connectée) sont alors désactivés plutôt que servis périmés.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+CACHE_PARTAGE = bool(REDIS_URL)
+
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'  # ou os.path.join(BASE_DIR, 'media')
 
+# Flux des commandes (écran serveur) : durée max du long-poll sous WSGI, en secondes
+SERVEUR_FLUX_ATTENTE = 15
+
+# Instantané du parc de tablettes (vue admin), en secondes ; 0 = pas de cache
+FLOTTE_TABLETTES_TTL = 30
+
+# Durée de validité des QR codes de connexion des tablettes, en jours
+TABLETTE_JETON_JOURS = 180
+
+# Tablette de l'utilisateur connecté (TabletteMiddleware), en secondes ; 0 = pas de cache
+TABLETTE_CONTEXTE_TTL = 30
+
+# Stockage du panier des tablettes (voir gestion/paniers.py) :
+# 'bd' = lignes PanierItem, 'cache' = cache partagé, écrit en base à la validation
+PANIER_BACKEND = 'bd'
+
+# Durée de retenue des portions mises au panier, en secondes, prolongée à
+# chaque changement du panier ; 0 = stock seulement vérifié, pas retenu.
+# Activer la retenue (ex. 15 * 60) fait écrire la base à chaque changement
+# de panier, y compris avec PANIER_BACKEND = 'cache', et change la version du
+# menu (stock libre affiché) : fragments de la carte et ETag expirent d'autant.
+RESERVATION_PANIER_TTL = 0
@@ -22,8 +22,9 @@ urlpatterns = [
     path('', include('gestion.urls')),
 ]
 from django.conf import settings
-from django.conf.urls.static import static
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from gestion.views import servir_media
 
 urlpatterns = [
     # tes urls habituelles
@@ -31,6 +32,8 @@ urlpatterns = [
     path('', include('gestion.urls')),  # par exemple
 ]
 
-# Ajouter ceci uniquement en mode DEBUG
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Médias servis par l'application, en développement comme en production
+# (cache immuable pour les noms adressés par contenu, requêtes Range)
+urlpatterns += [
+    re_path(r'^%s(?P<chemin>.+)$' % settings.MEDIA_URL.lstrip('/'), servir_media, name='media'),
+]